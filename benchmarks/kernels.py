@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# kernels.py
+# Hot-path benchmark: CompressedLinear (every strategy) vs nn.Linear fp32 / fp16 / bf16, swept over
+# hidden size, batch size, adapter rank and thread count, plus an end-to-end pass over the built model.
+# Writes JSON; --baseline compares p50 latency per case and exits non-zero past --threshold.
+# Memory per case: case_peak_rss_mb is the peak RSS while that case ran (the VmHWM window is reset before each
+# case), case_peak_delta_mb its rise over the RSS before the case, i.e. the transient allocations of the call.
+#   python benchmarks/kernels.py --hidden 1024 2048 --batch 1 8 --rank 8 --threads 1 4 --out artifacts/bench.json
+#   python benchmarks/kernels.py --baseline artifacts/bench_main.json --threshold 0.10
+#   python benchmarks/kernels.py --hidden 2048 --batch 1 --threads 1 --half --layouts int8 packed --no-e2e  # docs table
+
+import argparse, copy, ctypes, json, os, platform, re, statistics, sys, time
+from pathlib import Path
+import torch
+import torch.nn as nn
+from dac_q4_its.adapters.inject import STRATEGIES, CompressedLinear
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row_packed, unpack_int4
+
+PAGE = os.sysconf("SC_PAGE_SIZE")
+HALF = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE / 2**20
+
+def reset_peak_rss():
+    """
+    Start a new peak-RSS window (VmHWM, Linux >= 4.0); False where the kernel does not allow it.
+    Freed heap pages are handed back first (glibc malloc_trim), so the window sees the case's own allocations.
+    """
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """Peak RSS since the last reset_peak_rss (the process high-water mark without a reset)."""
+    with open("/proc/self/status") as f:
+        return int(re.search(r"VmHWM:\s+(\d+)", f.read()).group(1)) / 1024
+
+def case_memory(rss0, windowed):
+    """Per-case peak RSS and its rise over the RSS before the case; None without a per-case window."""
+    if not windowed:
+        return {"case_peak_rss_mb": None, "case_peak_delta_mb": None}
+    peak = peak_rss_mb()
+    return {"case_peak_rss_mb": peak, "case_peak_delta_mb": peak - rss0}
+
+def module_bytes(mod):
+    return sum(t.numel() * t.element_size() for t in list(mod.parameters()) + list(mod.buffers()))
+
+@torch.no_grad()
+def time_fn(fn, x, iters, warmup):
+    for _ in range(warmup):
+        fn(x)
+    lat = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn(x)
+        lat.append((time.perf_counter() - t0) * 1e3)
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))]
+    return {"p50_ms": pct(0.50), "p90_ms": pct(0.90), "p99_ms": pct(0.99), "mean_ms": statistics.fmean(lat),
+            "throughput_rows_s": x.shape[0] / (statistics.fmean(lat) / 1e3)}
+
+def build_cases(d, ranks, strategies, half, layouts=("packed",)):
+    """
+    Yield (impl, rank, module, input dtype) for one hidden size; modules share the same FP weight.
+    layouts: base Q as packed int4 (compressed_<strategy>) and/or one int8 per value (compressed_<strategy>_int8).
+    """
+    g = torch.Generator().manual_seed(d)
+    W = torch.randn(d, d, generator=g) / d ** 0.5
+    lin = nn.Linear(d, d, bias=False)
+    lin.weight.data.copy_(W)
+    yield "linear_fp32", 0, lin, torch.float32
+    for name in half:
+        yield f"linear_{name}", 0, copy.deepcopy(lin).to(HALF[name]), HALF[name]
+    P, scales = quantize_int4_per_row_packed(W)
+    bases = {"packed": ("", P), "int8": ("_int8", unpack_int4(P, d))}
+    for k in ranks:
+        U, D = torch.randn(d, k, generator=g) / d, torch.randn(k, d, generator=g) / d
+        for layout in layouts:
+            suffix, Q = bases[layout]
+            for s in strategies:
+                yield (f"compressed_{s}{suffix}", k, CompressedLinear(Q, scales, U, D, in_features=d, strategy=s),
+                       torch.float32)
+
+def kernel_bench(args):
+    results = {}
+    for t in args.threads:
+        torch.set_num_threads(t)
+        for d in args.hidden:
+            for impl, k, mod, dt in build_cases(d, args.rank, args.strategies, args.half, args.layouts):
+                n_param = d * d
+                for b in args.batch:
+                    x = torch.randn(b, d).to(dt)
+                    windowed = reset_peak_rss()
+                    rss0 = rss_mb()
+                    r = time_fn(mod, x, args.iters, args.warmup)
+                    r.update({"impl": impl, "hidden": d, "batch": b, "rank": k, "threads": t,
+                              "weight_bytes": module_bytes(mod), "bytes_per_param": module_bytes(mod) / n_param,
+                              "rss_delta_mb": rss_mb() - rss0, **case_memory(rss0, windowed)})
+                    key = f"{impl}/d{d}/b{b}/r{k}/t{t}"
+                    results[key] = r
+                    peak = r["case_peak_delta_mb"]
+                    print(f"{key:38s} p50={r['p50_ms']:8.3f}ms p99={r['p99_ms']:8.3f}ms "
+                          f"{r['throughput_rows_s']:10.0f} rows/s  {r['bytes_per_param']:.3f} B/param  "
+                          f"case peak +{'n/a' if peak is None else f'{peak:.1f}'} MB")
+                if isinstance(mod, CompressedLinear):
+                    mod.set_strategy(mod.strategy)  # drop any cached Wdq before the next case
+    return results
+
+def e2e_bench(args):
+    """Whole toy model from artifacts/: FP reference vs compressed, tokenized prompts in, hidden out."""
+    import yaml
+    from dac_q4_its.data.tokenization import load_encoder
+    from dac_q4_its.modeling.compressed import build_compressed_model
+    from dac_q4_its.modeling.loader import load_toy
+    from dac_q4_its.utils.io import load_bin
+    if not Path("artifacts/weights/layer_0_U.pkl").exists() and not Path("artifacts/model.dacq").exists():
+        print("skip e2e: artifacts not built (python scripts/run_pipeline.py)")
+        return {}
+    mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
+    encode = load_encoder(mcfg["vocab_size"])
+    prompts = ["navigate to airport avoiding tolls", "find a route to downtown with minimal traffic"]
+    fp = load_toy(mcfg).eval()
+    for li, lin in enumerate(fp.layers):
+        p = Path(f"artifacts/weights/layer_{li}_W_fp32.pkl")
+        if p.exists():
+            lin.weight.data.copy_(load_bin(p))
+    models = {"e2e_fp32": fp}
+    for s in args.strategies:
+        models[f"e2e_compressed_{s}"] = build_compressed_model(mcfg, strategy=s).eval()
+    results = {}
+    torch.set_num_threads(args.threads[0])
+    for b in args.batch:
+        tok = encode([prompts[i % len(prompts)] for i in range(b)])
+        for name, m in models.items():
+            windowed = reset_peak_rss()
+            rss0 = rss_mb()
+            r = time_fn(m, tok, args.iters, args.warmup)
+            r.update({"impl": name, "batch": b, "threads": args.threads[0], "weight_bytes": module_bytes(m),
+                      **case_memory(rss0, windowed)})
+            results[f"{name}/b{b}"] = r
+            print(f"{name + '/b' + str(b):38s} p50={r['p50_ms']:8.3f}ms p99={r['p99_ms']:8.3f}ms")
+    return results
+
+def compare(report, baseline, threshold, metric="p50_ms"):
+    """Cases whose metric grew by more than threshold (fraction) relative to baseline."""
+    regressions = {}
+    for key, r in report["cases"].items():
+        old = baseline.get("cases", {}).get(key)
+        if old and old[metric] > 0 and r[metric] > old[metric] * (1 + threshold):
+            regressions[key] = {"baseline": old[metric], "current": r[metric], "ratio": r[metric] / old[metric]}
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hidden", type=int, nargs="+", default=[256, 1024, 2048])
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--rank", type=int, nargs="+", default=[8])
+    ap.add_argument("--threads", type=int, nargs="+", default=[torch.get_num_threads()])
+    ap.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    ap.add_argument("--half", nargs="*", choices=["fp16", "bf16"], default=["fp16", "bf16"])
+    ap.add_argument("--layouts", nargs="+", choices=["packed", "int8"], default=["packed"],
+                    help="base Q layouts for the compressed cases")
+    ap.add_argument("--iters", type=int, default=50)
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--no-e2e", action="store_true")
+    ap.add_argument("--out", default="artifacts/bench_kernels.json")
+    ap.add_argument("--baseline", default=None, help="earlier --out JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed p50 slowdown (fraction)")
+    args = ap.parse_args()
+
+    report = {"meta": {"torch": torch.__version__, "python": platform.python_version(), "machine": platform.machine(),
+                       "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args)},
+              "cases": kernel_bench(args)}
+    if not args.no_e2e:
+        report["cases"].update(e2e_bench(args))
+    if args.baseline:
+        report["regressions"] = compare(report, json.loads(Path(args.baseline).read_text()), args.threshold)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.out}")
+    if report.get("regressions"):
+        for key, r in report["regressions"].items():
+            print(f"REGRESSION {key}: {r['baseline']:.3f} -> {r['current']:.3f} ms (x{r['ratio']:.2f})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# startup.py
+# Cold-start benchmark: time from process launch to first model output, per load path.
+# Each run is a fresh interpreter, so import cost (torch, yaml, dac_q4_its) is included.
+#   python benchmarks/startup.py --repeats 5 --out artifacts/startup.json
+
+import argparse, json, os, statistics, subprocess, sys, time
+from pathlib import Path
+
+CHILD = r"""
+import time, json
+t0 = time.perf_counter()
+import torch, yaml
+t_torch = time.perf_counter()
+mode = {mode!r}
+mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
+tok = torch.zeros(1, 8, dtype=torch.long)
+if mode in ("pickle", "container"):
+    from dac_q4_its.modeling.compressed import build_compressed_model
+    model = build_compressed_model(mcfg, strategy="fused", use_container=(mode == "container"))
+elif mode.startswith("snapshot"):
+    from dac_q4_its.modeling.compressed import load_snapshot
+    model = load_snapshot({snapshot!r})
+else:
+    from dac_q4_its.runtimes.onnxrt_backend import OnnxRTBackend
+    model = OnnxRTBackend({onnx!r})
+t_load = time.perf_counter()
+with torch.no_grad():
+    model(tok)
+t_first = time.perf_counter()
+print(json.dumps({{"import_s": t_torch - t0, "load_s": t_load - t_torch, "first_forward_s": t_first - t_load}}))
+"""
+
+def run_mode(mode, snapshot, onnx, env):
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD.format(mode=mode, snapshot=snapshot, onnx=onnx)],
+                         capture_output=True, text=True, env=env, check=True)
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    res["time_to_first_output_s"] = time.perf_counter() - t0
+    return res
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--out", default="artifacts/startup.json")
+    args = ap.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ["src", os.environ.get("PYTHONPATH")])))
+    modes = {"pickle": Path("artifacts/weights/layer_0_U.pkl"), "container": Path("artifacts/model.dacq"),
+             "snapshot_pt2": Path("artifacts/model_snapshot.pt2"), "snapshot_pt": Path("artifacts/model_snapshot.pt"),
+             "onnxrt": Path("artifacts/model_int4.onnx")}
+    report = {}
+    for mode, needed in modes.items():
+        if not needed.exists():
+            print(f"skip {mode}: {needed} not built")
+            continue
+        runs = [run_mode(mode, str(modes[mode]), str(modes["onnxrt"]), env) for _ in range(args.repeats)]
+        report[mode] = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"{mode:13s} " + "  ".join(f"{k}={v * 1e3:7.1f}ms" for k, v in report[mode].items()))
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out).write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
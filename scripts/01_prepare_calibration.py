@@ -1,12 +1,23 @@
+import argparse, yaml
 from pathlib import Path
+from dac_q4_its import pipeline
 from dac_q4_its.utils.seeds import set_seed
 from dac_q4_its.data.build_corpus import write_corpus
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tokenizer-vocab", type=int, default=4000)
+    ap.add_argument("--extra-text", nargs="*", default=["data/samples/nln_samples.jsonl"],
+                    help="additional .txt/.jsonl files for tokenizer training")
+    args = ap.parse_args()
+
     set_seed(7)
     Path("artifacts").mkdir(exist_ok=True)
     write_corpus("artifacts/calibration.txt", n=2000)
     print("Wrote artifacts/calibration.txt")
+    mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
+    pipeline.tokenizer_stage(mcfg, ["artifacts/calibration.txt"] + args.extra_text, vocab_size=args.tokenizer_vocab)
+    print(f"Wrote {pipeline.tokenizer_path()}")
 
 if __name__ == "__main__":
     main()
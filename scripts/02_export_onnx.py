@@ -1,16 +1,37 @@
-import yaml, torch
-from pathlib import Path
-from dac_q4_its.modeling.loader import load_toy
-from dac_q4_its.utils.io import save_bin
+import argparse, json, yaml, torch
+from dac_q4_its import pipeline
+
+def export_fp_weights(cfg, seed):
+    pipeline.export_fp_weights(cfg, seed=seed)
+    print("Exported toy FP weights to artifacts/weights")
+
+def export_compressed(cfg, args):
+    # needs the quantized weights and adapters from 03-05
+    from dac_q4_its.modeling.compressed import build_compressed_model
+    from dac_q4_its.runtimes.onnxrt_backend import export_compressed_onnx, OnnxRTBackend, parity_check, compare_latency
+    model = build_compressed_model(cfg)
+    export_compressed_onnx(model, args.out)
+    backend = OnnxRTBackend(args.out, intra_op_threads=args.threads, inter_op_threads=1)
+    tok = torch.randint(0, cfg["vocab_size"], (args.batch, 8))
+    report = {"onnx": args.out, "parity": parity_check(model, backend, tok),
+              "latency_ms": compare_latency(model, backend, tok)}
+    print(json.dumps(report, indent=2))
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--compressed", action="store_true",
+                    help="export the compressed model (INT4 base + U,D) to ONNX instead of FP weights")
+    ap.add_argument("--out", default="artifacts/model_int4.onnx")
+    ap.add_argument("--threads", type=int, default=0, help="ORT intra-op threads (0 = auto)")
+    ap.add_argument("--batch", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0, help="toy weight init seed (keeps re-exports identical)")
+    args = ap.parse_args()
+
     cfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
-    model = load_toy(cfg)
-    Path("artifacts/weights").mkdir(parents=True, exist_ok=True)
-    for li, lin in enumerate(model.layers):
-        W = lin.weight.data.to(torch.float32).clone()  # [d, d]
-        save_bin(W, f"artifacts/weights/layer_{li}_W_fp32.pkl")
-    print("Exported toy FP weights to artifacts/weights")
+    if args.compressed:
+        export_compressed(cfg, args)
+    else:
+        export_fp_weights(cfg, args.seed)
 
 if __name__ == "__main__":
     main()
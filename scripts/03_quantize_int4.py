@@ -1,16 +1,39 @@
-import glob, yaml
-from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row
-from dac_q4_its.utils.io import load_bin, save_bin
+import argparse, yaml
+from dac_q4_its import pipeline
+from dac_q4_its.utils.io import load_json
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default="artifacts/calibration.txt", help="calibration text for the precision plan")
+    ap.add_argument("--budget-bytes", type=int, default=None, help="override mixed.budget: total base-weight bytes")
+    ap.add_argument("--budget-latency-us", type=float, default=None, help="override mixed.budget: modeled latency")
+    ap.add_argument("--uniform", action="store_true", help="ignore the mixed block and quantize every layer to int4")
+    args = ap.parse_args()
+
+    mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
     qcfg = yaml.safe_load(open("configs/quant/int4_dynamic.yml"))
-    paths = sorted(glob.glob("artifacts/weights/layer_*_W_fp32.pkl"))
-    for p in paths:
-        W = load_bin(p)  # torch tensor [d, d]
-        Q, scales = quantize_int4_per_row(W, qmin=qcfg["range_min"], qmax=qcfg["range_max"])
-        save_bin(Q, p.replace("W_fp32","W_qint4"))
-        save_bin(scales, p.replace("W_fp32","scales"))
-    print("Quantized INT4 weights saved.")
+    if args.uniform:
+        qcfg.pop("mixed", None)
+    elif args.budget_bytes or args.budget_latency_us:
+        qcfg["mixed"]["budget"] = {"bytes": args.budget_bytes} if args.budget_bytes else \
+            {"latency_us": args.budget_latency_us}
+    layers = range(pipeline.n_layers())
+    if qcfg.get("mixed"):
+        pipeline.capture_stage(mcfg, args.corpus, which="input")
+        pipeline.precision_plan_stage(qcfg, layers)
+        plan = load_json(pipeline.quant_plan_path())
+        print(f"Precision plan {plan['formats']}: {plan['cost']:.0f}/{plan['budget']} {plan['unit']}, "
+              f"output error {plan['output_error']:.4g} (all {plan['baseline']['format']}: "
+              f"{plan['baseline']['cost']:.0f} {plan['unit']}, {plan['baseline']['output_error']:.4g})")
+    for li in layers:
+        pipeline.quantize_layer(li, qcfg, fmt=pipeline.layer_format(li, qcfg))
+    if qcfg.get("embedding"):
+        pipeline.quantize_embedding(qcfg["embedding"])
+        print(f"Quantized embedding table ({qcfg['embedding']['format']}, "
+              f"residual rank {qcfg['embedding'].get('residual_rank', 0)}).")
+    elif pipeline.clear_embedding():
+        print("No embedding block: removed the stale quantized embedding table.")
+    print("Quantized weights saved.")
 
 if __name__ == "__main__":
     main()
@@ -1,28 +1,36 @@
-import yaml, torch
-from pathlib import Path
-from dac_q4_its.adapters.eigenspace import topk_eigvecs_from_activations
-from dac_q4_its.modeling.loader import load_toy
-from dac_q4_its.utils.io import save_bin
+import argparse, yaml, torch
+from dac_q4_its import pipeline
+from dac_q4_its.adapters.eigenspace import eigenspace_accuracy, SOLVERS
+from dac_q4_its.utils.io import load_bin, save_json
 from dac_q4_its.utils.seeds import set_seed
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default="artifacts/calibration.txt")
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=1, help="processes sharing the corpus")
+    ap.add_argument("--max-lines", type=int, default=None)
+    ap.add_argument("--fp32-accum", action="store_true", help="accumulate A^T A in float32 instead of float64")
+    ap.add_argument("--solver", choices=SOLVERS, default=None, help="override eig_solver from the adapter config")
+    ap.add_argument("--check", action="store_true", help="report accuracy against exact eigh per layer")
+    args = ap.parse_args()
+
     set_seed(42)
     mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
-    rank = yaml.safe_load(open("configs/adapter/rank8_zero_init.yml"))["rank"]
-    model = load_toy(mcfg).eval()
-
-    B, T = 32, 8
-    tok = torch.randint(0, mcfg["vocab_size"], (B, T))
-    emb = model.embed(tok).mean(dim=1)  # [B, H]
-    A_prev = emb
-    Path("artifacts/eigs").mkdir(parents=True, exist_ok=True)
-    for li, lin in enumerate(model.layers):
-        h = lin(A_prev).relu()
-        A_layer = h.detach()  # [B, H]
-        Vk = topk_eigvecs_from_activations(A_layer, rank)  # [d, k]
-        save_bin(Vk, f"artifacts/eigs/layer_{li}_Vk.pkl")
-        A_prev = h
-    print("Saved layer-wise eigenvectors (top-k).")
+    acfg = yaml.safe_load(open("configs/adapter/rank8_zero_init.yml"))
+    if args.solver:
+        acfg["eig_solver"] = args.solver
+    counts = pipeline.capture_stage(mcfg, args.corpus, batch_size=args.batch_size, workers=args.workers,
+                                    dtype=torch.float32 if args.fp32_accum else torch.float64,
+                                    max_lines=args.max_lines)
+    for li in range(mcfg["n_layers"]):
+        pipeline.eigvecs_layer(li, acfg)
+        if args.check:
+            C, Vk = load_bin(pipeline.layer_path("cov", li)), load_bin(pipeline.layer_path("Vk", li))
+            print(f"layer {li}: {eigenspace_accuracy(C, Vk)}")
+    save_json({"corpus": args.corpus, "rows": counts}, "artifacts/eigs/capture.json")
+    print(f"Saved layer-wise eigenvectors (top-{pipeline.eig_rank(acfg)}) and eigenvalues "
+          f"from {max(counts.values())} calibration rows.")
 
 if __name__ == "__main__":
     main()
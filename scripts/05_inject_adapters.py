@@ -1,26 +1,31 @@
-import glob
-from dac_q4_its.utils.io import load_bin, save_bin
-from dac_q4_its.quantization.int4_dynamic import dequantize_int4_per_row, delta_W
-from dac_q4_its.adapters.build_adapters import build_adapters
+import argparse, yaml
+from dac_q4_its import pipeline
+from dac_q4_its.utils.io import load_json
 
 def main():
-    qfiles = sorted(glob.glob("artifacts/weights/layer_*_W_qint4.pkl"))
-    for qf in qfiles:
-        sf = qf.replace("W_qint4","scales")
-        wf = qf.replace("W_qint4","W_fp32")
-        vf = qf.replace("artifacts/weights","artifacts/eigs").replace("W_qint4.pkl","Vk.pkl")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-bytes", type=int, default=None, help="override rank_budget: total U/D bytes")
+    ap.add_argument("--budget-flops", type=int, default=None, help="override rank_budget: adapter FLOPs per token")
+    args = ap.parse_args()
 
-        Q = load_bin(qf)
-        S = load_bin(sf)
-        Wfp = load_bin(wf)
-        Vk = load_bin(vf)
-
-        Wdq = dequantize_int4_per_row(Q, S)
-        dW = delta_W(Wfp, Wdq)
-        U, D = build_adapters(Vk, dW)
-        save_bin(U, qf.replace("W_qint4","U"))
-        save_bin(D, qf.replace("W_qint4","D"))
-    print("Computed and saved adapters U,D per layer.")
+    acfg = yaml.safe_load(open("configs/adapter/rank8_zero_init.yml"))
+    if args.budget_bytes or args.budget_flops:
+        acfg["rank_budget"] = {"bytes": args.budget_bytes} if args.budget_bytes else {"flops": args.budget_flops}
+    layers = range(pipeline.n_layers())
+    if acfg.get("rank_budget"):
+        pipeline.rank_plan_stage(acfg, layers)
+        plan = load_json(pipeline.rank_plan_path())
+        print(f"Rank plan {plan['ranks']}: {plan['cost']}/{plan['budget']} {plan['unit']}, "
+              f"captured {plan['captured']:.1%} of ||dW||^2 (uniform rank {plan['uniform']['rank']}: "
+              f"{plan['uniform']['cost']} {plan['unit']}, {plan['uniform']['captured']:.1%})")
+    dtype = acfg.get("dtype", "fp32")
+    for li in layers:
+        pipeline.adapters_layer(li, rank=pipeline.layer_rank(li, acfg), dtype=dtype)
+    print(f"Computed and saved adapters U,D per layer ({dtype}).")
+    report = pipeline.adapter_precision_report(layers, [pipeline.layer_rank(li, acfg) for li in layers])
+    for dt in ("fp32", "fp16", "bf16", "int8"):
+        print(f"  {dt:5s} {report[dt]['bytes']:8d} bytes, recovers {report[dt]['recovered']:.3%} of ||dW||^2")
+    print(f"Wrote {pipeline.adapter_precision_path()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,31 @@
+import argparse, yaml
+from dac_q4_its import pipeline
+from dac_q4_its.utils.io import convert_pkl_dir
+
+# deployment set only: the FP projection weights (and the FP embedding, once quantized) stay behind
+PATTERNS = ["layer_*_W_qint4.pkl", "layer_*_scales.pkl", "layer_*_U.pkl", "layer_*_D.pkl", "layer_*_UD_scales.pkl"]
+EMBED_FP = ["embed_fp32.pkl"]
+EMBED_Q = ["embed_q.pkl", "embed_scales.pkl", "embed_U.pkl", "embed_D.pkl"]
+
+def main():
+    ap = argparse.ArgumentParser(description="Pack per-layer .pkl artifacts into one mmap-able container.")
+    ap.add_argument("--src", default="artifacts/weights")
+    ap.add_argument("--out", default="artifacts/model.dacq")
+    ap.add_argument("--snapshot", nargs="?", const="artifacts/model_snapshot.pt", default=None,
+                    help="also write a ready-to-run snapshot (.pt TorchScript, .pt2 torch.export)")
+    ap.add_argument("--strategy", default="fused", help="CompressedLinear strategy baked into the snapshot")
+    args = ap.parse_args()
+
+    mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
+    qcfg = yaml.safe_load(open("configs/quant/int4_dynamic.yml"))
+    acfg = yaml.safe_load(open("configs/adapter/rank8_zero_init.yml"))
+    names = convert_pkl_dir(args.src, args.out, patterns=(EMBED_Q if qcfg.get("embedding") else EMBED_FP) + PATTERNS,
+                            metadata={"model": mcfg, **pipeline.plan_metadata(qcfg, acfg)})
+    print(f"Packed {len(names)} tensors into {args.out}")
+    if args.snapshot:
+        from dac_q4_its.modeling.compressed import build_compressed_model, save_snapshot
+        save_snapshot(build_compressed_model(mcfg, strategy=args.strategy), args.snapshot)
+        print(f"Wrote deployment snapshot {args.snapshot}")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,139 @@
-import argparse, yaml, torch, json
-from dac_q4_its.modeling.loader import load_toy
-from dac_q4_its.adapters.inject import CompressedLinear
-from dac_q4_its.utils.io import load_bin
+import argparse, yaml, torch, json, time
+from pathlib import Path
+from dac_q4_its.modeling.compressed import (build_compressed_model, load_embedding,
+                                            build_adapter_bank_model, load_snapshot)
+from dac_q4_its.adapters.inject import STRATEGIES, set_strategy, strategy_delta
+from dac_q4_its.modeling.decode import toy_decode
+from dac_q4_its.modeling.grammar import GrammarDecoder
+from dac_q4_its.data.rules import load_lexicons
+from dac_q4_its.data.tokenization import load_encoder
+from dac_q4_its.evaluation.nln import exact_match, soft_f1
+from dac_q4_its.runtimes.result_cache import ResultCache, artifact_version
 
-def build_compressed_model(mcfg):
-    model = load_toy(mcfg).eval()
-    for li, lin in enumerate(model.layers):
-        Q = load_bin(f"artifacts/weights/layer_{li}_W_qint4.pkl")
-        S = load_bin(f"artifacts/weights/layer_{li}_scales.pkl")
-        U = load_bin(f"artifacts/weights/layer_{li}_U.pkl")
-        D = load_bin(f"artifacts/weights/layer_{li}_D.pkl")
-        comp = CompressedLinear(Q, S, U, D)
-        model.layers[li] = comp
-    return model
-
-def toy_decode(vec):
-    return "DEST=airport,CONSTRAINT=avoid_tolls" if vec.mean() > 0 else "DEST=downtown,CONSTRAINT=min_traffic"
+def delta_report(model, encode, decode, path, strategy, ref="dequant", repeats=20):
+    """Accuracy and latency of `strategy` against the FP `ref` path over a JSONL of input/target pairs."""
+    rows = [json.loads(line) for line in open(path, encoding="utf-8") if line.strip()]
+    tok = encode([r["input"] for r in rows])
+    report = {"data": path, "n": len(rows), **strategy_delta(model, tok, strategy, ref)}
+    preds = {}
+    for s in (ref, strategy):
+        set_strategy(model, s)
+        preds[s] = decode(model, tok)
+        model(tok)  # warm resident operands before timing
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            model(tok)
+        report[f"{s}_forward_ms"] = (time.perf_counter() - t0) / repeats * 1e3
+        report[f"{s}_em"] = sum(exact_match(p, r["target"]) for p, r in zip(preds[s], rows)) / len(rows)
+        report[f"{s}_soft_f1"] = sum(soft_f1(p, r["target"]) for p, r in zip(preds[s], rows)) / len(rows)
+    report["pred_agreement"] = sum(a == b for a, b in zip(preds[ref], preds[strategy])) / len(rows)
+    report["em_delta"] = report[f"{strategy}_em"] - report[f"{ref}_em"]
+    return report
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--prompt", type=str, default="navigate to airport avoiding tolls")
+    parser.add_argument("--strategy", choices=STRATEGIES, default=None,
+                        help="base product for every layer (default: fused for packed int4, dequant otherwise)")
+    parser.add_argument("--adapter-sets", nargs="+", default=None, metavar="NAME=DIR",
+                        help="serve several adapter variants over one quantized base")
+    parser.add_argument("--adapter", type=str, default=None, help="adapter variant for --prompt")
+    parser.add_argument("--backend", choices=["torch", "onnxrt"], default="torch")
+    parser.add_argument("--onnx", type=str, default="artifacts/model_int4.onnx", help="model for --backend onnxrt")
+    parser.add_argument("--threads", type=int, default=0, help="ORT intra-op threads; with --bulk, threads per worker (0 = auto)")
+    parser.add_argument("--snapshot", type=str, default=None, help="deployment snapshot from 06_pack_artifacts.py --snapshot")
+    parser.add_argument("--profile", type=str, default=None, metavar="TRACE_JSON",
+                        help="torch backend: print a per-layer dequant/base/adapter table and write a Chrome trace")
+    parser.add_argument("--decoder", choices=["grammar", "toy"], default="grammar",
+                        help="grammar: constrained DEST/CONSTRAINT decoding; toy: the original sign-of-mean stub")
+    parser.add_argument("--delta-report", type=str, default=None, metavar="JSON",
+                        help="torch backend: compare --strategy with the FP dequant path (drift, EM, latency)")
+    parser.add_argument("--delta-data", type=str, default="data/samples/nln_samples.jsonl",
+                        help="input/target JSONL for --delta-report")
+    parser.add_argument("--cache-file", type=str, default=None,
+                        help="result cache shared across runs; a hit skips model loading entirely")
+    parser.add_argument("--bulk", type=str, default=None, metavar="IN_JSONL",
+                        help="predict every \"input\" of a JSONL file instead of --prompt")
+    parser.add_argument("--out", type=str, default="artifacts/nln_preds.jsonl", help="--bulk output (input order)")
+    parser.add_argument("--batch-size", type=int, default=64, help="--bulk rows per model call")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="--bulk model processes, each pinned to --threads cores (0 = in-process)")
+    parser.add_argument("--prefetch", type=int, default=4, help="--bulk batches tokenized ahead of the model")
     args = parser.parse_args()
+    for flag in ("profile", "delta_report"):
+        if getattr(args, flag) and (args.snapshot or args.backend == "onnxrt"):
+            parser.error(f"--{flag.replace('_', '-')} needs the torch backend (not --snapshot or --backend onnxrt)")
+
+    if args.bulk:
+        from dac_q4_its.runtimes.bulk import run_bulk
+        for flag in ("cache_file", "profile", "delta_report"):
+            if getattr(args, flag):
+                parser.error(f"--{flag.replace('_', '-')} is not supported with --bulk")
+        sets = dict(s.split("=", 1) for s in args.adapter_sets) if args.adapter_sets else None
+        spec = {"mcfg": yaml.safe_load(open("configs/model/llama-1b.yml")), "strategy": args.strategy,
+                "snapshot": args.snapshot, "backend": args.backend, "onnx": args.onnx, "decoder": args.decoder,
+                "adapter_sets": sets, "adapter": args.adapter}
+        stats = run_bulk(args.bulk, args.out, spec, batch_size=args.batch_size, workers=args.workers,
+                         threads=args.threads, prefetch_depth=args.prefetch)
+        print(f"{stats['rows']} rows in {stats['seconds']:.2f}s ({stats['rows_per_s']:.0f} rows/s, "
+              f"{stats['workers']} workers x {stats['threads']} threads) -> {args.out}")
+        return
+
+    cache = None
+    if args.cache_file:
+        src = args.snapshot or (args.onnx if args.backend == "onnxrt" else None)
+        cache = ResultCache(version=artifact_version(extra={"backend": args.backend, "src": src,
+                                                            "adapter_sets": args.adapter_sets, "adapter": args.adapter,
+                                                            "decoder": args.decoder, "strategy": args.strategy}))
+        cache.load(args.cache_file)
+        pred = cache.get(args.prompt)
+        if pred is not None:
+            print(json.dumps({"input": args.prompt, "pred": pred, "cached": True}, indent=2))
+            return
 
     mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
-    model = build_compressed_model(mcfg)
-    tok = torch.randint(0, mcfg["vocab_size"], (1, 8))
-    h = model(tok)
-    pred = toy_decode(h.detach())
+    encode = load_encoder(mcfg["vocab_size"])
+    tok = encode([args.prompt])  # [1, T]
+    model = embed = None
+    if args.snapshot:
+        fwd = load_snapshot(args.snapshot)
+    elif args.backend == "onnxrt":
+        from dac_q4_its.runtimes.onnxrt_backend import OnnxRTBackend
+        fwd = OnnxRTBackend(args.onnx, intra_op_threads=args.threads)
+    elif args.adapter_sets:
+        sets = dict(s.split("=", 1) for s in args.adapter_sets)
+        model = build_adapter_bank_model(mcfg, sets, strategy=args.strategy)
+        aid = list(sets).index(args.adapter or next(iter(sets)))
+        fwd = lambda t: model(t, adapter_ids=torch.full((t.shape[0],), aid, dtype=torch.long))
+    else:
+        model = fwd = build_compressed_model(mcfg, strategy=args.strategy)
+    if args.decoder == "grammar":
+        embed = model.embed if model is not None else load_embedding(mcfg)
+        decoder = GrammarDecoder.from_lexicons(load_lexicons("data/lexicons.yaml"), encode, mcfg["vocab_size"])
+        run = lambda: decoder(fwd, tok, embed)[0]
+    else:
+        run = lambda: toy_decode(fwd(tok).detach()[0])
+    if args.delta_report:
+        if args.decoder == "grammar":
+            decode = lambda m, t: decoder(m, t, embed)
+        else:
+            decode = lambda m, t: [toy_decode(h) for h in m(t).detach()]
+        report = delta_report(model, encode, decode, args.delta_data, args.strategy or "fused")
+        Path(args.delta_report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.delta_report).write_text(json.dumps(report, indent=2))
+        print(f"{report['strategy']} vs dequant: rel_err {report['rel_err']:.2e}, pred agreement "
+              f"{report['pred_agreement']:.3f}, EM delta {report['em_delta']:+.3f} -> {args.delta_report}")
+    if args.profile:
+        from dac_q4_its.runtimes.profiling import LayerProfiler
+        with LayerProfiler(model) as prof:
+            pred = run()
+        print(prof.table())
+        print(f"Wrote {prof.save_trace(args.profile)}")
+    else:
+        pred = run()
+    if cache is not None:
+        cache.put(args.prompt, pred)
+        cache.save(args.cache_file)
     print(json.dumps({"input": args.prompt, "pred": pred}, indent=2))
 
 if __name__ == "__main__":
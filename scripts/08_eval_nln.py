@@ -1,7 +1,28 @@
-import json
-from dac_q4_its.evaluation.nln import eval_file
+import argparse, json
+from pathlib import Path
+from dac_q4_its.evaluation.nln import eval_file, eval_file_streaming
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--preds", type=str, default=None, help="JSONL with pred/target per line (default: built-in pair)")
+    ap.add_argument("--workers", type=int, default=0, help="processes for --preds (0 = all cores)")
+    ap.add_argument("--chunk-mb", type=int, default=8)
+    ap.add_argument("--lexicons", type=str, default="data/lexicons.yaml",
+                    help="lexicons the utterances were generated from (constraint families for --preds)")
+    ap.add_argument("--report", type=str, default="artifacts/nln_report.json")
+    args = ap.parse_args()
+
+    if args.preds:
+        report = eval_file_streaming(args.preds, workers=args.workers, chunk_bytes=args.chunk_mb << 20,
+                                     lexicons=args.lexicons)
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(json.dumps(report, separators=(",", ":")))
+        print(f"NLN EM: {report.get('em', 0.0):.3f}, SOFT-F1: {report.get('soft_f1', 0.0):.3f}, "
+              f"CONSTRAINT-F1: {report['constraint_f1']:.3f} over {report['n']} lines -> {args.report}")
+        for fam, r in report["by_family"].items():
+            print(f"  {fam:10s} n={r['n']:8d} em={r.get('em', 0.0):.3f} constraint_f1={r['constraint_f1']:.3f}")
+        return
+
     preds = [
       {"input":"navigate to airport avoiding tolls","pred":"DEST=airport,CONSTRAINT=avoid_tolls","target":"DEST=airport,CONSTRAINT=avoid_tolls"},
       {"input":"find a route to downtown with minimal traffic","pred":"DEST=downtown,CONSTRAINT=min_traffic","target":"DEST=downtown,CONSTRAINT=min_traffic"}
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 # aggregate_annotations.py
 # Merge multiple per-annotator CSV files and sanity-check ranges.
+#   python scripts/aggregate_annotations.py --inputs a.csv b.csv --out annotations_merged.csv
+#   python scripts/aggregate_annotations.py --inputs exports/*.csv --parquet-out annotations_merged/ --workers 8
+# The --parquet-out mode is chunked and out-of-core (dac_q4_its.evaluation.annotations): offending rows are
+# reported instead of aborting, (item_id, annotator_id) duplicates keep the last occurrence, and the
+# partitioned output is read directly by compute_hcs_metrics.py --parquet.
 
-import argparse, pandas as pd
+import argparse, json, sys, pandas as pd
 
 COLS = ["item_id","annotator_id","prompt","response","coherence","relevance","instruction_following","safety_compliance","fluency","notes"]
 
@@ -10,8 +15,26 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--inputs", nargs="+", required=True, help="list of CSV files")
     ap.add_argument("--out", default="annotations_merged.csv")
+    ap.add_argument("--parquet-out", default=None, help="write a bucketed Parquet dataset here (streaming mode)")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--chunksize", type=int, default=200_000)
+    ap.add_argument("--buckets", type=int, default=16)
+    ap.add_argument("--strict", action="store_true", help="streaming mode: exit non-zero if any row was rejected")
     args = ap.parse_args()
 
+    if args.parquet_out:
+        from dac_q4_its.evaluation.annotations import merge_to_parquet
+        report, bad = merge_to_parquet(args.inputs, args.parquet_out, n_buckets=args.buckets,
+                                       chunksize=args.chunksize, workers=args.workers)
+        print(json.dumps(report, indent=2))
+        if len(bad):
+            print(f"{report['rows_rejected']} rows rejected ({report['offending_cells']} cells), first few:")
+            print(bad.head(10).to_string(index=False))
+            print(f"full list: {args.parquet_out}/_rejected.csv")
+            if args.strict:
+                sys.exit(1)
+        return
+
     dfs = []
     for p in args.inputs:
         df = pd.read_csv(p)
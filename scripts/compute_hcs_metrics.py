@@ -1,50 +1,10 @@
 #!/usr/bin/env python3
 # compute_hcs_metrics.py
-# Aggregates HCS annotations and reports mean±std, 95% CI, and Fleiss' kappa per dimension.
+# Aggregates HCS annotations and reports mean±std, 95% CI (normal and item-bootstrap), and Fleiss' kappa
+# per dimension. Count matrices, kappas and bootstrap resamples are vectorized (dac_q4_its.evaluation.hcs).
 
 import argparse, pandas as pd, numpy as np, json, math
-from collections import defaultdict
-
-DIMENSIONS = ["coherence","relevance","instruction_following","safety_compliance","fluency"]
-WEIGHTS = {"coherence":0.40,"relevance":0.20,"instruction_following":0.20,"safety_compliance":0.10,"fluency":0.10}
-CATEGORIES = [1,2,3,4,5]
-
-def fleiss_kappa(counts: np.ndarray) -> float:
-    """
-    counts: matrix of shape (N_items, N_categories) with integer tallies per category per item.
-    """
-    if counts.size == 0:
-        return float("nan")
-    N, k = counts.shape
-    n = counts.sum(axis=1)
-    if not np.all(n == n[0]):
-        # items must have same number of ratings for standard Fleiss' kappa
-        # approximate fix: downsample to min n across items
-        n0 = int(n.min())
-        new_counts = []
-        rng = np.random.default_rng(0)
-        for i in range(N):
-            reps = []
-            for j, c in enumerate(counts[i]):
-                reps += [j]*int(c)
-            if len(reps) < n0:
-                continue
-            sel = rng.choice(reps, size=n0, replace=False)
-            row = np.bincount(sel, minlength=k)
-            new_counts.append(row)
-        counts = np.vstack(new_counts) if new_counts else counts
-        if counts.size == 0:
-            return float("nan")
-        N, k = counts.shape
-        n = counts.sum(axis=1)
-    n = n[0]
-    P_i = ((counts*(counts-1)).sum(axis=1)) / (n*(n-1))
-    p_j = counts.sum(axis=0) / (N*n)
-    P_bar = P_i.mean()
-    P_e = (p_j**2).sum()
-    if P_e == 1.0:
-        return 1.0
-    return float((P_bar - P_e) / (1 - P_e))
+from dac_q4_its.evaluation.hcs import DIMENSIONS, WEIGHTS, CATEGORIES, count_matrices, fleiss_kappa, bootstrap_ci
 
 def ci95(mean, std, n):
     if n <= 1:
@@ -55,41 +15,42 @@ def ci95(mean, std, n):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--csv", required=True, help="annotations CSV")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--csv", help="annotations CSV")
+    src.add_argument("--parquet", help="dataset from aggregate_annotations.py --parquet-out")
     ap.add_argument("--out", default="hcs_report.json")
+    ap.add_argument("--bootstrap", type=int, default=2000, help="item-level bootstrap resamples (0 = skip)")
+    ap.add_argument("--seed", type=int, default=0)
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv)
+    if args.parquet:
+        df = pd.read_parquet(args.parquet, columns=["item_id", "annotator_id"] + DIMENSIONS)
+    else:
+        df = pd.read_csv(args.csv)
     for d in DIMENSIONS:
         if d not in df.columns:
             raise ValueError(f"Missing column: {d}")
-    df["hcs"] = sum(WEIGHTS[d]*df[d] for d in DIMENSIONS)
+    cols = DIMENSIONS + ["hcs"]
+    df["hcs"] = df[DIMENSIONS].to_numpy(dtype=float) @ np.array([WEIGHTS[d] for d in DIMENSIONS])
 
-    item_stats = {}
-    for col in DIMENSIONS + ["hcs"]:
-        grp = df.groupby("item_id")[col]
-        item_stats[col] = {
-            "mean_of_item_means": float(grp.mean().mean()),
-            "std_of_item_means": float(grp.mean().std(ddof=1)),
-            "mean_of_item_stds": float(grp.std(ddof=1).mean()),
-        }
+    grp = df.groupby("item_id", sort=True)[cols]
+    means, stds = grp.mean(), grp.std(ddof=1)
+    item_stats = {col: {"mean_of_item_means": float(means[col].mean()),
+                        "std_of_item_means": float(means[col].std(ddof=1)),
+                        "mean_of_item_stds": float(stds[col].mean())} for col in cols}
 
+    mean, std = df[cols].mean(), df[cols].std(ddof=1)
     global_stats = {}
-    for col in DIMENSIONS + ["hcs"]:
-        mean = df[col].mean()
-        std = df[col].std(ddof=1)
-        lo, hi = ci95(mean, std, len(df))
-        global_stats[col] = {"mean": float(mean), "std": float(std), "ci95": [float(lo), float(hi)]}
+    for col in cols:
+        lo, hi = ci95(mean[col], std[col], len(df))
+        global_stats[col] = {"mean": float(mean[col]), "std": float(std[col]), "ci95": [float(lo), float(hi)]}
+    if args.bootstrap:
+        lo, hi = bootstrap_ci(grp.sum().to_numpy(), grp.size().to_numpy(), n_boot=args.bootstrap, seed=args.seed)
+        for c, col in enumerate(cols):
+            global_stats[col]["bootstrap_ci95"] = [float(lo[c]), float(hi[c])]
 
-    kappas = {}
-    for dim in DIMENSIONS:
-        mat = []
-        for item_id, g in df.groupby("item_id"):
-            counts = [(g[dim] == c).sum() for c in CATEGORIES]
-            mat.append(counts)
-        mat = np.asarray(mat, dtype=float)
-        kappa = fleiss_kappa(mat)
-        kappas[dim] = float(kappa)
+    counts = count_matrices(df["item_id"].to_numpy(), df[DIMENSIONS].to_numpy(dtype=float), CATEGORIES)
+    kappas = dict(zip(DIMENSIONS, map(float, fleiss_kappa(counts))))
 
     report = {
         "weights": WEIGHTS,
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# run_pipeline.py
+# Incremental corpus -> tokenizer -> export -> [embed_quant] -> [capture_in -> quant_plan] -> quant -> capture -> eigs
+# -> [rank_plan] -> adapters -> pack runner (bracketed stages run when their plan is configured).
+# Each per-layer artifact is keyed by a hash of its input files and the relevant config;
+# only stale layers are recomputed, and independent layers run in parallel.
+
+import argparse, time, yaml
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dac_q4_its import pipeline
+from dac_q4_its.data.build_corpus import write_corpus
+from dac_q4_its.utils.cache import ArtifactCache
+from dac_q4_its.utils.io import convert_pkl_dir
+
+CORPUS = "artifacts/calibration.txt"
+TOKENIZER_TEXT = ["data/samples/nln_samples.jsonl"]
+CONTAINER = "artifacts/model.dacq"
+DEPLOY_KINDS = ["W_qint4", "scales"]  # + pipeline.adapter_kinds(acfg)
+
+def run_stage(cache, name, jobs, workers=1, force=False, dry_run=False):
+    """jobs: list of (inputs, config, outputs, fn). Runs the stale ones, returns (ran, cached)."""
+    t0 = time.perf_counter()
+    todo, restored = [], 0
+    for inputs, config, outputs, fn in jobs:
+        key = cache.key(inputs, {"stage": name, "config": config})
+        if not force and cache.fresh(outputs, key):
+            continue
+        if not force and not dry_run and cache.restore(outputs, key):
+            restored += 1
+            continue
+        todo.append((key, outputs, fn))
+    if not dry_run:
+        def run(job):
+            key, outputs, fn = job
+            fn()
+            cache.record(outputs, key)
+        with ThreadPoolExecutor(max(1, workers)) as ex:
+            list(ex.map(run, todo))
+        cache.save()
+    print(f"[{name}] {'would run' if dry_run else 'ran'} {len(todo)}/{len(jobs)} "
+          f"({len(jobs) - len(todo) - restored} cached, {restored} restored) in {time.perf_counter() - t0:.2f}s")
+    return len(todo), len(jobs) - len(todo)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=4, help="layers processed in parallel")
+    ap.add_argument("--capture-workers", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0, help="toy weight init seed")
+    ap.add_argument("--force", action="store_true", help="ignore the cache and recompute everything")
+    ap.add_argument("--dry-run", action="store_true", help="only report what is stale (stops at the first stale stage)")
+    ap.add_argument("--keep-objects", action="store_true",
+                    help="keep a copy of every output set in artifacts/.cache/objects so config switches restore them")
+    ap.add_argument("--cache-max-mb", type=float, default=1024,
+                    help="with --keep-objects: evict least recently used copies beyond this size after the run")
+    ap.add_argument("--gc", action="store_true", help="only evict cached copies down to --cache-max-mb (0 clears them)")
+    args = ap.parse_args()
+
+    if args.gc:
+        evicted, kept = ArtifactCache().gc(int(args.cache_max_mb * 2**20))
+        print(f"[gc] evicted {evicted} cached output sets, {kept / 2**20:.1f} MB kept")
+        return
+
+    mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
+    qcfg = yaml.safe_load(open("configs/quant/int4_dynamic.yml"))
+    acfg = yaml.safe_load(open("configs/adapter/rank8_zero_init.yml"))
+    layers = range(mcfg["n_layers"])
+    path = pipeline.layer_path
+    cache = ArtifactCache(keep_objects=args.keep_objects)
+
+    def stage(name, jobs, workers=1):
+        ran, _ = run_stage(cache, name, jobs, workers, args.force, args.dry_run)
+        if args.dry_run and ran:
+            raise SystemExit(0)  # later stages' inputs are not built yet
+
+    stage("corpus", [([], {"n": 2000}, [CORPUS], lambda: write_corpus(CORPUS, n=2000))])
+    tokenizer = pipeline.tokenizer_path()
+    stage("tokenizer", [([CORPUS] + TOKENIZER_TEXT, {"vocab_size": 4000}, [tokenizer],
+                         lambda: pipeline.tokenizer_stage(mcfg, [CORPUS] + TOKENIZER_TEXT))])
+    embed = pipeline.embed_path()
+    stage("export", [([], {"model": mcfg, "seed": args.seed}, [path("W_fp32", li) for li in layers] + [embed],
+                      lambda: pipeline.export_fp_weights(mcfg, seed=args.seed))])
+    embed_files = [embed]
+    if qcfg.get("embedding"):  # the quantized table replaces embed_fp32 in the deployment container
+        embed_files = [pipeline.embed_path(kind=k) for k in pipeline.EMBED_KINDS]
+        stage("embed_quant", [([embed], qcfg["embedding"], embed_files,
+                               lambda: pipeline.quantize_embedding(qcfg["embedding"]))])
+    elif not args.dry_run:
+        pipeline.clear_embedding()  # a stale embed_q.pkl would still be loaded by the per-pickle path
+    quant_plan = [pipeline.quant_plan_path()] if qcfg.get("mixed") else []
+    if quant_plan:  # formats couple the layers through the shared budget
+        stage("capture_in", [([CORPUS, tokenizer, embed] + [path("W_fp32", li) for li in layers], {"model": mcfg},
+                              [path("cov_in", li) for li in layers],
+                              lambda: pipeline.capture_stage(mcfg, CORPUS, workers=args.capture_workers,
+                                                             which="input"))])
+        stage("quant_plan", [([path(k, li) for li in layers for k in ("W_fp32", "cov_in")], qcfg, quant_plan,
+                              lambda: pipeline.precision_plan_stage(qcfg, layers))])
+    stage("quant", [([path("W_fp32", li)] + quant_plan, qcfg, [path("W_qint4", li), path("scales", li)],
+                     lambda li=li: pipeline.quantize_layer(li, qcfg, fmt=pipeline.layer_format(li, qcfg)))
+                    for li in layers], args.jobs)
+    stage("capture", [([CORPUS, tokenizer, embed] + [path("W_fp32", li) for li in layers], {"model": mcfg},
+                       [path("cov", li) for li in layers],
+                       lambda: pipeline.capture_stage(mcfg, CORPUS, workers=args.capture_workers))])
+    eig_cfg = {"rank": pipeline.eig_rank(acfg), "eig_solver": acfg.get("eig_solver", "eigh")}
+    stage("eigs", [([path("cov", li)], eig_cfg, [path("Vk", li), path("evals", li)],
+                    lambda li=li: pipeline.eigvecs_layer(li, acfg)) for li in layers], args.jobs)
+    adapter_inputs = [path(k, li) for li in layers for k in ("W_qint4", "scales", "W_fp32", "Vk", "evals")]
+    plan = [pipeline.rank_plan_path()] if acfg.get("rank_budget") else []
+    if plan:  # ranks couple the layers through the shared budget, so this stage sees all of them
+        stage("rank_plan", [(adapter_inputs, acfg, plan, lambda: pipeline.rank_plan_stage(acfg, layers))])
+    stage("adapters", [([path(k, li) for k in ("W_qint4", "scales", "W_fp32", "Vk")] + plan, acfg,
+                        [path(k, li) for k in pipeline.adapter_kinds(acfg)],
+                        lambda li=li: pipeline.adapters_layer(li, rank=pipeline.layer_rank(li, acfg),
+                                                              dtype=acfg.get("dtype", "fp32")))
+                       for li in layers], args.jobs)
+    deploy = DEPLOY_KINDS + pipeline.adapter_kinds(acfg)
+    stage("pack", [(embed_files + [path(k, li) for li in layers for k in deploy] + quant_plan + plan,
+                    {"model": mcfg}, [CONTAINER],
+                    lambda: convert_pkl_dir("artifacts/weights", CONTAINER,
+                                            patterns=[Path(p).name for p in embed_files] +
+                                                     [f"layer_*_{k}.pkl" for k in deploy],
+                                            metadata={"model": mcfg,
+                                                      **pipeline.plan_metadata(qcfg, acfg)}))])
+    if args.keep_objects and not args.dry_run:
+        evicted, kept = cache.gc(int(args.cache_max_mb * 2**20))
+        print(f"[gc] evicted {evicted} cached output sets, {kept / 2**20:.1f} MB kept")
+
+if __name__ == "__main__":
+    main()
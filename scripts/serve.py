@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# serve.py
+# Load the compressed model once and serve prompts with dynamic micro-batching.
+#   python scripts/serve.py --unix /tmp/dac.sock
+#   python scripts/serve.py --bench 2000 --concurrency 64   # in-process load test, prints stats
+#   python scripts/serve.py --cache-size 4096 --cache-file artifacts/result_cache.json   # warm-started result cache
+
+import argparse, asyncio, json, yaml, torch
+from dac_q4_its.adapters.inject import STRATEGIES
+from dac_q4_its.data.tokenization import load_encoder
+from dac_q4_its.modeling.compressed import build_compressed_model
+from dac_q4_its.modeling.decode import toy_decode_batch
+from dac_q4_its.runtimes.result_cache import ResultCache, artifact_version
+from dac_q4_its.modeling.grammar import GrammarDecoder
+from dac_q4_its.data.rules import load_lexicons
+from dac_q4_its.runtimes.serving import MicroBatcher, grammar_runner, model_runner, serve
+
+PROMPTS = ["navigate to airport avoiding tolls", "find a route to downtown with minimal traffic",
+           "get me to central station before 8 am", "route to university taking a scenic route"]
+
+async def bench(run_batch, n, concurrency, max_batch_size, max_delay_ms, cache=None):
+    batcher = MicroBatcher(run_batch, max_batch_size, max_delay_ms, cache=cache).start()
+    sem = asyncio.Semaphore(concurrency)
+    async def one(i):
+        async with sem:
+            return await batcher.submit(PROMPTS[i % len(PROMPTS)])
+    await asyncio.gather(*(one(i) for i in range(n)))
+    stats = batcher.stats.summary()
+    if cache is not None:
+        stats["cache"] = cache.stats()
+    return stats
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--unix", type=str, default=None, help="Unix socket path (default: TCP --host/--port)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--max-batch-size", type=int, default=32)
+    ap.add_argument("--max-delay-ms", type=float, default=5.0)
+    ap.add_argument("--strategy", choices=STRATEGIES, default="fused")
+    ap.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    ap.add_argument("--bench", type=int, default=0, help="run N in-process requests and print stats instead of serving")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--decoder", choices=["grammar", "toy"], default="grammar")
+    ap.add_argument("--cache-size", type=int, default=0,
+                    help="result cache entries (0 = off; --bench then measures cache hits, not batching)")
+    ap.add_argument("--cache-ttl", type=float, default=None, help="result cache TTL in seconds")
+    ap.add_argument("--cache-file", type=str, default=None, help="warm-start file, rewritten on shutdown")
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    mcfg = yaml.safe_load(open("configs/model/llama-1b.yml"))
+    model = build_compressed_model(mcfg, strategy=args.strategy)
+    encode = load_encoder(mcfg["vocab_size"])
+    if args.decoder == "grammar":
+        decoder = GrammarDecoder.from_lexicons(load_lexicons("data/lexicons.yaml"), encode, mcfg["vocab_size"])
+        run_batch = grammar_runner(model, encode, decoder)
+    else:
+        run_batch = model_runner(model, encode, toy_decode_batch)
+    cache = None
+    if args.cache_size:
+        version = artifact_version(extra={"decoder": args.decoder, "strategy": args.strategy})
+        cache = ResultCache(args.cache_size, args.cache_ttl, version=version)
+        if args.cache_file:
+            print(f"Result cache: {cache.load(args.cache_file)} warm entries")
+    try:
+        if args.bench:
+            stats = asyncio.run(bench(run_batch, args.bench, args.concurrency, args.max_batch_size,
+                                      args.max_delay_ms, cache))
+            print(json.dumps(stats, indent=2))
+            return
+        where = args.unix or f"{args.host}:{args.port}"
+        print(f"Serving on {where} (max_batch_size={args.max_batch_size}, max_delay_ms={args.max_delay_ms})")
+        asyncio.run(serve(run_batch, args.unix, args.host, args.port, args.max_batch_size, args.max_delay_ms, cache))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None and args.cache_file:
+            cache.save(args.cache_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+DAC+Q4-ITS: INT4 base weights with low-rank adapter compensation.
+
+Public entry points are resolved on first attribute access, so `import dac_q4_its` stays cheap
+and the runtime path never loads training-only modules (eigensolvers, calibration capture, pipeline).
+"""
+import importlib
+
+_LAZY = {
+    "CompressedLinear": "dac_q4_its.adapters.inject",
+    "AdapterBankLinear": "dac_q4_its.adapters.inject",
+    "build_compressed_model": "dac_q4_its.modeling.compressed",
+    "save_snapshot": "dac_q4_its.modeling.compressed",
+    "load_snapshot": "dac_q4_its.modeling.compressed",
+    "save_tensors": "dac_q4_its.utils.io",
+    "load_tensors": "dac_q4_its.utils.io",
+}
+__all__ = list(_LAZY)
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
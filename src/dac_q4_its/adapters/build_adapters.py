@@ -1,11 +1,48 @@
 import torch
 
+ADAPTER_DTYPES = ("fp32", "fp16", "bf16", "int8")
+
 @torch.no_grad()
 def build_adapters(Vk: torch.Tensor, dW: torch.Tensor):
     """
     Vk: [d, k], dW: [out=d, in=d]
-    U = Vk, D = Vk^T dW  (rank-k)
+    U = Vk, D = Vk^T dW  (rank-k; k = 0 gives empty U/D, i.e. no adapter)
     """
     U = Vk          # [d, k]
     D = Vk.T @ dW   # [k, d]
     return U.contiguous(), D.contiguous()
+
+@torch.no_grad()
+def quantize_adapters(U: torch.Tensor, D: torch.Tensor, dtype="fp32"):
+    """
+    Storage for the adapter factors -> (U, D, UD_scales).
+    fp16 / bf16 cast both factors. int8 quantizes U per column and D per row (symmetric); both
+    scale vectors live on the rank axis, so they fold into one UD_scales [k]:
+    U @ D ~= U8 @ diag(UD_scales) @ D8. UD_scales is None for the float dtypes.
+    """
+    if dtype == "fp32":
+        return U.float(), D.float(), None
+    if dtype in ("fp16", "bf16"):
+        dt = torch.float16 if dtype == "fp16" else torch.bfloat16
+        return U.to(dt).contiguous(), D.to(dt).contiguous(), None
+    if dtype != "int8":
+        raise ValueError(f"Unknown adapter dtype {dtype!r}, expected one of {ADAPTER_DTYPES}")
+    su = U.abs().amax(dim=0).clamp(min=1e-12) / 127   # [k] per column of U
+    sd = D.abs().amax(dim=1).clamp(min=1e-12) / 127   # [k] per row of D
+    U8 = torch.round(U / su).clamp(-127, 127).to(torch.int8)
+    D8 = torch.round(D / sd.unsqueeze(1)).clamp(-127, 127).to(torch.int8)
+    return U8.contiguous(), D8.contiguous(), (su * sd).float()
+
+def dequantize_adapters(U, D, UD_scales=None):
+    D = D.float()
+    if UD_scales is not None:
+        D = D * UD_scales.unsqueeze(1)
+    return U.float(), D
+
+@torch.no_grad()
+def residual_recovery(dW, U, D, UD_scales=None):
+    """Fraction of ||dW||_F^2 the adapter removes: 1 - ||dW - U D||^2 / ||dW||^2."""
+    Uf, Df = dequantize_adapters(U, D, UD_scales)
+    total = dW.double().pow(2).sum()
+    left = (dW.double() - Uf.double() @ Df.double()).pow(2).sum()
+    return float(1 - left / total) if total > 0 else 1.0
@@ -0,0 +1,121 @@
+import os
+import torch
+import torch.nn as nn
+from dac_q4_its.adapters.inject import CompressedLinear
+
+class CovarianceCapture:
+    """
+    Forward hooks that accumulate A^T A per projection, batch by batch, without keeping activations.
+    which="output" captures the projection output (the space U = V_k lives in), "input" its input.
+    Use as a context manager; hooks are removed on exit.
+
+        with CovarianceCapture(model) as cap:
+            for tok in batches: model(tok)
+        C, n = cap.cov["layers.0"], cap.count["layers.0"]
+    """
+    def __init__(self, model, dtype=torch.float64, which="output", types=(nn.Linear, CompressedLinear)):
+        self.model, self.dtype, self.which, self.types = model, dtype, which, types
+        self.cov, self.count, self.handles = {}, {}, []
+
+    def _hook(self, name):
+        def hook(mod, inp, out):
+            a = (out if self.which == "output" else inp[0]).detach()
+            a = a.reshape(-1, a.shape[-1]).to(self.dtype)
+            if name not in self.cov:
+                self.cov[name] = torch.zeros(a.shape[1], a.shape[1], dtype=self.dtype)
+                self.count[name] = 0
+            self.cov[name].addmm_(a.T, a)
+            self.count[name] += a.shape[0]
+        return hook
+
+    def __enter__(self):
+        for name, mod in self.model.named_modules():
+            if isinstance(mod, self.types):
+                self.handles.append(mod.register_forward_hook(self._hook(name)))
+        return self
+
+    def __exit__(self, *exc):
+        for h in self.handles:
+            h.remove()
+        self.handles = []
+
+    def partial(self):
+        return {name: (self.cov[name], self.count[name]) for name in self.cov}
+
+def merge_partials(partials):
+    """Sum per-layer (A^T A, n) pairs from several shards."""
+    out = {}
+    for part in partials:
+        for name, (C, n) in part.items():
+            if name in out:
+                out[name] = (out[name][0] + C, out[name][1] + n)
+            else:
+                out[name] = (C.clone(), n)
+    return out
+
+def corpus_limit(path, max_lines=None):
+    """Byte offset just past the first max_lines lines (the file size when None)."""
+    if max_lines is None:
+        return os.path.getsize(path)
+    with open(path, "rb") as f:
+        for _ in range(max_lines):
+            if not f.readline():
+                break
+        return f.tell()
+
+def iter_corpus_batches(path, encode, batch_size=64, shard=0, num_shards=1, max_lines=None, limit=None):
+    """
+    Stream lines of a text corpus as encoded batches. Shard k of n reads only the k-th of n byte ranges
+    of the first `limit` bytes (default: corpus_limit(path, max_lines)), taking the lines that start in it.
+    """
+    limit = corpus_limit(path, max_lines) if limit is None else limit
+    start, end = limit * shard // num_shards, limit * (shard + 1) // num_shards
+    batch = []
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # finish the line that straddles start (no-op if start is a line start)
+        while f.tell() < end:
+            line = f.readline().decode("utf-8").strip()
+            if not line:
+                continue
+            batch.append(line)
+            if len(batch) == batch_size:
+                yield encode(batch)
+                batch = []
+    if batch:
+        yield encode(batch)
+
+@torch.no_grad()
+def capture_covariances(model, batches, dtype=torch.float64, which="output"):
+    with CovarianceCapture(model, dtype=dtype, which=which) as cap:
+        for tok in batches:
+            model(tok)
+    return cap.partial()
+
+_WORKER = {}
+
+def _init_worker(model, threads):
+    torch.set_num_threads(threads)
+    _WORKER["model"] = model.eval()
+
+def _capture_shard(job):
+    path, encode, batch_size, shard, num_shards, limit, dtype, which = job
+    batches = iter_corpus_batches(path, encode, batch_size, shard, num_shards, limit=limit)
+    return capture_covariances(_WORKER["model"], batches, dtype=dtype, which=which)
+
+def capture_corpus_covariances(model, path, encode, batch_size=64, workers=1, threads_per_worker=1,
+                               dtype=torch.float64, which="output", max_lines=None):
+    """
+    Single pass over the corpus. With workers > 1 the file is split into line-aligned byte ranges, one per
+    process, each accumulating its own partial A^T A, and the partials are summed here.
+    encode must be picklable (a module-level function or functools.partial) when workers > 1.
+    """
+    if workers <= 1:
+        return capture_covariances(model.eval(), iter_corpus_batches(path, encode, batch_size, max_lines=max_lines),
+                                   dtype=dtype, which=which)
+    from concurrent.futures import ProcessPoolExecutor
+    limit = corpus_limit(path, max_lines)
+    jobs = [(path, encode, batch_size, s, workers, limit, dtype, which) for s in range(workers)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model, threads_per_worker)) as ex:
+        return merge_partials(ex.map(_capture_shard, jobs))
@@ -1,12 +1,93 @@
+import math
 import torch
 
+SOLVERS = ("auto", "eigh", "svd", "randomized", "lobpcg")
+
+def choose_solver(d: int, N: int, k: int) -> str:
+    """
+    Pick a top-k solver from the problem shape:
+      N < d            -> svd of the [N, d] activations (never forms the d x d covariance)
+      d <= 1024        -> exact eigh, cheap at this size
+      k small vs d     -> randomized subspace iteration, O(N d k) per pass
+      otherwise        -> lobpcg on the covariance
+    """
+    if N < d:
+        return "svd"
+    if d <= 1024:
+        return "eigh"
+    if 4 * (2 * k + 16) <= d:
+        return "randomized"
+    return "lobpcg"
+
+def _sorted_ascending(evals, evecs):
+    # match torch.linalg.eigh: ascending eigenvalues, largest in the last column
+    order = torch.argsort(evals)
+    return evals[order], evecs[:, order]
+
+def _randomized(matmul, d, k, dtype, oversample=None, n_iter=6, seed=0):
+    """Subspace iteration with a Gaussian start; matmul(X) = C @ X. Default block is 2k + 16 columns."""
+    g = torch.Generator().manual_seed(seed)
+    p = min(d, k + (k + 16 if oversample is None else oversample))
+    X = torch.linalg.qr(matmul(torch.randn(d, p, generator=g, dtype=dtype)))[0]
+    for _ in range(n_iter):
+        X = torch.linalg.qr(matmul(X))[0]
+    T = X.T @ matmul(X)                      # Rayleigh-Ritz on the [p, p] projection
+    evals, W = torch.linalg.eigh((T + T.T) / 2)
+    return evals[-k:], X @ W[:, -k:]
+
+@torch.no_grad()
+def topk_eigvecs_from_cov(C: torch.Tensor, k: int, solver="eigh", return_eigvals=False, **kw):
+    """
+    C: [d, d] symmetric PSD (e.g. A^T A accumulated over the corpus).
+    returns V_k: [d, k], columns ordered by ascending eigenvalue.
+    """
+    d = C.shape[0]
+    if solver == "auto":
+        solver = choose_solver(d, d, k)
+    if solver in ("eigh", "svd"):
+        evals, evecs = torch.linalg.eigh(C)
+        evals, V = evals[-k:], evecs[:, -k:]
+    elif solver == "randomized":
+        evals, V = _sorted_ascending(*_randomized(lambda X: C @ X, d, k, C.dtype, **kw))
+    elif solver == "lobpcg":
+        if d < 3 * k:
+            raise ValueError(f"lobpcg needs d >= 3k (d={d}, k={k})")
+        evals, V = _sorted_ascending(*torch.lobpcg(C, k=k, largest=True, **kw))
+    else:
+        raise ValueError(f"Unknown solver {solver!r}, expected one of {SOLVERS}")
+    return (V, evals) if return_eigvals else V
+
 @torch.no_grad()
-def topk_eigvecs_from_activations(A: torch.Tensor, k: int):
+def topk_eigvecs_from_activations(A: torch.Tensor, k: int, solver="eigh", return_eigvals=False, **kw):
     """
     A: [N, d] activations for one layer across corpus tokens.
     returns V_k: [d, k]
+    solver: "eigh" (exact, O(d^3)), "svd" (thin SVD of A, for N < d),
+            "randomized" (subspace iteration on A^T A without forming it),
+            "lobpcg", or "auto" (see choose_solver).
+    """
+    N, d = A.shape
+    if solver == "auto":
+        solver = choose_solver(d, N, k)
+    if solver == "svd":
+        _, S, Vh = torch.linalg.svd(A, full_matrices=False)
+        evals, V = (S[:k] ** 2).flip(0), Vh[:k].T.flip(1)
+    elif solver == "randomized":
+        evals, V = _sorted_ascending(*_randomized(lambda X: A.T @ (A @ X), d, k, A.dtype, **kw))
+    else:
+        return topk_eigvecs_from_cov(A.T @ A, k, solver=solver, return_eigvals=return_eigvals, **kw)
+    return (V, evals) if return_eigvals else V
+
+@torch.no_grad()
+def eigenspace_accuracy(C: torch.Tensor, V: torch.Tensor):
+    """
+    Compare an approximate top-k basis V [d, k] with the exact eigh result on C [d, d].
+    captured_energy: tr(V^T C V) / tr(V_ref^T C V_ref)  (1.0 = as good as exact)
+    max_angle_deg:   largest principal angle between span(V) and span(V_ref)
     """
-    C = A.T @ A
-    eigvals, eigvecs = torch.linalg.eigh(C)
-    V = eigvecs[:, -k:]
-    return V
+    k = V.shape[1]
+    V_ref = topk_eigvecs_from_cov(C, k, solver="eigh")
+    Vq = torch.linalg.qr(V.to(C.dtype))[0]
+    energy = torch.trace(Vq.T @ C @ Vq) / torch.trace(V_ref.T @ C @ V_ref).clamp(min=1e-30)
+    cos = torch.linalg.svdvals(V_ref.T @ Vq).clamp(max=1.0)
+    return {"captured_energy": float(energy), "max_angle_deg": math.degrees(float(torch.arccos(cos.min())))}
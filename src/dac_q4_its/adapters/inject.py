@@ -1,19 +1,263 @@
 import torch
 import torch.nn as nn
+from dac_q4_its.quantization.int4_dynamic import unpack_int4, quantize_activations_per_token, int_matmul
+from dac_q4_its.quantization.mixed import apply_scales
+from dac_q4_its.runtimes import profiling
+
+STRATEGIES = ("dequant", "fused", "tiled", "cached", "w4a8")
 
 class CompressedLinear(nn.Module):
     """
     y = (dequant(Q) @ x) + U @ (D @ x)
+    U: [out, k], D: [k, in]; k varies per layer and may be 0 (see adapters/rank_plan.py).
+    U/D are float32, fp16/bf16, or int8 with UD_scales [k] (see adapters/build_adapters.py);
+    the adapter branch upcasts the small factors and computes in the activation dtype.
+    Q is either int8 (one value per byte), the packed uint8 layout from
+    pack_int4 (two nibbles per byte), which is unpacked block_size rows at a time in forward,
+    or float16 (unquantized layers of a mixed-precision plan, scales of ones).
+    scales: [out, 1] per row, or [out, in/g] per group of g input columns.
+
+    strategy selects how the base product is computed (see docs/index.md):
+      dequant - build Wdq = Q * scales each call, then x @ Wdq.T (reference)
+      fused   - per block of block_size rows: (x @ Q_blk.T) * scales_blk.T, the per-row (or per-group
+                partial) scale applied to the output; only one unpacked block exists at a time
+      tiled   - dequantize and multiply block_size rows at a time
+      cached  - dequantize once and keep Wdq resident (latency-critical layers)
+      w4a8    - int8 activations (per-token scales) x int8-unpacked weights, int32 accumulation,
+                rescaled by both scales; the unpacked Q.T stays resident. fp16 layers run fused.
+    strategy=None picks fused for packed Q (RAM stays at the packed size plus one block) and dequant otherwise.
     """
-    def __init__(self, Q, scales, U, D):
+    def __init__(self, Q, scales, U, D, in_features=None, strategy=None, block_size=128, UD_scales=None):
         super().__init__()
-        self.register_buffer("Q", Q)            # int8
+        self.packed = Q.dtype == torch.uint8
+        self.in_features = in_features or (Q.shape[1] * 2 if self.packed else Q.shape[1])
+        self.block_size = block_size
+        self.register_buffer("Q", Q)            # int8, uint8 packed int4, or float16
         self.register_buffer("scales", scales)  # float
-        self.register_buffer("U", U)            # float32
-        self.register_buffer("D", D)            # float32
+        self.register_buffer("U", U)            # float32, fp16 / bf16, or int8
+        self.register_buffer("D", D)
+        self.register_buffer("UD_scales", UD_scales)  # int8 U/D only: [k], or [A, k] in a bank
+        self.register_buffer("Wdq", None, persistent=False)  # filled by strategy="cached"
+        self.register_buffer("Wq8", None, persistent=False)  # int8 Q.T [in, out], filled by strategy="w4a8"
+        self.set_strategy(strategy)
+
+    def set_strategy(self, strategy=None):
+        strategy = strategy or ("fused" if self.packed else "dequant")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.strategy = strategy
+        self.Wdq = self.Wq8 = None
+        return self
+
+    @property
+    def integer(self):
+        """True when the base product runs in integer arithmetic (w4a8 on a quantized Q)."""
+        return self.strategy == "w4a8" and self.Q.dtype != torch.float16
+
+    def qweight(self, r0=0, r1=None):
+        Q = self.Q[r0:r1]
+        return unpack_int4(Q, self.in_features) if self.packed else Q
+
+    def dequant_weight(self, r0=0, r1=None):
+        return apply_scales(self.qweight(r0, r1).float(), self.scales[r0:r1])
+
+    @property
+    def blocked(self):
+        """True when the base product streams block_size rows at a time (fused, tiled, w4a8 on fp16 layers)."""
+        return self.strategy in ("fused", "tiled") or (self.strategy == "w4a8" and not self.integer)
+
+    def block_operand(self, x, r0, r1):
+        """Weight rows [r0, r1) for a blocked strategy: unpacked Q (fused) or dequantized (tiled)."""
+        if self.strategy == "tiled":
+            return self.dequant_weight(r0, r1)
+        return self.qweight(r0, r1).to(x.dtype)
+
+    def block_matmul(self, x, W, r0, r1):
+        """x: [B, in], W: block_operand rows [r0, r1) -> output columns [B, r1 - r0]."""
+        if self.strategy == "tiled":
+            return x @ W.T
+        S = self.scales[r0:r1]
+        G = S.shape[1]
+        if G == 1:
+            return (x @ W.T) * S.T
+        xg = x.reshape(x.shape[0], G, -1).transpose(0, 1)                   # [G, B, g]
+        Wg = W.reshape(W.shape[0], G, -1).permute(1, 2, 0)                  # [G, g, rows]
+        return (torch.bmm(xg, Wg) * S.T.unsqueeze(1)).sum(dim=0)           # [B, rows]
+
+    def base_operand(self, x):
+        """Weight-side work of the base product (unpack / cast / scale); None for the blocked strategies."""
+        if self.integer:
+            if self.Wq8 is None:
+                self.Wq8 = self.qweight().T.contiguous()
+            return self.Wq8
+        if self.strategy == "cached":
+            if self.Wdq is None:
+                self.Wdq = self.dequant_weight()
+            return self.Wdq
+        if self.strategy == "dequant":
+            return self.dequant_weight()      # [d, d]
+        return None
+
+    def base_matmul(self, x, W):
+        if self.integer:
+            xq, sx = quantize_activations_per_token(x)
+            G = self.scales.shape[1]
+            if G == 1:
+                return int_matmul(xq, W).float() * sx * self.scales.T
+            g = self.in_features // G
+            acc = sum(int_matmul(xq[:, j * g:(j + 1) * g], W[j * g:(j + 1) * g]).float() * self.scales[:, j]
+                      for j in range(G))                                   # int32 partial per group
+            return acc * sx
+        if self.blocked:
+            out = x.new_empty(x.shape[0], self.Q.shape[0])
+            for r0 in range(0, self.Q.shape[0], self.block_size):
+                r1 = r0 + self.block_size
+                out[:, r0:r1] = self.block_matmul(x, self.block_operand(x, r0, r1), r0, r1)
+            return out
+        return x @ W.T
+
+    def base(self, x):  # x: [B, d] -> [B, out]
+        return self.base_matmul(x, self.base_operand(x))
+
+    @property
+    def rank(self):
+        return self.D.shape[-2]                 # 0: no adapter, the layer is just the quantized base
+
+    def adapter_factors(self):
+        """float32 (U, D) with any int8 scales folded into D; for export and for mixing storage dtypes."""
+        D = self.D.float()
+        if self.UD_scales is not None:
+            D = D * self.UD_scales.unsqueeze(-1)
+        return self.U.float(), D
+
+    def adapter(self, x):
+        z = x @ self.D.T.to(x.dtype)            # [B, k]
+        if self.UD_scales is not None:
+            z = z * self.UD_scales
+        return z @ self.U.T.to(x.dtype)         # [B, d]
 
     def forward(self, x):  # x: [B, d]
-        Wdq = (self.Q.float() * self.scales)    # [d, d]
-        main = x @ Wdq.T                        # [B, d]
-        adapt = (x @ self.D.T) @ self.U.T       # [B, d]
-        return main + adapt
+        if profiling.ACTIVE is not None:
+            return profiling.ACTIVE.run(self, x)
+        return self.base(x) + self.adapter(x) if self.rank else self.base(x)
+
+@torch.no_grad()
+def strategy_delta(model, tok, strategy, ref="dequant"):
+    """
+    Output drift of `strategy` against the reference FP path on the same artifacts.
+    model: ToyTransformer with CompressedLinear layers; tok: [B, T]. The model is left on `strategy`.
+    """
+    set_strategy(model, ref)
+    h_ref = model(tok)
+    set_strategy(model, strategy)
+    h = model(tok)
+    err = (h - h_ref).abs()
+    cos = torch.nn.functional.cosine_similarity(h, h_ref, dim=1)
+    return {"strategy": strategy, "ref": ref, "max_abs_err": float(err.max()),
+            "rel_err": float((h - h_ref).norm() / h_ref.norm().clamp(min=1e-12)), "min_cosine": float(cos.min())}
+
+def set_strategy(model, strategy, layers=None):
+    """Set the execution strategy on every CompressedLinear (or only the given layer indices)."""
+    for li, mod in enumerate(model.layers):
+        if isinstance(mod, CompressedLinear) and (layers is None or li in layers):
+            mod.set_strategy(strategy)
+    return model
+
+class QuantizedEmbedding(nn.Module):
+    """
+    Embedding table stored like the projections: rows quantized (int8, packed int4, optionally grouped;
+    see quantization/mixed.py) plus an optional low-rank residual, E ~= dequant(Q) + U @ D.
+    A lookup unpacks and scales only the gathered rows; the FP table is never materialized.
+    Q: [V, H] int8 or [V, ceil(H/2)] uint8, scales: [V, 1] or [V, H/g], U: [V, r], D: [r, H].
+    """
+    def __init__(self, Q, scales, U=None, D=None, embedding_dim=None):
+        super().__init__()
+        self.packed = Q.dtype == torch.uint8
+        self.num_embeddings = Q.shape[0]
+        self.embedding_dim = embedding_dim or (Q.shape[1] * 2 if self.packed else Q.shape[1])
+        if U is None:
+            U, D = torch.zeros(Q.shape[0], 0), torch.zeros(0, self.embedding_dim)
+        self.register_buffer("Q", Q)
+        self.register_buffer("scales", scales)
+        self.register_buffer("U", U)            # [V, r]
+        self.register_buffer("D", D)            # [r, H]
+
+    @property
+    def rank(self):
+        return self.D.shape[0]
+
+    def qrows(self, ids):
+        """ids: [N] -> int8 [N, H]."""
+        Q = self.Q.index_select(0, ids)
+        return unpack_int4(Q, self.embedding_dim) if self.packed else Q
+
+    def forward(self, x):  # x: token ids, any shape -> [..., H]
+        ids = x.reshape(-1)
+        E = apply_scales(self.qrows(ids).float(), self.scales.index_select(0, ids))
+        if self.rank:
+            E = E + self.U.index_select(0, ids) @ self.D
+        return E.reshape(*x.shape, self.embedding_dim)
+
+    @property
+    def weight(self):
+        """The full dequantized [V, H] table, for export and tests; lookups never build it."""
+        return self(torch.arange(self.num_embeddings))
+
+class AdapterBankLinear(CompressedLinear):
+    """
+    One quantized base (Q, scales) shared by A rank-k adapters:
+    y_b = dequant(Q) @ x_b + U[a_b] @ (D[a_b] @ x_b),  a_b = adapter_ids[b]
+    U: [A, d, k], D: [A, k, d]. Adapters of lower rank are zero-padded to k.
+    mode="grouped" runs one matmul per distinct adapter in the batch,
+    mode="gathered" gathers per-request U/D and runs a single bmm.
+    """
+    def __init__(self, Q, scales, U, D, names=None, mode="grouped", **kw):
+        super().__init__(Q, scales, U, D, **kw)
+        self.names = list(names) if names is not None else [str(a) for a in range(U.shape[0])]
+        self.mode = mode
+
+    @classmethod
+    def from_compressed(cls, layers, names=None, **kw):
+        """Stack the adapters of CompressedLinear layers that share the same Q/scales."""
+        base = layers[0]
+        for lin in layers[1:]:
+            if not (torch.equal(lin.Q, base.Q) and torch.equal(lin.scales, base.scales)):
+                raise ValueError("All adapters in a bank must share the same quantized base")
+        k = max(lin.U.shape[1] for lin in layers)
+        if len({lin.U.dtype for lin in layers}) > 1:  # mixed storage: bank the factors as float32
+            factors = [lin.adapter_factors() for lin in layers]
+            scales = None
+        else:
+            factors = [(lin.U, lin.D) for lin in layers]
+            scales = None if base.UD_scales is None else torch.stack(
+                [nn.functional.pad(lin.UD_scales, (0, k - lin.rank), value=1.0) for lin in layers])
+        U = torch.stack([nn.functional.pad(u, (0, k - u.shape[1])) for u, _ in factors])
+        D = torch.stack([nn.functional.pad(d, (0, 0, 0, k - d.shape[0])) for _, d in factors])
+        kw.setdefault("in_features", base.in_features)
+        kw.setdefault("strategy", base.strategy)
+        return cls(base.Q, base.scales, U, D, names=names, UD_scales=scales, **kw)
+
+    def adapter_index(self, name):
+        return self.names.index(name)
+
+    def adapter(self, x, adapter_ids=None):
+        if adapter_ids is None:
+            adapter_ids = torch.zeros(x.shape[0], dtype=torch.long, device=x.device)
+        if self.mode == "gathered":
+            z = torch.bmm(self.D[adapter_ids].to(x.dtype), x.unsqueeze(-1))        # [B, k, 1]
+            if self.UD_scales is not None:
+                z = z * self.UD_scales[adapter_ids].unsqueeze(-1)
+            return torch.bmm(self.U[adapter_ids].to(x.dtype), z).squeeze(-1)       # [B, d]
+        out = x.new_zeros(x.shape[0], self.U.shape[1])
+        for a in adapter_ids.unique().tolist():
+            rows = (adapter_ids == a).nonzero(as_tuple=True)[0]
+            z = x.index_select(0, rows) @ self.D[a].T.to(x.dtype)
+            if self.UD_scales is not None:
+                z = z * self.UD_scales[a]
+            out.index_copy_(0, rows, z @ self.U[a].T.to(x.dtype))
+        return out
+
+    def forward(self, x, adapter_ids=None):  # x: [B, d], adapter_ids: [B] long
+        if profiling.ACTIVE is not None:
+            return profiling.ACTIVE.run(self, x, adapter_ids)
+        return self.base(x) + self.adapter(x, adapter_ids) if self.rank else self.base(x)
@@ -0,0 +1,85 @@
+"""
+Per-layer adapter ranks under one global budget.
+
+A rank-r adapter built from the top-r output eigenvectors V_r removes V_r V_r^T dW from the
+quantization error, i.e. it captures ||V_r^T dW||_F^2 of ||dW||_F^2. V is orthonormal, so the
+captured energy is a sum of per-direction gains. Each layer's captured-energy curve is reduced
+to its upper concave hull, and hull segments from all layers are bought greedily by gain per
+unit cost (a segment is bought whole, since part of it can be worth less than its slope); leftover
+budget goes rank by rank to the best next direction. Layers that never win anything get rank 0.
+"""
+import torch
+
+DTYPE_BYTES = {"fp32": 4, "fp16": 2, "bf16": 2, "int8": 1}
+
+@torch.no_grad()
+def direction_gains(Vk, dW):
+    """
+    Vk: [d_out, k] eigenvectors, ascending eigenvalue (as from topk_eigvecs_*); dW: [d_out, d_in].
+    returns [k] gains ||v_i^T dW||^2, largest eigenvalue first (gain of going from rank i to i+1).
+    """
+    return (Vk.flip(1).T.double() @ dW.double()).pow(2).sum(dim=1)
+
+def rank_cost(d_out, d_in, unit="bytes", dtype="fp32"):
+    """Cost of one rank unit of U [d_out, r] + D [r, d_in]: stored bytes, or multiply-adds x2 per token."""
+    if unit == "bytes":
+        return (d_out + d_in) * DTYPE_BYTES[dtype]
+    if unit == "flops":
+        return 2 * (d_out + d_in)
+    raise ValueError(f"Unknown budget unit {unit!r}, expected 'bytes' or 'flops'")
+
+def _hull(gains):
+    """Upper concave hull of the cumulative-gain curve -> [(r0, r1, gain per rank)], slopes decreasing."""
+    G = [0.0]
+    for g in gains.tolist():
+        G.append(G[-1] + g)
+    pts = [0]
+    for r in range(1, len(G)):
+        while len(pts) >= 2:
+            a, b = pts[-2], pts[-1]
+            if (G[b] - G[a]) * (r - a) > (G[r] - G[a]) * (b - a):  # b stays above the chord a -> r
+                break
+            pts.pop()
+        pts.append(r)
+    return [(a, b, (G[b] - G[a]) / (b - a)) for a, b in zip(pts, pts[1:])]
+
+def plan_ranks(gains, costs, budget, totals=None, min_gain=0.0):
+    """
+    gains: per layer, [k_l] direction gains (direction_gains); costs: per layer, cost of one rank unit.
+    budget: total cost over all layers. totals / min_gain: skip hull segments whose gain per rank is
+    below min_gain * totals[l] (the layer's ||dW||_F^2), so near-useless adapters stay at rank 0.
+    returns per-layer ranks in [0, k_l].
+    """
+    ranks = [0] * len(gains)
+    floor = [min_gain * t for t in totals] if totals is not None else [0.0] * len(gains)
+    segs = [(slope / c, li, r0, r1) for li, (g, c) in enumerate(zip(gains, costs))
+            for r0, r1, slope in _hull(g) if slope > floor[li]]
+    segs.sort(key=lambda s: -s[0])
+    left, blocked = budget, set()
+    for _, li, r0, r1 in segs:
+        if li in blocked or ranks[li] != r0:  # a layer's segments must be bought in order
+            continue
+        if (r1 - r0) * costs[li] > left:      # part of a segment may be worth less than its slope
+            blocked.add(li)
+            continue
+        ranks[li] = r1
+        left -= (r1 - r0) * costs[li]
+    while True:  # spend what is left one rank at a time, by the actual next-direction gain
+        best = max(((float(g[r]) / c, li) for li, (g, c, r) in enumerate(zip(gains, costs, ranks))
+                    if r < len(g) and c <= left and float(g[r]) > floor[li]), default=None)
+        if best is None:
+            break
+        ranks[best[1]] += 1
+        left -= costs[best[1]]
+    return ranks
+
+def plan_report(gains, totals, costs, ranks):
+    """Per-layer rank, cost and captured fraction of ||dW||^2, plus the totals."""
+    layers, captured = [], 0.0
+    for g, tot, c, r in zip(gains, totals, costs, ranks):
+        cap = float(g[:r].sum())
+        captured += cap
+        layers.append({"rank": r, "cost": r * c, "captured": cap / tot if tot else 1.0, "dW_energy": tot})
+    total = sum(totals)
+    return {"ranks": list(ranks), "cost": sum(l["cost"] for l in layers),
+            "captured": captured / total if total else 1.0, "layers": layers}
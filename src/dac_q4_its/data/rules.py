@@ -0,0 +1,135 @@
+"""
+Lexicons, rule families and templates for the synthetic NLN utterances
+(scripts/generate_synthetic_utterances.py), shared with the evaluator so reports can
+group constraint tokens by family and by the rule that produced them.
+"""
+import os, random
+from typing import List, Tuple, Dict
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# ---------------------------
+# Lexicons (defaults)
+# ---------------------------
+DEFAULT_LEX = {
+    "dests": [
+        "airport","downtown","central_station","city_hospital","university",
+        "tech_park","stadium","old_town","riverside","industrial_area"
+    ],
+    "roads": ["NH-48","Ring Road","Outer Ring Road","I-80","Maple Street","MG Road","Expressway 1"],
+    "scenic": ["city_park","lakeside","botanical_garden","hill_road"],
+    "events": ["cricket_stadium","concert_arena","Convention_Center"]
+}
+
+def load_lexicons(path: str) -> Dict[str, List[str]]:
+    lex = DEFAULT_LEX.copy()
+    if path and yaml and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            user = yaml.safe_load(f) or {}
+        for k, v in user.items():
+            if isinstance(v, list) and v:
+                lex[k] = v
+    return lex
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def canonical(s: str) -> str:
+    return s.strip().lower().replace(" ", "_")
+
+def join_constraints(tokens: List[str]) -> str:
+    return "|".join(tokens)
+
+# ---------------------------
+# Rule families
+# ---------------------------
+def rules_time(rng: random.Random) -> List[Tuple[str, List[str]]]:
+    # returns (phrase, [tokens])
+    time_rules = [
+        ("during rush hour", ["rush_hour"]),
+        ("before 8 am", ["arrive_before:08:00"]),
+        ("before 9 am", ["arrive_before:09:00"]),
+        ("after 7 pm", ["depart_after:19:00"]),
+        ("after 8 pm", ["depart_after:20:00"]),
+    ]
+    return time_rules
+
+def rules_weather(rng: random.Random) -> List[Tuple[str, List[str]]]:
+    weather_rules = [
+        ("in heavy rain", ["weather:heavy_rain","avoid_flooded"]),
+        ("with dense fog", ["weather:fog","low_visibility"]),
+        ("during snowfall", ["weather:snow","slippery_roads"]),
+        ("in heatwave conditions", ["weather:heatwave"]),
+    ]
+    return weather_rules
+
+def rules_detour(rng: random.Random, lex: Dict[str, List[str]]) -> List[Tuple[str, List[str]]]:
+    roads = lex["roads"]
+    scenic = lex["scenic"]
+    # pick a few deterministic samples from roads/scenic via slicing
+    detour_rules = [
+        ("avoiding tolls", ["avoid_tolls"]),
+        (f"avoiding construction on {roads[4]}", [f"avoid_construction:{canonical(roads[4])}"]),
+        ("taking a scenic route", ["prefer_scenic"]),
+        (f"passing through {scenic[0]}", [f"via:{canonical(scenic[0])}"]),
+        (f"taking the next exit toward {roads[0]}", [f"next_exit:{canonical(roads[0])}"]),
+        ("avoiding highways", ["avoid_highways"]),
+        ("prefer highways", ["prefer_highways"]),
+    ]
+    return detour_rules
+
+def rules_traffic(rng: random.Random, lex: Dict[str, List[str]]) -> List[Tuple[str, List[str]]]:
+    events = lex["events"]
+    roads = lex["roads"]
+    traffic_rules = [
+        ("with minimal traffic", ["min_traffic"]),
+        (f"avoiding gridlock near the {events[0]}", [f"avoid_gridlock:{canonical(events[0])}"]),
+        (f"avoiding congestion on {roads[0]}", [f"avoid_congestion:{canonical(roads[0])}"]),
+        ("taking the fastest route", ["prefer_fastest"]),
+    ]
+    return traffic_rules
+
+# ---------------------------
+# Templates
+# ---------------------------
+BASE_TEMPLATES = [
+    "navigate to {dest} {mods}",
+    "find a route to {dest} {mods}",
+    "get me to {dest} {mods}",
+    "plan a trip to {dest} {mods}",
+    "route to {dest} {mods}",
+]
+
+def render_sentence(template_id: int, dest: str, modifiers: List[str]) -> str:
+    # natural conjunctions
+    if not modifiers:
+        mods = ""
+    elif len(modifiers) == 1:
+        mods = modifiers[0]
+    else:
+        mods = ", ".join(modifiers[:-1]) + " and " + modifiers[-1]
+    s = BASE_TEMPLATES[template_id].format(dest=dest.replace("_"," "), mods=mods).strip()
+    s = " ".join(s.split())  # normalize spaces
+    return s
+
+# ---------------------------
+# Token -> rule lookup (for evaluation breakdowns)
+# ---------------------------
+FAMILIES = ("time", "weather", "detour", "traffic")
+
+def rule_families(lex: Dict[str, List[str]], rng: random.Random = None):
+    """[(family, [(phrase, [tokens]), ...]), ...] in generator order."""
+    rng = rng or random.Random(0)
+    return list(zip(FAMILIES, [rules_time(rng), rules_weather(rng), rules_detour(rng, lex), rules_traffic(rng, lex)]))
+
+def constraint_index(lex: Dict[str, List[str]] = None) -> Dict[str, Tuple[str, int]]:
+    """constraint token -> (family, rule id). A rule can emit several tokens (e.g. heavy rain)."""
+    index, rid = {}, 0
+    for fam, rules in rule_families(lex or load_lexicons(None)):
+        for _, toks in rules:
+            for tok in toks:
+                index.setdefault(tok, (fam, rid))
+            rid += 1
+    return index
@@ -0,0 +1,154 @@
+"""
+Deterministic index space for synthetic NLN utterances.
+
+Every example is a pure function of its position j, so the space can be streamed,
+split into shards that worker processes render independently, and concatenated into
+exactly the serial output. Capacity is known up front instead of discovered by retrying.
+
+schemes:
+  product - templates x dests x every set of 1..max_constraints distinct rules, visited in a
+            seeded affine permutation (j -> (a*j + b) mod capacity) so any prefix is well mixed.
+  legacy  - the original round-robin walk (template = i % t, dest = i % d, stride-7 rule picks),
+            keeping first occurrences. Its key repeats with period lcm(t*d*max_c, s), so one
+            period is scanned to get the capacity and the j -> i mapping.
+"""
+import json, math, random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dac_q4_its.data.rules import (BASE_TEMPLATES, canonical, join_constraints, render_sentence,
+                                   rules_time, rules_weather, rules_detour, rules_traffic)
+
+SCHEMES = ("product", "legacy")
+# lexicon key -> entries the rule builders index into (rules_detour uses roads[4])
+LEX_MIN = {"dests": 1, "roads": 5, "scenic": 1, "events": 1}
+
+def _check_lexicon(lex):
+    for key, n in LEX_MIN.items():
+        v = lex.get(key)
+        if not isinstance(v, list) or len(v) < n or not all(isinstance(x, str) and x.strip() for x in v):
+            raise ValueError(f"lexicon key {key!r} must be a list of at least {n} non-empty strings, got {v!r}")
+
+def _unrank_combination(r, s, k):
+    """r-th k-subset of range(s) in lexicographic order."""
+    out, x = [], 0
+    for slot in range(k, 0, -1):
+        while True:
+            c = math.comb(s - x - 1, slot - 1)
+            if r < c:
+                break
+            r -= c
+            x += 1
+        out.append(x)
+        x += 1
+    return out
+
+class UtteranceSpace:
+    def __init__(self, lex, compose=True, max_constraints=3, seed=2025, scheme="product"):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown scheme {scheme!r}, expected one of {SCHEMES}")
+        _check_lexicon(lex)
+        rng = random.Random(seed)
+        self.dests = lex["dests"]
+        self.singles = [(fam, phrase, toks)
+                        for fam, rules in enumerate([rules_time(rng), rules_weather(rng),
+                                                     rules_detour(rng, lex), rules_traffic(rng, lex)])
+                        for phrase, toks in rules]
+        self.t, self.d, self.s = len(BASE_TEMPLATES), len(self.dests), len(self.singles)
+        self.compose, self.max_constraints, self.scheme = compose, max_constraints, scheme
+        if scheme == "legacy":
+            self.firsts = self._legacy_firsts()
+            self.capacity = len(self.firsts)
+        else:
+            toks = [t for _, _, ts in self.singles for t in ts]
+            dup = sorted({t for t in toks if toks.count(t) > 1})
+            if dup:  # one key per rule set
+                raise ValueError(f"lexicon yields constraint tokens shared by several rules: {dup} "
+                                 f"(check the roads/scenic/events entries)")
+            K = min(max_constraints, self.s) if compose else 1
+            self.combos = [math.comb(self.s, k) for k in range(1, K + 1)]  # rule sets of size 1..K
+            self.capacity = self.t * self.d * sum(self.combos)
+            # golden-ratio stride (coprime to capacity) keeps consecutive examples far apart in the space
+            self.a = max(1, int(self.capacity * (math.sqrt(5) - 1) / 2) + rng.randrange(64))
+            while math.gcd(self.a, self.capacity) != 1:
+                self.a += 1
+            self.b = rng.randrange(self.capacity)
+
+    # legacy walk -----------------------------------------------------------
+    def _legacy_k(self, i):
+        if self.compose and self.max_constraints > 1:
+            return 1 + (i // (self.t * self.d)) % self.max_constraints
+        return 1
+
+    def _legacy_rules(self, i):
+        return [(i + j * 7) % self.s for j in range(self._legacy_k(i))]
+
+    def _legacy_firsts(self):
+        span = self.t * self.d * self.max_constraints if self.compose and self.max_constraints > 1 else \
+            math.lcm(self.t, self.d)
+        period = math.lcm(span, self.s)
+        seen, firsts = set(), []
+        for i in range(period):
+            key = (i % self.t, self.dests[i % self.d], tuple(self._tokens(self._legacy_rules(i))))
+            if key not in seen:
+                seen.add(key)
+                firsts.append(i)
+        return firsts
+
+    # shared ------------------------------------------------------------------
+    def _tokens(self, rule_ids):
+        tokens = []
+        for r in rule_ids:
+            for tok in self.singles[r][2]:
+                if tok not in tokens:
+                    tokens.append(tok)
+        return tokens
+
+    def _decode(self, j):
+        """(template id, dest, rule ids) of example j."""
+        if self.scheme == "legacy":
+            i = self.firsts[j]
+            return i % self.t, self.dests[i % self.d], self._legacy_rules(i)
+        idx = (self.a * j + self.b) % self.capacity
+        tid, idx = idx % self.t, idx // self.t
+        dest, r = self.dests[idx % self.d], idx // self.d
+        k = 1
+        for c in self.combos:
+            if r < c:
+                break
+            r -= c
+            k += 1
+        return tid, dest, _unrank_combination(r, self.s, k)
+
+    def example(self, j):
+        if not 0 <= j < self.capacity:
+            raise IndexError(f"example {j} outside capacity {self.capacity}")
+        tid, dest, rules = self._decode(j)
+        sent = render_sentence(tid, dest, [self.singles[r][1] for r in rules]).strip()
+        return {"input": sent, "target": f"DEST={canonical(dest)},CONSTRAINT={join_constraints(self._tokens(rules))}"}
+
+    def iter_range(self, start, stop):
+        for j in range(start, stop):
+            yield self.example(j)
+
+def _render_shard(space, start, stop):
+    return "".join(json.dumps(ex, ensure_ascii=False) + "\n" for ex in space.iter_range(start, stop))
+
+def write_jsonl(space, n, path, workers=1, shard_size=100000):
+    """Write examples [0, n) to path shard by shard, in order; workers > 1 renders shards in parallel."""
+    if n > space.capacity:
+        raise ValueError(f"n={n} exceeds the {space.scheme} space capacity of {space.capacity} unique examples")
+    shards = [(s, min(s + shard_size, n)) for s in range(0, n, shard_size)]
+    with open(path, "w", encoding="utf-8") as f:
+        if workers <= 1 or len(shards) <= 1:
+            for s, e in shards:
+                f.write(_render_shard(space, s, e))
+            return n
+        with ProcessPoolExecutor(workers) as ex:
+            pending = deque()
+            for s, e in shards:  # at most 2 * workers rendered shards in flight
+                pending.append(ex.submit(_render_shard, space, s, e))
+                if len(pending) >= 2 * workers:
+                    f.write(pending.popleft().result())
+            while pending:
+                f.write(pending.popleft().result())
+    return n
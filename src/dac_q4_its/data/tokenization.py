@@ -1,6 +1,172 @@
-import re
+import json, re, zlib
+from collections import Counter, OrderedDict
 
 def simple_norm(s: str) -> str:
     s = s.lower().strip()
     s = re.sub(r"\s+", " ", s)
     return s
+
+HASH_PAD, HASH_EOS = 0, 1  # reserved by hash_encode; words hash into [2, vocab_size)
+
+def hash_encode(texts, vocab_size: int, seq_len: int = 8):
+    """
+    Stable word-hash ids (2 + crc32 mod (vocab - 2); 0 = pad, 1 = eos), truncated/padded to seq_len.
+    Returns a LongTensor [len(texts), seq_len].
+    """
+    import torch
+    ids = torch.zeros(len(texts), seq_len, dtype=torch.long)
+    for i, t in enumerate(texts):
+        words = simple_norm(t).split()[:seq_len]
+        for j, w in enumerate(words):
+            ids[i, j] = 2 + zlib.crc32(w.encode("utf-8")) % (vocab_size - 2)
+    return ids
+
+# ---------------------------------------------------------------------------
+# Subword tokenizer
+# BPE-trained vocabulary, encoded by greedy longest match over a precompiled
+# character trie. Words carry a leading "▁" so word starts and continuations
+# get distinct pieces. Two LRU caches sit on the hot path: normalized utterance
+# -> ids, and word -> ids.
+# ---------------------------------------------------------------------------
+PAD, UNK, EOS = "<pad>", "<unk>", "<eos>"
+WORD_START = "▁"
+# always in the base vocabulary, so ordinary text never falls back to <unk>
+ALPHABET = WORD_START + "abcdefghijklmnopqrstuvwxyz0123456789_-:.,;'/|=&?!()"
+
+def train_tokenizer(texts, vocab_size=2000, min_freq=2):
+    """Learn BPE merges over normalized words; returns a SubwordTokenizer."""
+    words = Counter(WORD_START + w for t in texts for w in simple_norm(t).split())
+    seqs = {w: list(w) for w in words}
+    vocab = [PAD, UNK, EOS] + sorted(set(ALPHABET) | {c for w in words for c in w})
+    merges = []
+    while len(vocab) < vocab_size:
+        pairs = Counter()
+        for w, n in words.items():
+            s = seqs[w]
+            for a, b in zip(s, s[1:]):
+                pairs[a, b] += n
+        if not pairs:
+            break
+        (a, b), n = max(pairs.items(), key=lambda kv: (kv[1], kv[0]))
+        if n < min_freq:
+            break
+        merges.append((a, b))
+        vocab.append(a + b)
+        for w, s in seqs.items():
+            i, out = 0, []
+            while i < len(s):
+                if i + 1 < len(s) and s[i] == a and s[i + 1] == b:
+                    out.append(a + b)
+                    i += 2
+                else:
+                    out.append(s[i])
+                    i += 1
+            seqs[w] = out
+    return SubwordTokenizer(vocab, merges)
+
+class SubwordTokenizer:
+    def __init__(self, vocab, merges=(), cache_size=65536):
+        self.vocab = list(vocab)
+        self.merges = [tuple(m) for m in merges]
+        self.ids = {p: i for i, p in enumerate(self.vocab)}
+        self.pad_id, self.unk_id, self.eos_id = self.ids[PAD], self.ids[UNK], self.ids[EOS]
+        self.trie = self._compile()
+        self.cache_size = cache_size
+        self.utt_cache = OrderedDict()
+        self.word_cache = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def _compile(self):
+        trie = {}
+        for i, piece in enumerate(self.vocab):
+            if piece in (PAD, UNK, EOS):
+                continue
+            node = trie
+            for ch in piece:
+                node = node.setdefault(ch, {})
+            node[None] = i  # terminal
+        return trie
+
+    @staticmethod
+    def _lru_get(cache, key, limit, compute):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key], True
+        val = compute(key)
+        cache[key] = val
+        if len(cache) > limit:
+            cache.popitem(last=False)
+        return val, False
+
+    def _encode_word(self, word):
+        out, i, s = [], 0, WORD_START + word
+        while i < len(s):
+            node, j, best = self.trie, i, None
+            while j < len(s) and s[j] in node:
+                node = node[s[j]]
+                j += 1
+                if None in node:
+                    best = (node[None], j)
+            if best is None:
+                out.append(self.unk_id)
+                i += 1
+            else:
+                out.append(best[0])
+                i = best[1]
+        return out
+
+    def _encode_norm(self, norm):
+        ids = []
+        for w in norm.split():
+            ids += self._lru_get(self.word_cache, w, self.cache_size, self._encode_word)[0]
+        return tuple(ids)
+
+    def encode(self, text):
+        """text -> tuple of ids (cached on the normalized utterance)."""
+        ids, hit = self._lru_get(self.utt_cache, simple_norm(text), self.cache_size, self._encode_norm)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return ids
+
+    def encode_batch(self, texts, seq_len=None):
+        """texts -> LongTensor [B, T] right-padded with pad_id (T = longest, or truncated to seq_len)."""
+        import torch
+        seqs = [self.encode(t) for t in texts]
+        if seq_len is not None:
+            seqs = [s[:seq_len] for s in seqs]
+        lens = torch.tensor([len(s) for s in seqs], dtype=torch.long)
+        T = seq_len or max(1, int(lens.max()) if len(seqs) else 1)
+        out = torch.full((len(seqs), T), self.pad_id, dtype=torch.long)
+        mask = torch.arange(T) < lens[:, None]
+        out[mask] = torch.tensor([i for s in seqs for i in s], dtype=torch.long)
+        return out
+
+    __call__ = encode_batch
+
+    def decode(self, ids):
+        pieces = [self.vocab[i] for i in ids if i not in (self.pad_id, self.eos_id)]
+        return "".join(pieces).replace(WORD_START, " ").strip()
+
+    def save(self, path):
+        from pathlib import Path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"vocab": self.vocab, "merges": self.merges}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, cache_size=65536):
+        with open(path, "r", encoding="utf-8") as f:
+            d = json.load(f)
+        return cls(d["vocab"], d["merges"], cache_size=cache_size)
+
+def load_encoder(vocab_size, path="artifacts/tokenizer.json"):
+    """The trained tokenizer when present, else the word-hash fallback. Both map texts -> LongTensor [B, T]."""
+    import functools, os
+    if os.path.exists(path):
+        return SubwordTokenizer.load(path)
+    return functools.partial(hash_encode, vocab_size=vocab_size)
@@ -0,0 +1,121 @@
+"""
+Out-of-core merge of per-annotator CSV exports into a partitioned Parquet dataset.
+
+Phase 1 (one process per input file): read in chunks, range-check every score column in one
+vectorized pass, set aside offending rows, and spill the valid rows into hash buckets of item_id.
+Phase 2 (one process per bucket): dedup on (item_id, annotator_id), keeping the last occurrence
+in input order (later files override earlier ones), and write <out>/bucket=<b>/part-0.parquet.
+Every row of an item lands in the same bucket, and pd.read_parquet(<out>) reads the whole dataset
+(the _rejected.csv / _merge_report.json side files are skipped by the underscore prefix).
+Peak memory is one chunk per worker in phase 1 and one bucket per worker in phase 2.
+"""
+import json, shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+COLS = ["item_id","annotator_id","prompt","response","coherence","relevance","instruction_following","safety_compliance","fluency","notes"]
+SCORE_COLS = ["coherence","relevance","instruction_following","safety_compliance","fluency"]
+KEY = ["item_id","annotator_id"]
+REJECT_COLS = ["source","row","item_id","annotator_id","column","value"]
+
+def validate_chunk(df, lo=1, hi=5):
+    """
+    One pass over all score columns -> (valid rows, offending cells).
+    Offending cells: one record per (row, column) that is missing, non-numeric or outside [lo, hi].
+    """
+    raw = df[SCORE_COLS]
+    vals = raw.apply(pd.to_numeric, errors="coerce").astype(float)
+    ok = vals.ge(lo) & vals.le(hi)                                     # NaN compares False
+    row_ok = ok.all(axis=1).to_numpy()
+    r, c = np.nonzero(~ok.to_numpy())
+    bad = pd.DataFrame({"row": df.index.to_numpy()[r], "item_id": df["item_id"].to_numpy()[r],
+                        "annotator_id": df["annotator_id"].to_numpy()[r],
+                        "column": np.asarray(SCORE_COLS)[c], "value": raw.to_numpy()[r, c]})
+    good = df.loc[row_ok, COLS].copy()
+    good[SCORE_COLS] = vals.loc[row_ok]
+    return good, bad
+
+def _bucket_of(item_ids, n_buckets):
+    return (pd.util.hash_pandas_object(item_ids, index=False).to_numpy() % n_buckets).astype(np.int64)
+
+def _stage_file(fi, path, staging, n_buckets, chunksize):
+    """Phase 1 for one input file; returns (rows read, offending-cell DataFrame)."""
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in COLS if c not in header]
+    if missing:
+        raise ValueError(f"{path} missing columns: {missing}")
+    n_rows, bads = 0, []
+    # everything as text so rejected cells are reported verbatim ("n/a", "9", ...); only blanks are NA
+    reader = pd.read_csv(path, usecols=COLS, dtype="string", keep_default_na=False, na_values=[""],
+                         chunksize=chunksize)
+    for ci, chunk in enumerate(reader):
+        n_rows += len(chunk)
+        good, bad = validate_chunk(chunk)
+        if len(bad):
+            bads.append(bad.assign(source=str(path), row=bad["row"] + 2))  # 1-based file line (after header)
+        good["_order"] = (np.int64(fi) << 40) + good.index.to_numpy(dtype=np.int64)
+        buckets = _bucket_of(good["item_id"], n_buckets)
+        for b in np.unique(buckets):
+            d = staging / f"bucket={b}"
+            d.mkdir(parents=True, exist_ok=True)
+            good[buckets == b].to_parquet(d / f"f{fi}_c{ci}.parquet", index=False)
+    return n_rows, (pd.concat(bads, ignore_index=True) if bads else None)
+
+def _finish_bucket(staging_dir, out_dir):
+    """Phase 2 for one bucket; returns (rows written, duplicates dropped)."""
+    df = pd.read_parquet(staging_dir).sort_values("_order", kind="stable")
+    n = len(df)
+    df = df.drop_duplicates(KEY, keep="last").drop(columns="_order")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(out_dir / "part-0.parquet", index=False)
+    return len(df), n - len(df)
+
+OUTPUTS = ["bucket=*", "_staging", "_rejected.csv", "_merge_report.json"]  # everything merge_to_parquet writes
+
+def _clear_previous(out):
+    """Remove a previous merge's outputs from out; refuse a non-empty directory that is not one."""
+    if not out.exists():
+        return
+    ours = [p for pat in OUTPUTS for p in out.glob(pat)]
+    if any(out.iterdir()) and not any(p.name.startswith("bucket=") or p.name == "_rejected.csv" for p in ours):
+        raise ValueError(f"{out} is not empty and does not look like a merge_to_parquet output; refusing to overwrite")
+    for p in ours:
+        shutil.rmtree(p) if p.is_dir() else p.unlink()
+
+def merge_to_parquet(inputs, out_dir, n_buckets=16, chunksize=200_000, workers=1):
+    """
+    Merge CSV exports into <out_dir>/bucket=*/part-0.parquet; offending cells go to <out_dir>/_rejected.csv.
+    A previous merge in out_dir is replaced (only the OUTPUTS entries); any other non-empty directory is a ValueError.
+    """
+    out = Path(out_dir)
+    _clear_previous(out)
+    staging = out / "_staging"
+    staging.mkdir(parents=True)
+    args = [(fi, p, staging, n_buckets, chunksize) for fi, p in enumerate(inputs)]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as ex:
+            staged = list(ex.map(_stage_file, *zip(*args)))
+    else:
+        staged = [_stage_file(*a) for a in args]
+    bucket_dirs = sorted(staging.glob("bucket=*"))
+    targets = [out / d.name for d in bucket_dirs]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as ex:
+            finished = list(ex.map(_finish_bucket, bucket_dirs, targets))
+    else:
+        finished = [_finish_bucket(d, t) for d, t in zip(bucket_dirs, targets)]
+    shutil.rmtree(staging)
+
+    bad = [b for _, b in staged if b is not None]
+    bad = pd.concat(bad, ignore_index=True) if bad else pd.DataFrame(columns=REJECT_COLS)
+    bad = bad[REJECT_COLS]
+    bad.to_csv(out / "_rejected.csv", index=False)
+    report = {"inputs": [str(p) for p in inputs], "rows_read": int(sum(n for n, _ in staged)),
+              "rows_rejected": int(bad[["source", "row"]].drop_duplicates().shape[0]),
+              "offending_cells": int(len(bad)),
+              "duplicates_dropped": int(sum(d for _, d in finished)),
+              "rows_written": int(sum(n for n, _ in finished)), "buckets": len(finished)}
+    (out / "_merge_report.json").write_text(json.dumps(report, indent=2))
+    return report, bad
@@ -0,0 +1,66 @@
+"""
+Vectorized HCS (human consistency score) metrics used by scripts/compute_hcs_metrics.py.
+
+count_matrices builds the item x category tallies for every dimension with one bincount,
+fleiss_kappa handles unequal rater counts in closed form, and bootstrap_ci resamples items
+(not rows) for all score columns at once via multinomial weights and a matmul.
+"""
+import numpy as np
+
+DIMENSIONS = ["coherence","relevance","instruction_following","safety_compliance","fluency"]
+WEIGHTS = {"coherence":0.40,"relevance":0.20,"instruction_following":0.20,"safety_compliance":0.10,"fluency":0.10}
+CATEGORIES = [1,2,3,4,5]
+
+def count_matrices(item_ids, ratings, categories=CATEGORIES):
+    """
+    item_ids: [R] item labels; ratings: [R, D] category values (one column per dimension).
+    returns counts [D, N_items, K]; ratings outside categories (or NaN) are not counted.
+    """
+    items, inv = np.unique(np.asarray(item_ids), return_inverse=True)
+    ratings = np.asarray(ratings, dtype=float).reshape(len(inv), -1)
+    cats = np.asarray(categories, dtype=float)
+    N, K, D = len(items), len(cats), ratings.shape[1]
+    pos = np.searchsorted(cats, ratings)                              # [R, D]
+    pos_c = np.minimum(pos, K - 1)
+    valid = (pos < K) & (cats[pos_c] == ratings)
+    flat = (np.arange(D)[None, :] * N + inv[:, None]) * K + pos_c     # [R, D] cell index into [D, N, K]
+    return np.bincount(flat[valid], minlength=D * N * K).reshape(D, N, K)
+
+def fleiss_kappa(counts: np.ndarray) -> float:
+    """
+    counts: [N_items, K] -> float, or [D, N_items, K] -> [D] kappas; integer tallies per category per item.
+    Items may have different numbers of ratings: P_i uses each item's own n_i, items with n_i < 2
+    are dropped, and p_j pools all ratings. Equal n_i reduces to the standard Fleiss' kappa.
+    """
+    counts = np.asarray(counts, dtype=float)
+    if counts.ndim == 2:
+        return float(fleiss_kappa(counts[None])[0])
+    n = counts.sum(axis=2)                                             # [D, N]
+    keep = n >= 2
+    counts = counts * keep[..., None]
+    n_keep = keep.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        P_i = np.where(keep, (counts * (counts - 1)).sum(axis=2) / np.where(keep, n * (n - 1), 1), 0.0)
+        P_bar = P_i.sum(axis=1) / n_keep
+        p_j = counts.sum(axis=1) / counts.sum(axis=(1, 2))[:, None]   # [D, K]
+        P_e = (p_j ** 2).sum(axis=1)
+        kappa = np.where(P_e == 1.0, 1.0, (P_bar - P_e) / (1 - P_e))
+    return np.where(n_keep > 0, kappa, np.nan)
+
+def bootstrap_ci(item_sums, item_counts, n_boot=2000, alpha=0.05, seed=0, max_cells=1 << 24):
+    """
+    Percentile CI of the row-level mean, resampling items with replacement.
+    item_sums: [N, C] per-item sums of each score column; item_counts: [N] rows per item.
+    returns (lo [C], hi [C]). Resample weights are drawn in blocks of at most max_cells entries.
+    """
+    S = np.asarray(item_sums, dtype=float)
+    c = np.asarray(item_counts, dtype=float)
+    N = len(c)
+    rng = np.random.default_rng(seed)
+    block = max(1, max_cells // max(N, 1))
+    means = []
+    for b0 in range(0, n_boot, block):
+        w = rng.multinomial(N, np.full(N, 1.0 / N), size=min(block, n_boot - b0)).astype(float)  # [b, N]
+        means.append((w @ S) / (w @ c)[:, None])
+    means = np.concatenate(means)                                      # [n_boot, C]
+    return np.quantile(means, alpha / 2, axis=0), np.quantile(means, 1 - alpha / 2, axis=0)
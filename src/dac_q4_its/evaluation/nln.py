@@ -1,5 +1,12 @@
-import json, re
+import json, os, re
+from concurrent.futures import ProcessPoolExecutor
 from typing import Tuple
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
 
 def normalize(s: str) -> str:
     s = s.lower().strip()
@@ -28,3 +35,112 @@ def eval_file(jsonl_path: str) -> Tuple[float,float]:
             f1s.append(soft_f1(pred, gold))
     n = max(1, len(ems))
     return sum(ems)/n, sum(f1s)/n
+
+# ---------------------------------------------------------------------------
+# Streaming, parallel evaluation with breakdowns
+# The file is split into byte ranges aligned to line starts; each worker parses its
+# range (orjson when installed) into small count vectors keyed by (dimension, value),
+# and the parent sums them. Memory is bounded by the number of distinct groups.
+# ---------------------------------------------------------------------------
+_TARGET = re.compile(r"dest=([^,]*),constraint=(.*)")
+# per-group counters: examples, exact matches, soft-f1 sum, dest matches, constraint tp / fp / fn
+N, EM, F1, DEST, TP, FP, FN = range(7)
+
+def parse_target(s: str):
+    """'DEST=x,CONSTRAINT=a|b' -> ('x', ['a', 'b']); (None, []) if malformed."""
+    m = _TARGET.fullmatch(normalize(s))
+    if m is None:
+        return None, []
+    return m.group(1), [t for t in m.group(2).split("|") if t]
+
+def _add(acc, key, vec):
+    row = acc.get(key)
+    if row is None:
+        acc[key] = list(vec)
+    else:
+        for i, v in enumerate(vec):
+            row[i] += v
+
+def _pair_groups(pred, gold, index):
+    """[(group key, counter vector)] contributed by one (pred, gold) pair."""
+    em, f1 = exact_match(pred, gold), soft_f1(pred, gold)
+    gd, gt = parse_target(gold)
+    pd, pt = parse_target(pred)
+    gs, ps = set(gt), set(pt)
+    vec = (1, em, f1, int(gd is not None and gd == pd), len(gs & ps), len(ps - gs), len(gs - ps))
+    out = [(("all", ""), vec), (("dest", gd or "?"), vec),
+           (("n_constraints", str(len({index.get(t, (None, t))[1] for t in gs}))), vec)]
+    out += [(("family", fam), vec) for fam in {index.get(t, ("other", None))[0] for t in gs}]
+    out += [(("constraint", t), (1, em, f1, vec[DEST], int(t in ps), 0, int(t not in ps))) for t in gs]
+    out += [(("constraint", t), (0, 0, 0.0, 0, 0, 1, 0)) for t in ps - gs]
+    return out
+
+def _eval_range(path, start, end, index):
+    """Aggregate lines whose first byte lies in [start, end)."""
+    pairs, bad = {}, 0  # (pred, gold) -> count; predictions repeat heavily, so score each pair once
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # finish the line that straddles start (no-op if start is a line start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                ex = _loads(line)
+            except ValueError:
+                bad += 1
+                continue
+            key = (ex.get("pred", ""), ex.get("target", ""))
+            pairs[key] = pairs.get(key, 0) + 1
+    acc = {}
+    for (pred, gold), c in pairs.items():
+        if parse_target(gold)[0] is None:
+            bad += c
+        for key, vec in _pair_groups(pred, gold, index):
+            _add(acc, key, [v * c for v in vec])
+    return acc, bad
+
+def _ranges(path, chunk_bytes):
+    size = os.path.getsize(path)
+    return [(s, min(s + chunk_bytes, size)) for s in range(0, size, chunk_bytes)] or [(0, 0)]
+
+def _summarize(row, digits=4):
+    n, tp, fp, fn = row[N], row[TP], row[FP], row[FN]
+    p = tp / (tp + fp) if tp + fp else 0.0
+    r = tp / (tp + fn) if tp + fn else 0.0
+    out = {"n": n, "constraint_p": p, "constraint_r": r, "constraint_f1": 2 * p * r / (p + r) if p + r else 0.0}
+    if n:
+        out.update({"em": row[EM] / n, "soft_f1": row[F1] / n, "dest_acc": row[DEST] / n})
+    return {k: round(v, digits) if isinstance(v, float) else v for k, v in out.items()}
+
+def eval_file_streaming(jsonl_path: str, workers: int = 0, chunk_bytes: int = 8 << 20, index=None,
+                        lexicons: str = "data/lexicons.yaml"):
+    """
+    EM / soft-F1 (as eval_file) plus constraint-set P/R/F1 and destination accuracy, overall and
+    broken down by gold destination, constraint token, rule family and number of composed rules.
+    workers: 0 = os.cpu_count(), 1 = in-process. index: constraint token -> (family, rule id),
+    default data.rules.constraint_index() over `lexicons` (the file the utterances were generated from).
+    """
+    if index is None:
+        from dac_q4_its.data.rules import constraint_index, load_lexicons
+        index = constraint_index(load_lexicons(lexicons))
+    ranges = _ranges(jsonl_path, chunk_bytes)
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        parts = [_eval_range(jsonl_path, s, e, index) for s, e in ranges]
+    else:
+        with ProcessPoolExecutor(workers) as ex:
+            parts = list(ex.map(_eval_range, [jsonl_path] * len(ranges), *zip(*ranges), [index] * len(ranges)))
+    acc, bad = {}, 0
+    for part, b in parts:
+        bad += b
+        for key, vec in part.items():
+            _add(acc, key, vec)
+    report = _summarize(acc.get(("all", ""), [0] * 7))
+    report["malformed"] = bad
+    for dim in ("dest", "family", "n_constraints", "constraint"):
+        report[f"by_{dim}"] = {v: _summarize(row) for (d, v), row in sorted(acc.items()) if d == dim}
+    return report
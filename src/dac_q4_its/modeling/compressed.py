@@ -0,0 +1,120 @@
+import warnings
+from pathlib import Path
+import torch
+import torch.nn as nn
+from dac_q4_its.modeling.loader import ToyTransformer, model_cfg
+from dac_q4_its.adapters.inject import CompressedLinear, AdapterBankLinear, QuantizedEmbedding
+from dac_q4_its.utils.io import load_bin, load_tensors
+
+CONTAINER = "model.dacq"
+
+class ArtifactStore:
+    """
+    Per-layer artifacts by name (layer_{li}_W_qint4, layer_{li}_scales, ...), read from the
+    single-file container artifacts/model.dacq when present, else from the legacy per-tensor pickles.
+    A container that disagrees with newer pickles in weights/ (stages re-run without re-packing) is ignored.
+    """
+    def __init__(self, root="artifacts", mmap=True, use_container=True):
+        self.root = Path(root)
+        self.container = self.root / CONTAINER
+        self.tensors = None
+        if use_container and self.container.exists():
+            tensors = load_tensors(self.container, mmap=mmap)[0]
+            stale = self._stale(tensors)
+            if stale:
+                warnings.warn(f"{self.container} is out of date with weights/{stale[0]} (+{len(stale) - 1} more); "
+                              f"reading weights/ instead -- re-run 06_pack_artifacts.py to refresh it")
+            else:
+                self.tensors = tensors
+
+    def _stale(self, tensors):
+        """Pickles written after the container whose tensor it lacks or holds a different value for (FP sources aside)."""
+        packed = self.container.stat().st_mtime_ns
+        stale = []
+        for p in sorted((self.root / "weights").glob("*.pkl")):
+            if p.stat().st_mtime_ns <= packed:
+                continue
+            if p.stem in tensors:
+                obj = load_bin(p)
+                if not (isinstance(obj, torch.Tensor) and obj.dtype == tensors[p.stem].dtype
+                        and torch.equal(obj, tensors[p.stem])):
+                    stale.append(p.name)
+            elif not p.stem.endswith("_fp32"):
+                stale.append(p.name)
+        return stale
+
+    def __contains__(self, name):
+        if self.tensors is not None:
+            return name in self.tensors
+        return (self.root / "weights" / f"{name}.pkl").exists()
+
+    def __getitem__(self, name):
+        if self.tensors is not None:
+            return self.tensors[name]
+        return load_bin(self.root / "weights" / f"{name}.pkl")
+
+def load_embedding(mcfg, store=None, root="artifacts"):
+    """
+    The deployed input/output embedding: QuantizedEmbedding when the container (or weights/) holds
+    embed_q, else the exported FP table. store: an ArtifactStore (default: ArtifactStore(root)).
+    """
+    store = store if store is not None else ArtifactStore(root)
+    if "embed_q" in store:  # quantized table from the embed_quant stage; deployments ship it instead of fp32
+        return QuantizedEmbedding(store["embed_q"], store["embed_scales"], store["embed_U"], store["embed_D"],
+                                  embedding_dim=mcfg["hidden_size"])
+    if "embed_fp32" in store:
+        return nn.Embedding.from_pretrained(store["embed_fp32"], freeze=True)
+    return nn.Embedding(mcfg["vocab_size"], mcfg["hidden_size"])  # older artifact sets without an exported embedding
+
+def build_compressed_model(mcfg, strategy=None, root="artifacts", use_container=True):
+    """Assemble the compressed model straight from artifacts; no FP layers are built and thrown away."""
+    store = ArtifactStore(root, use_container=use_container)
+    cfg = model_cfg(mcfg)
+    layers = []
+    for li in range(cfg.n_layers):
+        Q = store[f"layer_{li}_W_qint4"]
+        S = store[f"layer_{li}_scales"]
+        U = store[f"layer_{li}_U"]
+        D = store[f"layer_{li}_D"]
+        UD = store[f"layer_{li}_UD_scales"] if U.dtype == torch.int8 else None  # int8 U/D carry one scale per rank
+        layers.append(CompressedLinear(Q, S, U, D, in_features=cfg.hidden_size, strategy=strategy, UD_scales=UD))
+    return ToyTransformer.from_modules(cfg, load_embedding(mcfg, store), layers).eval()
+
+def build_adapter_bank_model(mcfg, adapter_sets, strategy=None, root="artifacts"):
+    """
+    adapter_sets: {name: dir} where each dir holds layer_{li}_U.pkl / layer_{li}_D.pkl (+ _UD_scales.pkl if int8)
+    computed against the shared quantized base.
+    """
+    store = ArtifactStore(root)
+    cfg = model_cfg(mcfg)
+    banks = []
+    for li in range(cfg.n_layers):
+        Q = store[f"layer_{li}_W_qint4"]
+        S = store[f"layer_{li}_scales"]
+        U = [load_bin(f"{d}/layer_{li}_U.pkl") for d in adapter_sets.values()]
+        D = [load_bin(f"{d}/layer_{li}_D.pkl") for d in adapter_sets.values()]
+        UD = [load_bin(f"{d}/layer_{li}_UD_scales.pkl") if u.dtype == torch.int8 else None
+              for u, d in zip(U, adapter_sets.values())]
+        layers = [CompressedLinear(Q, S, u, dd, in_features=cfg.hidden_size, strategy=strategy, UD_scales=s)
+                  for u, dd, s in zip(U, D, UD)]
+        banks.append(AdapterBankLinear.from_compressed(layers, names=list(adapter_sets)))
+    return ToyTransformer.from_modules(cfg, load_embedding(mcfg, store), banks).eval()
+
+@torch.no_grad()
+def save_snapshot(model, path, seq_len=8):
+    """
+    Serialize the already-compressed module so deployment skips model construction entirely.
+    .pt2 -> torch.export program (dynamic batch and sequence length), .pt -> TorchScript trace.
+    """
+    tok = torch.zeros(2, seq_len, dtype=torch.long)
+    if str(path).endswith(".pt"):
+        torch.jit.trace(model, (tok,)).save(str(path))
+    else:
+        dims = {"x": {0: torch.export.Dim("batch"), 1: torch.export.Dim("seq")}}
+        torch.export.save(torch.export.export(model, (tok,), dynamic_shapes=dims), str(path))
+    return path
+
+def load_snapshot(path):
+    if str(path).endswith(".pt"):
+        return torch.jit.load(str(path))
+    return torch.export.load(str(path)).module()
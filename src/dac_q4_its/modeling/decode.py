@@ -0,0 +1,5 @@
+def toy_decode(vec):
+    return "DEST=airport,CONSTRAINT=avoid_tolls" if vec.mean() > 0 else "DEST=downtown,CONSTRAINT=min_traffic"
+
+def toy_decode_batch(h):  # h: [B, H]
+    return [toy_decode(row) for row in h]
@@ -0,0 +1,128 @@
+"""
+Grammar-constrained decoding of DEST=<dest>,CONSTRAINT=<c1|c2|...>.
+
+The lexicon (data/lexicons.yaml + data.rules) is compiled into two prefix tries over tokenizer
+ids: one for destinations and one for constraint tokens. Decoding walks the tries. The literal
+parts ("DEST=", ",CONSTRAINT=") are never generated. A trie position with one valid continuation
+is taken without looking at the model (fast-forward). Only positions with several valid
+continuations cost a forward pass, scored as h @ embed(candidates).T over the tied embedding
+(an nn.Embedding or a QuantizedEmbedding, which dequantizes only the candidate rows).
+Every output parses with evaluation.nln.parse_target, and constraints never repeat.
+"""
+import torch
+
+END = -1  # "stop here" candidate at a terminal trie node, scored with the eos embedding
+
+class _Node:
+    __slots__ = ("children", "value", "values")
+
+    def __init__(self):
+        self.children, self.value, self.values = {}, None, frozenset()
+
+def build_trie(items, encode_item):
+    """items: output strings; encode_item(str) -> sequence of token ids. Returns the root node."""
+    root = _Node()
+    for item in items:
+        node = root
+        for i in encode_item(item):
+            node = node.children.setdefault(int(i), _Node())
+        node.value = item
+    def fill(node):
+        vals = {node.value} if node.value is not None else set()
+        for child in node.children.values():
+            vals |= fill(child)
+        node.values = frozenset(vals)
+        return node.values
+    fill(root)
+    return root
+
+class GrammarDecoder:
+    def __init__(self, dests, constraints, encode_item, sep_id, eos_id, pad_id=0, max_constraints=6):
+        self.dest_trie = build_trie(dests, encode_item)
+        self.con_trie = build_trie(constraints, encode_item)
+        self.sep_id, self.eos_id, self.pad_id = sep_id, eos_id, pad_id
+        self.max_constraints = max_constraints
+        self.stats = {"rows": 0, "steps": 0, "forced": 0, "forward_passes": 0}
+
+    @classmethod
+    def from_lexicons(cls, lex=None, tokenizer=None, vocab_size=32000, **kw):
+        """tokenizer: a SubwordTokenizer, or None for the word-hash encoding (one id per item)."""
+        from dac_q4_its.data.rules import canonical, constraint_index, load_lexicons
+        from dac_q4_its.data.tokenization import HASH_EOS, HASH_PAD, SubwordTokenizer, hash_encode
+        lex = lex or load_lexicons(None)
+        dests = list(dict.fromkeys(canonical(d) for d in lex["dests"]))
+        constraints = list(constraint_index(lex))
+        if isinstance(tokenizer, SubwordTokenizer):
+            return cls(dests, constraints, tokenizer.encode, tokenizer.ids["|"], tokenizer.eos_id,
+                       pad_id=tokenizer.pad_id, **kw)
+        item = lambda s: hash_encode([s], vocab_size, seq_len=1)[0].tolist()
+        return cls(dests, constraints, item, item("|")[0], HASH_EOS, pad_id=HASH_PAD, **kw)  # eos never hashes
+
+    def _walk(self, root, seq, allowed):
+        """Generator: descend one trie, yielding candidate lists at ambiguous nodes; returns the item."""
+        node = root
+        while True:
+            cands = [i for i, c in node.children.items() if c.values & allowed]
+            if node.value is not None and node.value in allowed:
+                cands.append(END)
+            self.stats["steps"] += 1
+            if len(cands) == 1:
+                pick = cands[0]
+                self.stats["forced"] += 1
+            else:
+                pick = yield cands
+            if pick == END:
+                return node.value
+            seq.append(pick)
+            node = node.children[pick]
+
+    def _row(self, seq):
+        dest = yield from self._walk(self.dest_trie, seq, self.dest_trie.values)
+        remaining, cons = set(self.con_trie.values), []
+        while True:
+            c = yield from self._walk(self.con_trie, seq, remaining)
+            cons.append(c)
+            remaining.discard(c)
+            if len(cons) >= self.max_constraints or not remaining:
+                break
+            self.stats["steps"] += 1
+            if (yield [self.sep_id, END]) == END:
+                break
+            seq.append(self.sep_id)
+        return f"DEST={dest},CONSTRAINT={'|'.join(cons)}"
+
+    @torch.no_grad()
+    def decode(self, model, tok, embed=None):
+        """
+        model: tok [B, T] -> hidden [B, H] (ToyTransformer, snapshot, ORT backend, ...).
+        tok: prompt ids [B, T]. embed: output embedding, a module or a [V, H] table (default model.embed).
+        returns B strings; self.stats accumulates steps / forced steps / forward passes.
+        """
+        E = embed if embed is not None else model.embed
+        lookup = E if isinstance(E, torch.nn.Module) else E.__getitem__
+        seqs = [[int(i) for i in row if int(i) != self.pad_id] for row in tok]
+        gens = [self._row(s) for s in seqs]
+        out, pending = [None] * len(gens), {}
+        def advance(b, msg):
+            try:
+                pending[b] = gens[b].send(msg)
+            except StopIteration as done:
+                out[b] = done.value
+        for b in range(len(gens)):
+            advance(b, None)
+        self.stats["rows"] += len(gens)
+        while pending:
+            rows = sorted(pending)
+            T = max(len(seqs[b]) for b in rows)
+            batch = torch.full((len(rows), max(T, 1)), self.pad_id, dtype=torch.long)
+            for r, b in enumerate(rows):
+                batch[r, :len(seqs[b])] = torch.tensor(seqs[b], dtype=torch.long)
+            h = model(batch).float()                            # [R, H], one pass for every waiting row
+            self.stats["forward_passes"] += 1
+            for r, b in enumerate(rows):
+                cands = pending.pop(b)
+                ids = torch.tensor([self.eos_id if c == END else c for c in cands])
+                advance(b, cands[int((lookup(ids).float() @ h[r]).argmax())])
+        return out
+
+    __call__ = decode
@@ -1,12 +1,14 @@
 import torch
 import torch.nn as nn
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import Optional
 
 @dataclass
 class ModelCfg:
     hidden_size: int = 256
     n_layers: int = 4
     vocab_size: int = 32000
+    pad_id: Optional[int] = None  # when set, pad positions are left out of the pooling
 
 class ToyTransformer(nn.Module):
     """
@@ -20,12 +22,31 @@ class ToyTransformer(nn.Module):
                                      for _ in range(cfg.n_layers)])
         self.embed = nn.Embedding(cfg.vocab_size, cfg.hidden_size)
 
-    def forward(self, x):  # x: token ids [B, T]
-        h = self.embed(x).mean(dim=1)  # [B, H] crude pooling
+    @classmethod
+    def from_modules(cls, cfg: ModelCfg, embed: nn.Module, layers):
+        """Assemble from ready-made modules, skipping the random FP initialization of __init__."""
+        model = cls.__new__(cls)
+        nn.Module.__init__(model)
+        model.cfg = cfg
+        model.layers = nn.ModuleList(layers)
+        model.embed = embed
+        return model
+
+    def forward(self, x, adapter_ids=None):  # x: token ids [B, T], adapter_ids: [B] for adapter banks
+        if self.cfg.pad_id is None:
+            h = self.embed(x).mean(dim=1)  # [B, H] crude pooling
+        else:
+            m = (x != self.cfg.pad_id).unsqueeze(-1).to(torch.float32)  # [B, T, 1]
+            h = (self.embed(x) * m).sum(dim=1) / m.sum(dim=1).clamp(min=1.0)
         for lin in self.layers:
-            h = lin(h)
+            h = lin(h) if adapter_ids is None else lin(h, adapter_ids)
             h = torch.relu(h)
         return h  # [B, H]
 
+def model_cfg(cfg: dict) -> ModelCfg:
+    # model configs also carry pipeline keys (e.g. rank) that ModelCfg does not take
+    names = {f.name for f in fields(ModelCfg)}
+    return ModelCfg(**{k: v for k, v in cfg.items() if k in names})
+
 def load_toy(cfg: dict) -> ToyTransformer:
-    return ToyTransformer(ModelCfg(**cfg))
+    return ToyTransformer(model_cfg(cfg))
@@ -0,0 +1,285 @@
+"""
+Per-layer compression stages shared by scripts/02-05 and the incremental runner
+(scripts/run_pipeline.py). Every stage reads and writes the artifacts/ layout:
+  weights/layer_{li}_{W_fp32,W_qint4,scales,U,D,UD_scales}.pkl, weights/embed_{fp32,q,scales,U,D}.pkl,
+  eigs/layer_{li}_{cov,cov_in,Vk,evals}.pkl, eigs/{rank_plan,adapter_precision}.json, quant_plan.json, tokenizer.json
+"""
+import json, os
+from pathlib import Path
+import torch
+from dac_q4_its.adapters.build_adapters import ADAPTER_DTYPES, build_adapters, quantize_adapters, residual_recovery
+from dac_q4_its.adapters.capture import capture_corpus_covariances
+from dac_q4_its.adapters.eigenspace import topk_eigvecs_from_cov
+from dac_q4_its.adapters.rank_plan import direction_gains, plan_ranks, plan_report, rank_cost
+from dac_q4_its.data.tokenization import load_encoder, train_tokenizer
+from dac_q4_its.modeling.loader import load_toy
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row, pack_int4, delta_W
+from dac_q4_its.quantization.mixed import (dequantize_weight, plan_precision, quantize_weight, sensitivity,
+                                          weight_bytes, weight_latency_us)
+from dac_q4_its.utils.io import load_bin, load_json, save_bin, save_json
+from dac_q4_its.utils.seeds import set_seed
+
+WEIGHT_KINDS = ("W_fp32", "W_qint4", "scales", "U", "D", "UD_scales")
+
+def layer_path(kind, li, root="artifacts"):
+    sub = "weights" if kind in WEIGHT_KINDS else "eigs"
+    return str(Path(root) / sub / f"layer_{li}_{kind}.pkl")
+
+def embed_path(root="artifacts", kind="fp32"):
+    return str(Path(root) / "weights" / f"embed_{kind}.pkl")
+
+EMBED_KINDS = ("q", "scales", "U", "D")  # QuantizedEmbedding artifacts
+
+def rank_plan_path(root="artifacts"):
+    return str(Path(root) / "eigs" / "rank_plan.json")
+
+def quant_plan_path(root="artifacts"):
+    return str(Path(root) / "quant_plan.json")
+
+def tokenizer_path(root="artifacts"):
+    return str(Path(root) / "tokenizer.json")
+
+def tokenizer_stage(mcfg, corpus_files, root="artifacts", vocab_size=4000):
+    """Train the subword tokenizer on the calibration corpus plus any extra text/JSONL files."""
+    texts = []
+    for p in corpus_files:
+        with open(p, "r", encoding="utf-8") as f:
+            if str(p).endswith(".jsonl"):
+                texts += [json.loads(line)["input"] for line in f if line.strip()]
+            else:
+                texts += [line for line in f if line.strip()]
+    tok = train_tokenizer(texts, vocab_size=min(vocab_size, mcfg["vocab_size"]))
+    tok.save(tokenizer_path(root))
+    return [tokenizer_path(root)]
+
+def export_fp_weights(mcfg, seed=None, root="artifacts"):
+    if seed is not None:
+        set_seed(seed)
+    model = load_toy(mcfg)
+    outs = []
+    for li, lin in enumerate(model.layers):
+        W = lin.weight.data.to(torch.float32).clone()  # [d, d]
+        outs.append(layer_path("W_fp32", li, root))
+        save_bin(W, outs[-1])
+    save_bin(model.embed.weight.data.to(torch.float32).clone(), embed_path(root))  # [vocab, d]
+    return outs + [embed_path(root)]
+
+def quantize_layer(li, qcfg, root="artifacts", fmt=None):
+    """fmt: a mixed-precision format ("int8", "int4/g64", ...); None applies qcfg's int4 settings."""
+    W = load_bin(layer_path("W_fp32", li, root))  # torch tensor [d, d]
+    if fmt is not None:
+        Q, scales = quantize_weight(W, fmt)
+    else:
+        Q, scales = quantize_int4_per_row(W, qmin=qcfg["range_min"], qmax=qcfg["range_max"])
+        if qcfg.get("packed", False):
+            Q = pack_int4(Q)  # uint8 [d, d/2], two nibbles per byte
+    save_bin(Q, layer_path("W_qint4", li, root))
+    save_bin(scales, layer_path("scales", li, root))
+    return [layer_path("W_qint4", li, root), layer_path("scales", li, root)]
+
+def quantize_embedding(ecfg, root="artifacts"):
+    """
+    Quantize the exported table row by row to ecfg["format"] and fit a rank-ecfg["residual_rank"]
+    correction U @ D of the dequant error (randomized SVD seeded by ecfg["seed"], so reruns are identical);
+    writes weights/embed_{q,scales,U,D}.pkl.
+    """
+    E = load_bin(embed_path(root))  # [V, H]
+    Q, scales = quantize_weight(E, ecfg["format"])
+    dE = E - dequantize_weight(Q, scales, in_features=E.shape[1])
+    r = ecfg.get("residual_rank", 0)
+    if r:
+        with torch.random.fork_rng(devices=[]):  # svd_lowrank draws from the global generator
+            torch.manual_seed(ecfg.get("seed", 0))
+            Ur, Sr, Vr = torch.svd_lowrank(dE, q=r, niter=4)
+        U, D = (Ur * Sr).contiguous(), Vr.T.contiguous()  # [V, r], [r, H]
+    else:
+        U, D = torch.zeros(E.shape[0], 0), torch.zeros(0, E.shape[1])
+    for kind, t in zip(EMBED_KINDS, (Q, scales, U, D)):
+        save_bin(t, embed_path(root, kind))
+    return [embed_path(root, k) for k in EMBED_KINDS]
+
+def clear_embedding(root="artifacts"):
+    """
+    Remove weights/embed_{q,scales,U,D}.pkl: without an embedding block the per-pickle loader must
+    fall back to embed_fp32, not pick up a table quantized by an earlier config.
+    """
+    removed = [embed_path(root, k) for k in EMBED_KINDS if os.path.exists(embed_path(root, k))]
+    for p in removed:
+        os.remove(p)
+    return removed
+
+def capture_stage(mcfg, corpus, root="artifacts", batch_size=64, workers=1, dtype=torch.float64, max_lines=None,
+                  which="output"):
+    """
+    Covariance of every projection output over the calibration corpus, using the exported FP weights.
+    which="input" instead saves the mean input second moment A^T A / n as cov_in (precision planning).
+    """
+    model = load_toy(mcfg).eval()
+    for li, lin in enumerate(model.layers):
+        wf = layer_path("W_fp32", li, root)
+        if os.path.exists(wf):
+            lin.weight.data.copy_(load_bin(wf))
+    if os.path.exists(embed_path(root)):
+        model.embed.weight.data.copy_(load_bin(embed_path(root)))
+    encode = load_encoder(mcfg["vocab_size"], tokenizer_path(root))
+    covs = capture_corpus_covariances(model, corpus, encode, batch_size=batch_size, workers=workers,
+                                      dtype=dtype, max_lines=max_lines, which=which)
+    counts = {}
+    for li in range(len(model.layers)):
+        C, n = covs[f"layers.{li}"]
+        if which == "input":
+            save_bin(C / max(n, 1), layer_path("cov_in", li, root))
+        else:
+            save_bin(C, layer_path("cov", li, root))
+        counts[f"layer_{li}"] = n
+    return counts
+
+def precision_plan_stage(qcfg, layers, root="artifacts"):
+    """
+    One base-weight format per layer for qcfg["mixed"]["budget"] ({"bytes": n}, or {"latency_us": n}
+    under mixed["latency_model"]), minimizing the summed output error on the calibration corpus.
+    Writes quant_plan.json with every candidate's cost and error next to the chosen format.
+    """
+    mixed = qcfg["mixed"]
+    formats = mixed["formats"]
+    (unit, budget), = mixed["budget"].items()
+    if unit == "bytes":
+        cost_of = lambda W, f: weight_bytes(*W.shape, f)
+    elif unit == "latency_us":
+        cost_of = lambda W, f: weight_latency_us(*W.shape, f, mixed["latency_model"])
+    else:
+        raise ValueError(f"Unknown budget unit {unit!r}, expected 'bytes' or 'latency_us'")
+    rows, costs, errors = [], [], []
+    for li in layers:
+        W = load_bin(layer_path("W_fp32", li, root))
+        sens = sensitivity(W, load_bin(layer_path("cov_in", li, root)), 1, formats)
+        costs.append({f: cost_of(W, f) for f in formats})
+        errors.append({f: sens[f]["output_error"] for f in formats})
+        rows.append({f: {unit: costs[-1][f], **sens[f]} for f in formats})
+    plan = plan_precision(costs, errors, budget)
+    base = mixed.get("baseline", formats[0])
+    report = {"formats": plan, "unit": unit, "budget": budget,
+              "cost": sum(c[f] for c, f in zip(costs, plan)),
+              "output_error": sum(e[f] for e, f in zip(errors, plan)),
+              "baseline": {"format": base, "cost": sum(c[base] for c in costs),
+                           "output_error": sum(e[base] for e in errors)},
+              "layers": [{"format": f, "candidates": r} for f, r in zip(plan, rows)]}
+    save_json(report, quant_plan_path(root))
+    return [quant_plan_path(root)]
+
+def layer_format(li, qcfg, root="artifacts"):
+    """Planned base format of layer li, or None (uniform int4 from qcfg) without a mixed block."""
+    if not qcfg.get("mixed"):
+        return None
+    return load_json(quant_plan_path(root))["formats"][li]
+
+def plan_metadata(qcfg, acfg, root="artifacts"):
+    """Per-layer formats / ranks of the configured plans, stored with the packed deployment tensors."""
+    meta = {}
+    if qcfg.get("mixed"):
+        meta["formats"] = load_json(quant_plan_path(root))["formats"]
+    if acfg.get("rank_budget"):
+        meta["ranks"] = load_json(rank_plan_path(root))["ranks"]
+    return meta
+
+def eig_rank(acfg):
+    """Eigenvectors kept per layer: the planner's cap when a rank budget is set, else the uniform rank."""
+    return acfg.get("max_rank", acfg["rank"]) if acfg.get("rank_budget") else acfg["rank"]
+
+def eigvecs_layer(li, acfg, root="artifacts"):
+    C = load_bin(layer_path("cov", li, root))
+    k = min(eig_rank(acfg), C.shape[0])
+    Vk, evals = topk_eigvecs_from_cov(C, k, solver=acfg.get("eig_solver", "eigh"), return_eigvals=True)
+    save_bin(Vk.float(), layer_path("Vk", li, root))  # [d, k], ascending eigenvalue
+    save_bin(evals.float(), layer_path("evals", li, root))
+    return [layer_path("Vk", li, root), layer_path("evals", li, root)]
+
+def _delta_layer(li, root):
+    Q = load_bin(layer_path("W_qint4", li, root))
+    S = load_bin(layer_path("scales", li, root))
+    Wfp = load_bin(layer_path("W_fp32", li, root))
+    Wdq = dequantize_weight(Q, S, in_features=Wfp.shape[1])  # any plan format; unpacks uint8 Q
+    return delta_W(Wfp, Wdq)
+
+def rank_plan_stage(acfg, layers, root="artifacts"):
+    """
+    Per-layer ranks for acfg["rank_budget"] ({"bytes": n} or {"flops": n}, U/D over all layers)
+    from each layer's eigenvectors and quantization error; writes eigs/rank_plan.json.
+    """
+    (unit, budget), = acfg["rank_budget"].items()
+    gains, totals, costs, evals = [], [], [], []
+    for li in layers:
+        dW = _delta_layer(li, root)
+        gains.append(direction_gains(load_bin(layer_path("Vk", li, root)), dW))
+        totals.append(float(dW.double().pow(2).sum()))
+        costs.append(rank_cost(*dW.shape, unit=unit, dtype=acfg.get("dtype", "fp32")))
+        evals.append(load_bin(layer_path("evals", li, root)).flip(0).tolist())
+    ranks = plan_ranks(gains, costs, budget, totals=totals, min_gain=acfg.get("min_gain", 0.0))
+    report = plan_report(gains, totals, costs, ranks)
+    uniform = plan_report(gains, totals, costs, [min(acfg["rank"], len(g)) for g in gains])
+    report.update({"unit": unit, "budget": budget,
+                   "uniform": {"rank": acfg["rank"], "cost": uniform["cost"], "captured": uniform["captured"]}})
+    for row, ev in zip(report["layers"], evals):
+        row["eigvals"] = ev  # descending, max_rank of them
+    save_json(report, rank_plan_path(root))
+    return [rank_plan_path(root)]
+
+def layer_rank(li, acfg, root="artifacts"):
+    """Planned rank of layer li, or None (use every stored eigenvector) without a rank budget."""
+    if not acfg.get("rank_budget"):
+        return None
+    return load_json(rank_plan_path(root))["ranks"][li]
+
+def adapter_kinds(acfg):
+    """Per-layer adapter artifacts: U, D, plus UD_scales when the factors are stored as int8."""
+    return ["U", "D", "UD_scales"] if acfg.get("dtype", "fp32") == "int8" else ["U", "D"]
+
+def adapters_layer(li, root="artifacts", rank=None, dtype="fp32"):
+    """
+    rank: keep the top-`rank` eigenvectors (0 = no adapter); None keeps every stored one.
+    dtype: U/D storage (fp32, fp16, bf16, int8; see quantize_adapters).
+    """
+    Vk = load_bin(layer_path("Vk", li, root))
+    if rank is not None:
+        Vk = Vk[:, Vk.shape[1] - rank:]  # largest eigenvalues are the last columns
+    U, D, UD_scales = quantize_adapters(*build_adapters(Vk, _delta_layer(li, root)), dtype)
+    save_bin(U, layer_path("U", li, root))
+    save_bin(D, layer_path("D", li, root))
+    if UD_scales is not None:
+        save_bin(UD_scales, layer_path("UD_scales", li, root))
+    elif os.path.exists(layer_path("UD_scales", li, root)):
+        os.remove(layer_path("UD_scales", li, root))  # left over from an int8 run
+    return [layer_path(k, li, root) for k in (["U", "D"] if UD_scales is None else ["U", "D", "UD_scales"])]
+
+def adapter_precision_path(root="artifacts"):
+    return str(Path(root) / "eigs" / "adapter_precision.json")
+
+def adapter_precision_report(layers, ranks=None, root="artifacts"):
+    """
+    Per layer and U/D dtype: stored bytes and the fraction of ||dW||^2 the adapter removes,
+    next to fp32. ranks: per-layer ranks as passed to adapters_layer (None = every stored one).
+    """
+    report = {"layers": []}
+    for li in layers:
+        Vk = load_bin(layer_path("Vk", li, root))
+        r = Vk.shape[1] if ranks is None or ranks[li] is None else ranks[li]
+        dW = _delta_layer(li, root)
+        U, D = build_adapters(Vk[:, Vk.shape[1] - r:], dW)
+        row = {"rank": r, "dW_energy": float(dW.double().pow(2).sum())}
+        for dt in ADAPTER_DTYPES:
+            q = quantize_adapters(U, D, dt)
+            row[dt] = {"bytes": sum(t.numel() * t.element_size() for t in q if t is not None),
+                       "recovered": residual_recovery(dW, *q)}
+        for dt in ADAPTER_DTYPES:
+            row[dt]["vs_fp32"] = row[dt]["recovered"] / row["fp32"]["recovered"] if row["fp32"]["recovered"] else 1.0
+        report["layers"].append(row)
+    total = sum(l["dW_energy"] for l in report["layers"])
+    for dt in ADAPTER_DTYPES:  # totals: fraction of the summed ||dW||^2 over all layers
+        report[dt] = {"bytes": sum(l[dt]["bytes"] for l in report["layers"]),
+                      "recovered": sum(l[dt]["recovered"] * l["dW_energy"] for l in report["layers"]) / total
+                      if total else 1.0}
+    save_json(report, adapter_precision_path(root))
+    return report
+
+def n_layers(root="artifacts"):
+    return len(list((Path(root) / "weights").glob("layer_*_W_fp32.pkl")))
@@ -11,8 +11,50 @@ def quantize_int4_per_row(W: torch.Tensor, qmin=-8, qmax=7):
     Q = torch.round(W / scales).clamp(qmin, qmax).to(torch.int8)
     return Q, scales
 
-def dequantize_int4_per_row(Q: torch.Tensor, scales: torch.Tensor):
+def pack_int4(Q: torch.Tensor):
+    """
+    Q: [out, in] int8 values in [-8, 7] -> [out, ceil(in/2)] uint8.
+    Column 2j goes in the low nibble, column 2j+1 in the high nibble (two's complement).
+    Odd widths are padded with a zero nibble.
+    """
+    if Q.shape[1] % 2:
+        Q = torch.nn.functional.pad(Q, (0, 1))
+    nib = (Q.to(torch.int16) & 0xF).to(torch.uint8)
+    return (nib[:, 0::2] | (nib[:, 1::2] << 4)).contiguous()
+
+def unpack_int4(P: torch.Tensor, in_features=None):
+    """
+    P: [out, n] uint8 from pack_int4 -> [out, in_features] int8 (default in_features = 2n).
+    """
+    S = P.to(torch.int8)                    # same bits (uint8 -> int8 wraps)
+    Q = torch.stack([(S << 4) >> 4, S >> 4], dim=-1).reshape(P.shape[0], -1)  # arithmetic shifts sign-extend
+    if in_features is not None:
+        Q = Q[:, :in_features]
+    return Q
+
+def quantize_int4_per_row_packed(W: torch.Tensor, qmin=-8, qmax=7):
+    Q, scales = quantize_int4_per_row(W, qmin=qmin, qmax=qmax)
+    return pack_int4(Q), scales
+
+def dequantize_int4_per_row(Q: torch.Tensor, scales: torch.Tensor, in_features=None):
+    # uint8 Q is the packed layout
+    if Q.dtype == torch.uint8:
+        Q = unpack_int4(Q, in_features)
     return Q.float() * scales
 
 def delta_W(W_fp: torch.Tensor, Wdq: torch.Tensor):
     return W_fp - Wdq
+
+def quantize_activations_per_token(x: torch.Tensor, qmax=127):
+    """x: [B, d] -> (int8 [B, d], scales [B, 1]); symmetric, one scale per token, computed on the fly."""
+    scales = x.abs().amax(dim=1, keepdim=True).clamp(min=1e-8) / qmax
+    return torch.round(x / scales).clamp(-qmax, qmax).to(torch.int8), scales
+
+def int_matmul(a: torch.Tensor, b: torch.Tensor):
+    """int8 [M, K] @ int8 [K, N] -> int32 [M, N]; torch._int_mm when the build has it, else an int32 matmul."""
+    if hasattr(torch, "_int_mm"):
+        try:
+            return torch._int_mm(a, b)
+        except RuntimeError:  # shape / device limits of the kernel
+            pass
+    return a.to(torch.int32) @ b.to(torch.int32)
@@ -0,0 +1,112 @@
+"""
+Per-layer mixed precision: int4 (packed) / int8 / fp16 base weights, optionally with group-wise scales.
+
+A format is a string "int4", "int8", "fp16", optionally with a group size: "int4/g64" gives one
+scale per 64 input columns instead of one per row. Every format is stored as (Q, scales):
+  int4  Q uint8 [out, ceil(in/2)] (pack_int4),  scales [out, in/g] float32
+  int8  Q int8  [out, in],                      scales [out, in/g] float32
+  fp16  Q float16 [out, in],                    scales ones [out, 1]
+so W ~= dequantize_weight(Q, scales) for all of them, and CompressedLinear runs any of them.
+
+plan_precision picks one format per layer under a byte or latency budget. Sensitivity is the
+output error each format causes on the calibration corpus: E||dW x||^2 = tr(dW C_in dW^T) / n,
+with C_in the A^T A of the layer's inputs (CovarianceCapture(which="input")).
+"""
+import torch
+from dac_q4_its.quantization.int4_dynamic import pack_int4, unpack_int4
+
+BITS = {"int4": 4, "int8": 8, "fp16": 16}
+QMAX = {"int4": 7, "int8": 127}
+
+def parse_format(fmt):
+    """'int4/g64' -> ('int4', 64); 'int8' -> ('int8', None)."""
+    kind, _, group = fmt.partition("/g")
+    if kind not in BITS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {tuple(BITS)} with an optional /g<group>")
+    return kind, int(group) if group else None
+
+def _grouped(W, group):
+    """[out, in] -> [out, in/group, group]; group=None is one group per row."""
+    g = group or W.shape[1]
+    if W.shape[1] % g:
+        raise ValueError(f"group size {g} does not divide in_features {W.shape[1]}")
+    return W.reshape(W.shape[0], -1, g)
+
+def quantize_weight(W: torch.Tensor, fmt="int4"):
+    kind, group = parse_format(fmt)
+    if kind == "fp16":
+        return W.to(torch.float16).contiguous(), torch.ones(W.shape[0], 1)
+    Wg = _grouped(W.float(), group)
+    scales = Wg.abs().amax(dim=2, keepdim=True).clamp(min=1e-8) / QMAX[kind]          # [out, G, 1]
+    Q = torch.round(Wg / scales).clamp(-QMAX[kind] - 1, QMAX[kind]).to(torch.int8).reshape(W.shape)
+    return (pack_int4(Q) if kind == "int4" else Q), scales.squeeze(2)
+
+def apply_scales(Qf, scales):
+    """Qf: [out, in] float, scales: [out, G] -> Qf scaled group by group."""
+    if scales.shape[1] == 1:
+        return Qf * scales
+    return (_grouped(Qf, Qf.shape[1] // scales.shape[1]) * scales.unsqueeze(2)).reshape(Qf.shape)
+
+def dequantize_weight(Q, scales, in_features=None):
+    if Q.dtype == torch.uint8:
+        Q = unpack_int4(Q, in_features)
+    return apply_scales(Q.float(), scales)
+
+def weight_bytes(d_out, d_in, fmt):
+    kind, group = parse_format(fmt)
+    n_scales = d_out * (d_in // group if group and kind != "fp16" else 1)
+    return (d_out * d_in * BITS[kind] + 7) // 8 + 4 * n_scales
+
+def weight_latency_us(d_out, d_in, fmt, model):
+    """Linear latency model: stream the stored bytes at bandwidth_gbs, plus ns_per_weight[kind] of compute."""
+    kind, _ = parse_format(fmt)
+    return weight_bytes(d_out, d_in, fmt) / (model["bandwidth_gbs"] * 1e3) + \
+        d_out * d_in * model["ns_per_weight"][kind] / 1e3
+
+@torch.no_grad()
+def sensitivity(W, C_in, n, formats):
+    """Per format: dequant error ||dW||_F^2 and mean output error tr(dW C_in dW^T) / n."""
+    out = {}
+    for fmt in formats:
+        dW = (W.double() - dequantize_weight(*quantize_weight(W, fmt), in_features=W.shape[1]).double())
+        out[fmt] = {"dW_energy": float(dW.pow(2).sum()),
+                    "output_error": float(((dW @ C_in.double()) * dW).sum()) / max(n, 1)}
+    return out
+
+def _lower_hull(opts):
+    """opts: [(cost, err, fmt)] -> the cost-sorted options on the lower convex hull of (cost, err)."""
+    pts = []
+    for c, e, f in sorted(opts):
+        if pts and e >= pts[-1][1]:
+            continue  # costs more, no better
+        while len(pts) >= 2:
+            (c0, e0, _), (c1, e1, _) = pts[-2], pts[-1]
+            if (e0 - e1) * (c - c0) > (e0 - e) * (c1 - c0):  # pts[-1] stays below the chord
+                break
+            pts.pop()
+        pts.append((c, e, f))
+    return pts
+
+def plan_precision(costs, errors, budget):
+    """
+    costs / errors: per layer, {fmt: cost} and {fmt: output error}. budget: total cost.
+    Starts every layer at its cheapest format and buys upgrades across layers by error removed
+    per unit cost. returns per-layer formats; ValueError if even the cheapest formats do not fit.
+    """
+    hulls = [_lower_hull([(c[f], e[f], f) for f in c]) for c, e in zip(costs, errors)]
+    pick = [0] * len(hulls)
+    left = budget - sum(h[0][0] for h in hulls)
+    if left < 0:
+        raise ValueError(f"budget {budget} is below the smallest plan ({budget - left})")
+    steps = [((h[i][1] - h[i + 1][1]) / (h[i + 1][0] - h[i][0]), li, i)
+             for li, h in enumerate(hulls) for i in range(len(h) - 1)]
+    blocked = set()
+    for _, li, i in sorted(steps, key=lambda s: -s[0]):
+        if li in blocked or pick[li] != i:  # a layer's upgrades are bought in order
+            continue
+        dc = hulls[li][i + 1][0] - hulls[li][i][0]
+        if dc > left:
+            blocked.add(li)
+            continue
+        pick[li], left = i + 1, left - dc
+    return [h[i][2] for h, i in zip(hulls, pick)]
@@ -0,0 +1,150 @@
+"""
+Offline bulk inference over JSONL (scripts/07_run_inference.py --bulk).
+
+A prefetch thread streams the input file, tokenizes and batches it while the model runs on
+earlier batches. Batches go to `workers` processes. Each worker builds the model once, uses
+`threads` intra-op threads, and (on Linux) is pinned to its own block of cores; workers=0 runs
+in-process. Batches are written back in submission order, so output line i is input record i
+plus "pred", ready for evaluation.nln.eval_file / eval_file_streaming.
+"""
+import json, os, queue, threading, time
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import torch
+
+def read_batches(path, batch_size):
+    """JSONL -> lists of up to batch_size records; blank lines are skipped."""
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def prefetch(items, fn, depth=4):
+    """Yield fn(item) for each item, computed on a background thread at most `depth` items ahead."""
+    q = queue.Queue(depth)
+    def fill():
+        try:
+            for item in items:
+                q.put((True, fn(item)))
+        except BaseException as e:  # re-raised in the consumer
+            q.put((False, e))
+            return
+        q.put((False, None))
+    threading.Thread(target=fill, daemon=True).start()
+    while True:
+        ok, value = q.get()
+        if not ok:
+            if value is not None:
+                raise value
+            return
+        yield value
+
+def pin_threads(threads, index=0):
+    """threads intra-op threads; with enough cores, also bind this process to cores [index * threads, ...)."""
+    if not threads:
+        return
+    torch.set_num_threads(threads)
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) >= (index + 1) * threads:
+            os.sched_setaffinity(0, cpus[index * threads:(index + 1) * threads])
+
+def build_predictor(spec):
+    """
+    spec: {"mcfg", "root", "strategy", "snapshot", "backend", "onnx", "threads", "decoder", "lexicons",
+    "adapter_sets", "adapter"} (everything but mcfg optional) -> predict(tok [B, T]) -> B prediction strings.
+    adapter_sets ({name: dir}) serves `adapter` (default: the first set) from one shared quantized base.
+    """
+    from dac_q4_its.data.rules import load_lexicons
+    from dac_q4_its.data.tokenization import load_encoder
+    from dac_q4_its.modeling.compressed import (build_adapter_bank_model, build_compressed_model, load_embedding,
+                                                load_snapshot)
+    from dac_q4_its.modeling.decode import toy_decode_batch
+    from dac_q4_its.modeling.grammar import GrammarDecoder
+    mcfg, root = spec["mcfg"], spec.get("root", "artifacts")
+    model = None
+    if spec.get("snapshot"):
+        fwd = load_snapshot(spec["snapshot"])
+    elif spec.get("backend") == "onnxrt":
+        from dac_q4_its.runtimes.onnxrt_backend import OnnxRTBackend
+        fwd = OnnxRTBackend(spec["onnx"], intra_op_threads=spec.get("threads", 0), inter_op_threads=1)
+    elif spec.get("adapter_sets"):
+        sets = spec["adapter_sets"]
+        model = build_adapter_bank_model(mcfg, sets, strategy=spec.get("strategy"), root=root)
+        aid = list(sets).index(spec.get("adapter") or next(iter(sets)))
+        fwd = lambda t: model(t, adapter_ids=torch.full((t.shape[0],), aid, dtype=torch.long))
+    else:
+        model = fwd = build_compressed_model(mcfg, strategy=spec.get("strategy"), root=root)
+    if spec.get("decoder", "grammar") == "toy":
+        return torch.no_grad()(lambda tok: toy_decode_batch(fwd(tok).detach()))
+    encode = load_encoder(mcfg["vocab_size"], str(Path(root) / "tokenizer.json"))
+    embed = model.embed if model is not None else load_embedding(mcfg, root=root)
+    decoder = GrammarDecoder.from_lexicons(load_lexicons(spec.get("lexicons", "data/lexicons.yaml")), encode,
+                                           mcfg["vocab_size"])
+    return lambda tok: decoder(fwd, tok, embed)
+
+_PREDICT = None  # per worker process
+
+def _init_worker(build, spec, threads, counter):
+    global _PREDICT
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    pin_threads(threads, index)
+    _PREDICT = build({**spec, "threads": threads})
+
+def _predict(tok):
+    return _PREDICT(tok)
+
+def run_bulk(in_path, out_path, spec, batch_size=64, workers=0, threads=0, prefetch_depth=4, build=build_predictor):
+    """
+    Predict every record of in_path (JSONL with "input") into out_path (same records + "pred", same order).
+    workers: model processes (0 = in-process). threads: intra-op threads per worker
+    (0 = cores // workers, or the torch default in-process). build: spec -> predict, a module-level function.
+    returns throughput stats.
+    """
+    from dac_q4_its.data.tokenization import load_encoder
+    encode = load_encoder(spec["mcfg"]["vocab_size"], str(Path(spec.get("root", "artifacts")) / "tokenizer.json"))
+    if workers and not threads:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    batches = prefetch(read_batches(in_path, batch_size), lambda rows: (rows, encode([r["input"] for r in rows])),
+                       prefetch_depth)
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    n_rows = n_batches = 0
+    t0 = time.perf_counter()
+    with open(out_path, "w", encoding="utf-8") as out:
+        def write(rows, preds):
+            nonlocal n_rows, n_batches
+            out.writelines(json.dumps({**r, "pred": p}) + "\n" for r, p in zip(rows, preds))
+            n_rows, n_batches = n_rows + len(rows), n_batches + 1
+        if not workers:
+            pin_threads(threads)
+            predict = build(spec)
+            for rows, tok in batches:
+                write(rows, predict(tok))
+        else:
+            ctx = mp.get_context("spawn")  # fresh interpreters: no forked torch thread pools
+            with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(build, spec, threads, ctx.Value("i", 0))) as ex:
+                inflight = deque()  # FIFO of (rows, future): written in input order
+                for rows, tok in batches:
+                    inflight.append((rows, ex.submit(_predict, tok)))
+                    if len(inflight) >= 2 * workers:  # bounded: one batch running and one queued per worker
+                        rows, fut = inflight.popleft()
+                        write(rows, fut.result())
+                while inflight:
+                    rows, fut = inflight.popleft()
+                    write(rows, fut.result())
+    seconds = time.perf_counter() - t0
+    return {"input": str(in_path), "output": str(out_path), "rows": n_rows, "batches": n_batches,
+            "workers": workers, "threads": threads, "seconds": seconds,
+            "rows_per_s": n_rows / seconds if seconds > 0 else 0.0}
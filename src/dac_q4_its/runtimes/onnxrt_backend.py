@@ -1 +1,176 @@
-# Placeholder for ONNXRuntime backend.
+"""
+ONNX Runtime CPU backend for the compressed model.
+
+export_compressed_onnx writes the graph by hand instead of tracing, so the base weights
+stay 4-bit in the file: each layer is DequantizeLinear(INT4 Q, per-row scales) -> Gemm
+(INT8 Q, blocked scales and FLOAT16 -> Cast for the other mixed-precision formats),
+plus the low-rank branch (x @ D^T) @ U^T, Add, Relu. A QuantizedEmbedding is gathered as
+INT8 rows and scaled in-graph. onnx / onnxruntime are imported lazily.
+"""
+import time
+import numpy as np
+import torch
+
+OPSET = 21        # INT4 DequantizeLinear
+IR_VERSION = 10
+
+def _int4_initializer(name, Q):
+    # ONNX packs INT4 over the flattened tensor (low nibble first); pack_int4 packs per row
+    from onnx import helper, TensorProto
+    q = Q.to(torch.int16).reshape(-1).numpy()
+    if q.size % 2:
+        q = np.append(q, 0)
+    nib = (q & 0xF).astype(np.uint8)
+    return helper.make_tensor(name, TensorProto.INT4, list(Q.shape), (nib[0::2] | (nib[1::2] << 4)).tobytes(), raw=True)
+
+def _base_initializer(name, lin):
+    """INT4 whenever the values fit (packed, or unpacked int4 kept as int8), else INT8 / FLOAT16 as stored."""
+    from onnx import numpy_helper
+    Q = lin.qweight()
+    if lin.packed or (Q.dtype == torch.int8 and int(Q.min()) >= -8 and int(Q.max()) <= 7):
+        return _int4_initializer(name, Q)
+    return numpy_helper.from_array(lin.Q.contiguous().numpy(), name)
+
+def _embedding_graph(embed):
+    """Initializers and nodes producing "emb" [B, T, H] from "tokens"."""
+    from onnx import helper, numpy_helper, TensorProto
+    from dac_q4_its.adapters.inject import QuantizedEmbedding
+    if not isinstance(embed, QuantizedEmbedding):
+        return ([numpy_helper.from_array(embed.weight.detach().float().numpy(), "embed")],
+                [helper.make_node("Gather", ["embed", "tokens"], ["emb"])])
+    # gathered as INT8 (ONNX Gather takes no INT4) and dequantized in-graph, row scales per token
+    H, G = embed.embedding_dim, embed.scales.shape[1]
+    dq = "emb_dq" if embed.rank else "emb"
+    inits = [numpy_helper.from_array(embed.qrows(torch.arange(embed.num_embeddings)).numpy(), "embed_q"),
+             numpy_helper.from_array(embed.scales.float().numpy(), "embed_scales")]
+    nodes = [helper.make_node("Gather", ["embed_q", "tokens"], ["emb_qi"]),
+             helper.make_node("Cast", ["emb_qi"], ["emb_qf"], to=TensorProto.FLOAT),
+             helper.make_node("Gather", ["embed_scales", "tokens"], ["emb_s"])]
+    if G == 1:
+        nodes.append(helper.make_node("Mul", ["emb_qf", "emb_s"], [dq]))
+    else:  # [B, T, H] -> [B, T, G, H/G] so each group meets its scale
+        inits += [numpy_helper.from_array(np.array([0, 0, G, H // G], dtype=np.int64), "emb_grouped"),
+                  numpy_helper.from_array(np.array([0, 0, H], dtype=np.int64), "emb_flat"),
+                  numpy_helper.from_array(np.array([3], dtype=np.int64), "emb_scale_axes")]
+        nodes += [helper.make_node("Reshape", ["emb_qf", "emb_grouped"], ["emb_qg"]),
+                  helper.make_node("Unsqueeze", ["emb_s", "emb_scale_axes"], ["emb_sg"]),
+                  helper.make_node("Mul", ["emb_qg", "emb_sg"], ["emb_g"]),
+                  helper.make_node("Reshape", ["emb_g", "emb_flat"], [dq])]
+    if embed.rank:
+        inits += [numpy_helper.from_array(embed.U.float().numpy(), "embed_U"),
+                  numpy_helper.from_array(embed.D.float().numpy(), "embed_D")]
+        nodes += [helper.make_node("Gather", ["embed_U", "tokens"], ["emb_u"]),
+                  helper.make_node("MatMul", ["emb_u", "embed_D"], ["emb_res"]),
+                  helper.make_node("Add", [dq, "emb_res"], ["emb"])]
+    return inits, nodes
+
+def export_compressed_onnx(model, path):
+    """model: ToyTransformer whose layers are CompressedLinear. Input tokens [B, T] int64 -> hidden [B, H]."""
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+    H = model.cfg.hidden_size
+    inits, nodes = _embedding_graph(model.embed)
+    inits.append(numpy_helper.from_array(np.array([1], dtype=np.int64), "pool_axes"))
+    if model.cfg.pad_id is None:
+        nodes.append(helper.make_node("ReduceMean", ["emb", "pool_axes"], ["h0"], keepdims=0))
+    else:  # mean over non-pad positions, as in ToyTransformer.forward
+        inits += [numpy_helper.from_array(np.array(model.cfg.pad_id, dtype=np.int64), "pad_id"),
+                  numpy_helper.from_array(np.array([2], dtype=np.int64), "mask_axes"),
+                  numpy_helper.from_array(np.array(1.0, dtype=np.float32), "one")]
+        nodes += [helper.make_node("Equal", ["tokens", "pad_id"], ["is_pad"]),
+                  helper.make_node("Not", ["is_pad"], ["keep"]),
+                  helper.make_node("Cast", ["keep"], ["keep_f"], to=TensorProto.FLOAT),
+                  helper.make_node("Unsqueeze", ["keep_f", "mask_axes"], ["mask"]),
+                  helper.make_node("Mul", ["emb", "mask"], ["emb_masked"]),
+                  helper.make_node("ReduceSum", ["emb_masked", "pool_axes"], ["emb_sum"], keepdims=0),
+                  helper.make_node("ReduceSum", ["mask", "pool_axes"], ["n_tok"], keepdims=0),
+                  helper.make_node("Max", ["n_tok", "one"], ["n_tok_c"]),
+                  helper.make_node("Div", ["emb_sum", "n_tok_c"], ["h0"])]
+    h = "h0"
+    for li, lin in enumerate(model.layers):
+        p = f"layer_{li}"
+        inits.append(_base_initializer(f"{p}_Q", lin))
+        if lin.Q.dtype == torch.float16:
+            nodes.append(helper.make_node("Cast", [f"{p}_Q"], [f"{p}_W"], to=TensorProto.FLOAT))
+        elif lin.scales.shape[1] == 1:
+            inits.append(numpy_helper.from_array(lin.scales.reshape(-1).float().numpy(), f"{p}_scales"))
+            nodes.append(helper.make_node("DequantizeLinear", [f"{p}_Q", f"{p}_scales"], [f"{p}_W"], axis=0))
+        else:  # blocked quantization: one scale per group of input columns
+            inits.append(numpy_helper.from_array(lin.scales.float().numpy(), f"{p}_scales"))
+            nodes.append(helper.make_node("DequantizeLinear", [f"{p}_Q", f"{p}_scales"], [f"{p}_W"], axis=1,
+                                          block_size=lin.in_features // lin.scales.shape[1]))
+        nodes.append(helper.make_node("Gemm", [h, f"{p}_W"], [f"{p}_main" if lin.rank else f"{p}_y"], transB=1))
+        if lin.rank:  # rank-0 layers export without the low-rank branch
+            U, D = lin.adapter_factors()  # low-precision U/D are exported dequantized
+            inits += [numpy_helper.from_array(D.T.contiguous().numpy(), f"{p}_Dt"),
+                      numpy_helper.from_array(U.T.contiguous().numpy(), f"{p}_Ut")]
+            nodes += [helper.make_node("MatMul", [h, f"{p}_Dt"], [f"{p}_z"]),
+                      helper.make_node("MatMul", [f"{p}_z", f"{p}_Ut"], [f"{p}_adapt"]),
+                      helper.make_node("Add", [f"{p}_main", f"{p}_adapt"], [f"{p}_y"])]
+        nodes.append(helper.make_node("Relu", [f"{p}_y"], [f"{p}_out"]))
+        h = f"{p}_out"
+    nodes.append(helper.make_node("Identity", [h], ["hidden"]))
+    graph = helper.make_graph(
+        nodes, "dac_q4_its_compressed",
+        [helper.make_tensor_value_info("tokens", TensorProto.INT64, ["batch", "seq"])],
+        [helper.make_tensor_value_info("hidden", TensorProto.FLOAT, ["batch", H])],
+        inits)
+    m = helper.make_model(graph, opset_imports=[helper.make_opsetid("", OPSET)], ir_version=IR_VERSION,
+                          producer_name="dac_q4_its")
+    onnx.checker.check_model(m)
+    onnx.save(m, str(path))
+    return path
+
+class OnnxRTBackend:
+    """
+    CPU InferenceSession over an exported compressed model.
+    intra_op_threads / inter_op_threads: 0 lets ORT decide.
+    graph_optimization_level: "disable" | "basic" | "extended" | "all".
+    """
+    LEVELS = {"disable": "ORT_DISABLE_ALL", "basic": "ORT_ENABLE_BASIC",
+              "extended": "ORT_ENABLE_EXTENDED", "all": "ORT_ENABLE_ALL"}
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0, graph_optimization_level="all",
+                 parallel=False, optimized_model_path=None, session_config=None):
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = intra_op_threads
+        so.inter_op_num_threads = inter_op_threads
+        so.graph_optimization_level = getattr(ort.GraphOptimizationLevel, self.LEVELS[graph_optimization_level])
+        so.execution_mode = ort.ExecutionMode.ORT_PARALLEL if parallel else ort.ExecutionMode.ORT_SEQUENTIAL
+        if optimized_model_path:
+            so.optimized_model_filepath = str(optimized_model_path)
+        for k, v in (session_config or {}).items():
+            so.add_session_config_entry(k, str(v))
+        self.session = ort.InferenceSession(str(path), so, providers=["CPUExecutionProvider"])
+
+    def __call__(self, tok):  # tok: [B, T] int64 -> [B, H] torch.float32
+        out = self.session.run(["hidden"], {"tokens": np.asarray(tok, dtype=np.int64)})[0]
+        return torch.from_numpy(out)
+
+@torch.no_grad()
+def parity_check(model, backend, tok, rtol=1e-4, atol=1e-4):
+    """
+    PyTorch CompressedLinear path vs ORT on the same tokens. ok requires both rel_err = |ort - torch| / |torch|
+    (Frobenius) <= rtol and max |ort - torch| <= atol * max |torch|, so the check follows the output scale.
+    """
+    ref = model(tok)
+    out = backend(tok)
+    err = float((ref - out).abs().max())
+    scale = float(ref.abs().max())
+    rel = float((out - ref).norm() / ref.norm().clamp(min=1e-12))
+    return {"max_abs_err": err, "max_abs_ref": scale, "rel_err": rel,
+            "ok": rel <= rtol and err <= atol * max(scale, 1e-12)}
+
+@torch.no_grad()
+def compare_latency(model, backend, tok, iters=50, warmup=5):
+    """Mean per-call latency (ms) of eager PyTorch vs ONNX Runtime."""
+    out = {}
+    for name, fn in [("torch_eager", model), ("onnxruntime", backend)]:
+        for _ in range(warmup):
+            fn(tok)
+        t0 = time.perf_counter()
+        for _ in range(iters):
+            fn(tok)
+        out[name] = (time.perf_counter() - t0) / iters * 1e3
+    return out
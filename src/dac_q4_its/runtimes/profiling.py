@@ -0,0 +1,139 @@
+"""
+Opt-in per-layer profiling for CompressedLinear / AdapterBankLinear.
+
+    with LayerProfiler(model) as prof:
+        model(tok)
+    print(prof.table())
+    prof.save_trace("artifacts/trace.json")   # chrome://tracing or ui.perfetto.dev
+
+While a profiler is active, each compressed layer's forward is routed through LayerProfiler.run,
+which times the dequantization (unpack / cast / scale), the base matmul and the low-rank U(Dx)
+branch separately. When no profiler is active the only cost is the `ACTIVE is not None` check.
+Allocation bytes are the sizes of the tensors each phase creates (CPU has no allocator counters).
+"""
+import json, threading, time
+from collections import defaultdict
+from pathlib import Path
+
+ACTIVE = None  # the running LayerProfiler, if any
+
+PHASES = ("dequant", "base", "adapter")
+
+def _nbytes(t):
+    return t.numel() * t.element_size()
+
+class LayerProfiler:
+    def __init__(self, model=None):
+        self.model = model
+        self.names = {}
+        self.events = []  # {"layer", "phase", "ts_us", "dur_us", "bytes", "batch", "tid"}
+        self.hooks = []
+        self.starts = {}
+        self.t0 = time.perf_counter()
+
+    def __enter__(self):
+        global ACTIVE
+        if ACTIVE is not None:
+            raise RuntimeError("another LayerProfiler is already active")
+        if self.model is not None:
+            self.names = {id(m): n for n, m in self.model.named_modules()}
+            self.hooks += [self.model.register_forward_pre_hook(lambda m, a: self._open("model", "forward")),
+                           self.model.register_forward_hook(lambda m, a, o: self._close("model", "forward", o))]
+            embed = getattr(self.model, "embed", None)
+            if embed is not None:
+                self.hooks += [embed.register_forward_pre_hook(lambda m, a: self._open("embed", "embed")),
+                               embed.register_forward_hook(lambda m, a, o: self._close("embed", "embed", o))]
+        ACTIVE = self
+        return self
+
+    def __exit__(self, *exc):
+        global ACTIVE
+        ACTIVE = None
+        for h in self.hooks:
+            h.remove()
+        self.hooks = []
+
+    def _record(self, layer, phase, t_start, t_end, nbytes, batch):
+        self.events.append({"layer": layer, "phase": phase, "ts_us": (t_start - self.t0) * 1e6,
+                            "dur_us": (t_end - t_start) * 1e6, "bytes": nbytes, "batch": batch,
+                            "tid": threading.get_ident()})
+
+    def _open(self, layer, phase):
+        self.starts[layer, phase] = time.perf_counter()
+
+    def _close(self, layer, phase, out):
+        t = time.perf_counter()
+        self._record(layer, phase, self.starts.pop((layer, phase)), t, _nbytes(out), out.shape[0])
+
+    def run(self, lin, x, *adapter_args):
+        """Profiled equivalent of lin.base(x) + lin.adapter(x, *adapter_args)."""
+        name = self.names.get(id(lin), f"{type(lin).__name__}@{id(lin):x}")
+        B, clock = x.shape[0], time.perf_counter
+        t0 = clock()
+        if lin.blocked:  # unpack/dequant and matmul interleave per row block; laid out back to back
+            t_dq, dq_bytes = 0.0, 0
+            y = x.new_empty(B, lin.Q.shape[0])
+            for r0 in range(0, lin.Q.shape[0], lin.block_size):
+                a = clock()
+                W = lin.block_operand(x, r0, r0 + lin.block_size)
+                t_dq, dq_bytes = t_dq + clock() - a, dq_bytes + _nbytes(W)
+                y[:, r0:r0 + lin.block_size] = lin.block_matmul(x, W, r0, r0 + lin.block_size)
+            t1, t2 = t0 + t_dq, clock()
+        else:
+            resident = (lin.strategy == "cached" and lin.Wdq is not None) or (lin.integer and lin.Wq8 is not None)
+            W = lin.base_operand(x)
+            t1 = clock()
+            y = lin.base_matmul(x, W)
+            t2 = clock()
+            dq_bytes = 0 if resident else _nbytes(W)
+        a = lin.adapter(x, *adapter_args)
+        t3 = clock()
+        z_bytes = B * lin.D.shape[-2] * a.element_size()  # the [B, k] intermediate
+        self._record(name, "dequant", t0, t1, dq_bytes, B)
+        self._record(name, "base", t1, t2, _nbytes(y), B)
+        self._record(name, "adapter", t2, t3, _nbytes(a) + z_bytes, B)
+        return y + a
+
+    def summary(self):
+        """Per-layer totals over all recorded calls: calls, ms per phase, bytes per phase, adapter share."""
+        acc = defaultdict(lambda: defaultdict(float))
+        for e in self.events:
+            r = acc[e["layer"]]
+            r[f"{e['phase']}_ms"] += e["dur_us"] / 1e3
+            r[f"{e['phase']}_bytes"] += e["bytes"]
+            if e["phase"] in ("dequant", "forward", "embed"):
+                r["calls"] += 1
+        out = {}
+        for layer, r in acc.items():
+            row = dict(r)
+            compute = sum(row.get(f"{p}_ms", 0.0) for p in PHASES)
+            if compute:
+                row["total_ms"] = compute
+                row["adapter_share"] = row.get("adapter_ms", 0.0) / compute
+                row["dequant_share"] = row.get("dequant_ms", 0.0) / compute
+            out[layer] = row
+        return out
+
+    def table(self):
+        rows = [f"{'layer':12s} {'calls':>6s} {'total ms':>9s} {'dequant ms':>11s} {'base ms':>9s} "
+                f"{'adapter ms':>11s} {'adapter %':>9s} {'alloc KiB':>10s}"]
+        for layer, r in self.summary().items():
+            if "total_ms" not in r:  # model / embed spans
+                rows.append(f"{layer:12s} {int(r['calls']):6d} {r.get('forward_ms', r.get('embed_ms', 0.0)):9.3f}")
+                continue
+            alloc = sum(r.get(f"{p}_bytes", 0.0) for p in PHASES) / 1024
+            rows.append(f"{layer:12s} {int(r['calls']):6d} {r['total_ms']:9.3f} {r['dequant_ms']:11.3f} "
+                        f"{r['base_ms']:9.3f} {r['adapter_ms']:11.3f} {100 * r['adapter_share']:8.1f}% {alloc:10.1f}")
+        return "\n".join(rows)
+
+    def trace(self):
+        """Chrome trace-event JSON (complete "X" events, one track per thread)."""
+        return {"traceEvents": [{"name": f"{e['layer']}.{e['phase']}", "cat": e["phase"], "ph": "X",
+                                 "ts": e["ts_us"], "dur": e["dur_us"], "pid": 0, "tid": e["tid"],
+                                 "args": {"bytes": e["bytes"], "batch": e["batch"]}} for e in self.events],
+                "displayTimeUnit": "ms"}
+
+    def save_trace(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.trace()))
+        return path
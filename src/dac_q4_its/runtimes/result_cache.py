@@ -0,0 +1,99 @@
+"""
+Result cache in front of the model: normalized prompt -> decoded prediction.
+
+Entries are keyed on simple_norm(prompt) (the same form evaluation.nln.normalize compares),
+evicted LRU past max_entries and dropped after ttl_s seconds. Every cache carries the
+artifact version it was filled against; a warm-start file written under a different
+version is discarded on load, so rebuilt weights/adapters never serve stale answers.
+"""
+import hashlib, json, os, time
+from collections import OrderedDict
+from pathlib import Path
+from dac_q4_its.data.tokenization import simple_norm
+
+def artifact_version(root="artifacts", extra=None, files=None):
+    """
+    Digest of the deployed artifacts (name, size, mtime) plus any extra config (adapter
+    sets, backend, ...). Stat-based so it costs nothing at startup even for large weights.
+    """
+    if files is None:
+        r = Path(root)
+        files = sorted(r.glob("weights/*.pkl")) + [p for p in (r / "model.dacq", r / "tokenizer.json") if p.exists()]
+    h = hashlib.sha256(json.dumps(extra, sort_keys=True, default=str).encode("utf-8"))
+    for p in files:
+        st = os.stat(p)
+        h.update(f"{Path(p).name}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+class ResultCache:
+    """
+    Bounded LRU/TTL map from normalized prompt to prediction.
+    key_fn: prompt -> key (default simple_norm); pass a tuple-producing fn to key on (adapter, prompt).
+    """
+    def __init__(self, max_entries=4096, ttl_s=None, version=None, key_fn=simple_norm):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.version = version
+        self.key_fn = key_fn
+        self.entries = OrderedDict()  # key -> (value, inserted_at)
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, prompt, default=None):
+        key = self.key_fn(prompt)
+        hit = self.entries.get(key)
+        if hit is not None and self.ttl_s is not None and time.time() - hit[1] > self.ttl_s:
+            del self.entries[key]
+            self.expirations += 1
+            hit = None
+        if hit is None:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return hit[0]
+
+    def put(self, prompt, value):
+        key = self.key_fn(prompt)
+        self.entries[key] = (value, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, version=None):
+        """Drop every entry (e.g. after hot-swapping adapters) and adopt the new version."""
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.version = version if version is not None else self.version
+
+    def stats(self):
+        n = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / n if n else 0.0, "evictions": self.evictions,
+                "expirations": self.expirations, "invalidations": self.invalidations, "version": self.version}
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(f"{path}.tmp")
+        tmp.write_text(json.dumps({"version": self.version,
+                                   "entries": [[k, v, t] for k, (v, t) in self.entries.items()]}))
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Warm start from save(); returns the number of entries loaded (0 on version mismatch)."""
+        if not os.path.exists(path):
+            return 0
+        d = json.loads(Path(path).read_text())
+        if d.get("version") != self.version:
+            self.invalidations += len(d.get("entries", []))
+            return 0
+        now = time.time()
+        for k, v, t in d["entries"]:
+            if self.ttl_s is None or now - t <= self.ttl_s:
+                self.entries[k if isinstance(k, str) else tuple(k)] = (v, t)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return len(self.entries)
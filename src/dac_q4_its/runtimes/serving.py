@@ -0,0 +1,192 @@
+"""
+Long-lived inference server with asyncio dynamic micro-batching.
+
+Clients send newline-delimited JSON over a Unix socket or local TCP port:
+  {"prompt": "navigate to airport avoiding tolls"}  -> {"pred": "...", "latency_ms": ...}
+  {"cmd": "stats"}                                  -> latency percentiles / throughput
+Concurrent requests are coalesced into one model call of up to max_batch_size rows,
+waiting at most max_delay_ms for a batch to fill. With a ResultCache, repeated
+(normalized) prompts are answered in submit() without entering the queue.
+"""
+import asyncio, json, os, stat, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import torch
+
+class LatencyStats:
+    def __init__(self, window=10000):
+        self.lat = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.n_requests = 0
+        self.n_hits = 0
+        self.n_batches = 0
+        self.t_first = self.t_last = None  # throughput is measured over the busy span
+
+    def _window(self, start_ms):
+        now = time.perf_counter()
+        if self.t_first is None or now - start_ms / 1e3 < self.t_first:
+            self.t_first = now - start_ms / 1e3
+        self.t_last = now
+
+    def add_hit(self, latency_ms):
+        self._window(latency_ms)
+        self.lat.append(latency_ms)
+        self.n_requests += 1
+        self.n_hits += 1
+
+    def add_batch(self, latencies_ms):
+        self._window(max(latencies_ms))
+        self.lat.extend(latencies_ms)
+        self.batch_sizes.append(len(latencies_ms))
+        self.n_requests += len(latencies_ms)
+        self.n_batches += 1
+
+    def summary(self):
+        lat = sorted(self.lat)
+        pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] if lat else float("nan")
+        elapsed = (self.t_last - self.t_first) if self.t_first is not None else 0.0
+        rate = lambda n: n / elapsed if elapsed > 0 else 0.0
+        return {"requests": self.n_requests, "cache_hits": self.n_hits, "batches": self.n_batches,
+                "mean_batch_size": sum(self.batch_sizes) / max(1, len(self.batch_sizes)),
+                "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+                "throughput_rps": rate(self.n_requests), "model_rps": rate(self.n_requests - self.n_hits)}
+
+class MicroBatcher:
+    """
+    run_batch(list_of_items) -> list_of_results is called once per micro-batch on a single
+    worker thread, so the event loop keeps accepting requests while the model runs.
+    cache: optional ResultCache; only accessed from the event loop thread.
+    """
+    def __init__(self, run_batch, max_batch_size=32, max_delay_ms=5.0, cache=None):
+        self.run_batch = run_batch
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1e3
+        self.queue = asyncio.Queue()
+        self.stats = LatencyStats()
+        self.executor = ThreadPoolExecutor(1)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._loop())
+        return self
+
+    async def submit(self, item):
+        if self.cache is not None:
+            t0 = time.perf_counter()
+            hit = self.cache.get(item)
+            if hit is not None:
+                self.stats.add_hit((time.perf_counter() - t0) * 1e3)
+                return hit
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, fut, time.perf_counter()))
+        return await fut
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            items = [b[0] for b in batch]
+            run = self.run_batch if self.cache is None else self._dedup_run
+            try:
+                results = await loop.run_in_executor(self.executor, run, items)
+            except Exception as e:  # fail the whole batch, keep serving
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            if self.cache is not None:
+                for x, res in zip(items, results):
+                    self.cache.put(x, res)
+            now = time.perf_counter()
+            self.stats.add_batch([(now - t0) * 1e3 for _, _, t0 in batch])
+            for (_, fut, _), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+    def _dedup_run(self, items):
+        # one model row per distinct normalized prompt in the batch
+        keys = [self.cache.key_fn(x) for x in items]
+        first = {}
+        for k, x in zip(keys, items):
+            first.setdefault(k, x)
+        out = dict(zip(first, self.run_batch(list(first.values()))))
+        return [out[k] for k in keys]
+
+def model_runner(model, encode, decode):
+    """Batch function for MicroBatcher: prompts -> encode -> one model(tok) call -> decode."""
+    @torch.no_grad()
+    def run(prompts):
+        return decode(model(encode(prompts)))
+    return run
+
+def grammar_runner(model, encode, decoder):
+    """Batch function for MicroBatcher with constrained decoding (modeling.grammar.GrammarDecoder)."""
+    @torch.no_grad()
+    def run(prompts):
+        return decoder(model, encode(prompts))
+    return run
+
+async def handle_client(batcher, reader, writer):
+    try:
+        while line := await reader.readline():
+            try:
+                req = json.loads(line)
+                if req.get("cmd") == "stats":
+                    resp = batcher.stats.summary()
+                    if batcher.cache is not None:
+                        resp["cache"] = batcher.cache.stats()
+                else:
+                    t0 = time.perf_counter()
+                    pred = await batcher.submit(req["prompt"])
+                    resp = {"input": req["prompt"], "pred": pred, "latency_ms": (time.perf_counter() - t0) * 1e3}
+            except Exception as e:
+                resp = {"error": str(e)}
+            writer.write((json.dumps(resp) + "\n").encode("utf-8"))
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(run_batch, unix_path=None, host="127.0.0.1", port=8765, max_batch_size=32, max_delay_ms=5.0,
+                cache=None):
+    batcher = MicroBatcher(run_batch, max_batch_size, max_delay_ms, cache=cache).start()
+    handler = lambda r, w: handle_client(batcher, r, w)
+    if unix_path:
+        _unlink_socket(unix_path)  # stale socket from a previous run; any other file is left to fail the bind
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if unix_path:
+            _unlink_socket(unix_path)
+
+def _unlink_socket(path):
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def request(prompt=None, unix_path=None, host="127.0.0.1", port=8765, cmd=None):
+    """Minimal client: one request per connection."""
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps({"cmd": cmd} if cmd else {"prompt": prompt}) + "\n").encode("utf-8"))
+    await writer.drain()
+    resp = json.loads(await reader.readline())
+    writer.close()
+    return resp
@@ -0,0 +1,110 @@
+import hashlib, json, os, shutil, threading
+from pathlib import Path
+import torch
+from dac_q4_its.utils.io import load_bin
+
+def config_digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class ArtifactCache:
+    """
+    Content-addressed bookkeeping for pipeline outputs, stored in <root>/.cache/manifest.json.
+
+    key(inputs, config) hashes the bytes of every input file plus the stage config; outputs
+    recorded under that key are reused until an input or the config changes, or an output
+    is deleted or modified on disk. File digests are memoized on (size, mtime) so unchanged
+    inputs are not re-read on every run. Pickled tensors are hashed by dtype/shape/data, since
+    torch pickles embed storage addresses and are not byte-identical across rewrites.
+    With keep_objects, a copy of each output set is kept under .cache/objects/<key>/, so switching a
+    config back restores files instead of recomputing; gc(max_bytes) evicts the least recently used sets.
+    """
+    def __init__(self, root="artifacts", keep_objects=False):
+        self.path = Path(root) / ".cache" / "manifest.json"
+        self.objects = Path(root) / ".cache" / "objects" if keep_objects else None
+        self.manifest = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.manifest.setdefault("outputs", {})
+        self.manifest.setdefault("digests", {})
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def file_digest(self, path):
+        path = str(path)
+        stat = self._stat(path)
+        with self.lock:
+            hit = self.manifest["digests"].get(path)
+        if hit and hit["stat"] == stat:
+            return hit["sha256"]
+        h = hashlib.sha256()
+        obj = load_bin(path) if path.endswith(".pkl") else None
+        if hasattr(obj, "numpy"):
+            t = obj.detach().cpu().contiguous()
+            h.update(f"{t.dtype}{tuple(t.shape)}".encode())
+            h.update(t.reshape(-1).view(torch.uint8).numpy().tobytes())
+        else:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        with self.lock:
+            self.manifest["digests"][path] = {"stat": stat, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+    def key(self, inputs, config=None):
+        return config_digest({"inputs": [self.file_digest(p) for p in inputs], "config": config})
+
+    def fresh(self, outputs, key):
+        with self.lock:
+            recs = [self.manifest["outputs"].get(str(o)) for o in outputs]
+        return all(r is not None and r["key"] == key and os.path.exists(o) and r["sha256"] == self.file_digest(o)
+                   for o, r in zip(outputs, recs))
+
+    def record(self, outputs, key):
+        if self.objects is not None:
+            obj = self.objects / key
+            obj.mkdir(parents=True, exist_ok=True)
+            for o in outputs:
+                shutil.copy2(o, obj / Path(o).name)
+            os.utime(obj)  # last use, for gc
+        for o in outputs:
+            digest = self.file_digest(o)
+            with self.lock:
+                self.manifest["outputs"][str(o)] = {"key": key, "sha256": digest}
+
+    def restore(self, outputs, key):
+        """Copy a previously recorded output set back into place; False if it is not stored."""
+        obj = self.objects / key if self.objects is not None else None
+        if obj is None or not all((obj / Path(o).name).exists() for o in outputs):
+            return False
+        for o in outputs:
+            Path(o).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(obj / Path(o).name, o)
+        os.utime(obj)
+        for o in outputs:
+            digest = self.file_digest(o)
+            with self.lock:
+                self.manifest["outputs"][str(o)] = {"key": key, "sha256": digest}
+        return True
+
+    def gc(self, max_bytes=0):
+        """Evict least recently used object sets until they total at most max_bytes; returns (evicted, bytes kept)."""
+        root = self.objects or self.path.parent / "objects"
+        if not root.exists():
+            return 0, 0
+        sets = [(d.stat().st_mtime_ns, sum(f.stat().st_size for f in d.iterdir()), d) for d in root.iterdir() if d.is_dir()]
+        total, evicted = sum(n for _, n, _ in sets), 0
+        for _, n, d in sorted(sets, key=lambda s: s[0]):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(d)
+            total, evicted = total - n, evicted + 1
+        return evicted, total
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.manifest, indent=1))
+            os.replace(tmp, self.path)
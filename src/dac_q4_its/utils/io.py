@@ -18,3 +18,95 @@ def save_bin(obj, path):
 def load_bin(path):
     with open(path, "rb") as f:
         return pickle.load(f)
+
+# ---------------------------------------------------------------------------
+# Single-file tensor container (.dacq)
+#   [8B magic][8B little-endian header length][JSON header][pad][tensor data...]
+# Every tensor starts at a multiple of ALIGN bytes from the start of the file, so
+# load_tensors can hand out views onto an mmap of the file without copying.
+# The header is plain JSON (no pickle), safe to parse from untrusted OTA files.
+# ---------------------------------------------------------------------------
+MAGIC = b"DACQ4TS\x00"
+ALIGN = 64
+DTYPES = ("float32", "float16", "bfloat16", "float64", "int8", "uint8", "int16", "int32", "int64", "bool")
+
+def _dtype(name):
+    """Header dtype string -> torch dtype, only from the DTYPES whitelist (never an arbitrary torch attribute)."""
+    import torch
+    if name not in DTYPES:
+        raise ValueError(f"unsupported tensor dtype {name!r}, expected one of {DTYPES}")
+    return getattr(torch, name)
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+def save_tensors(tensors: dict, path, metadata=None):
+    import torch
+    entries, offset = {}, 0
+    for name, t in tensors.items():
+        nbytes = t.numel() * t.element_size()
+        dtype = str(t.dtype).replace("torch.", "")
+        _dtype(dtype)
+        entries[name] = {"dtype": dtype, "shape": list(t.shape),
+                         "offset": offset, "nbytes": nbytes}
+        offset = _align(offset + nbytes)
+    header = json.dumps({"tensors": entries, "metadata": metadata or {}}).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, t in tensors.items():
+            f.write(b"\x00" * (data_start + entries[name]["offset"] - f.tell()))
+            f.write(t.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a tensor container")
+        n = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(n).decode("utf-8"))
+    header["data_start"] = _align(len(MAGIC) + 8 + n)
+    return header
+
+def load_tensors(path, mmap=True):
+    """
+    Returns ({name: tensor}, metadata). With mmap=True tensors are copy-on-write
+    views onto the mapped file: nothing is read until touched and nothing is copied.
+    """
+    import mmap as _mmap, torch
+    header = read_header(path)
+    with open(path, "rb") as f:
+        buf = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_COPY) if mmap else bytearray(f.read())
+    out = {}
+    for name, e in header["tensors"].items():
+        dtype = _dtype(e["dtype"])
+        shape, offset, nbytes = e["shape"], e["offset"], e["nbytes"]
+        if not (isinstance(shape, list) and all(type(n) is int and n >= 0 for n in shape)):
+            raise ValueError(f"{path}: tensor {name} has invalid shape {shape!r}")
+        if type(offset) is not int or offset < 0 or offset % ALIGN:
+            raise ValueError(f"{path}: tensor {name} has invalid offset {offset!r}")
+        count = 1
+        for n in shape:
+            count *= n
+        if nbytes != count * torch.empty((), dtype=dtype).element_size():
+            raise ValueError(f"{path}: tensor {name} nbytes {nbytes!r} does not match shape {shape} x {e['dtype']}")
+        start = header["data_start"] + offset
+        if start + nbytes > len(buf):
+            raise ValueError(f"{path}: tensor {name} runs past end of file")
+        if nbytes == 0:
+            out[name] = torch.empty(shape, dtype=dtype)
+            continue
+        out[name] = torch.frombuffer(buf, dtype=dtype, count=count, offset=start).reshape(shape)
+    return out, header["metadata"]
+
+def convert_pkl_dir(src_dir, out_path, patterns=("*.pkl",), metadata=None):
+    """Pack per-tensor pickles (legacy save_bin layout) into one container keyed by file stem."""
+    import torch
+    tensors = {}
+    for pattern in patterns:
+        for p in sorted(Path(src_dir).glob(pattern)):
+            obj = load_bin(p)
+            if isinstance(obj, torch.Tensor):
+                tensors[p.stem] = obj
+    save_tensors(tensors, out_path, metadata=metadata)
+    return list(tensors)
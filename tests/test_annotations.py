@@ -0,0 +1,41 @@
+import json
+import pandas as pd
+from dac_q4_its.evaluation.annotations import COLS, merge_to_parquet
+
+def _export(rows):
+    df = pd.DataFrame(rows, columns=["item_id", "annotator_id", "coherence"])
+    for c in COLS:
+        if c not in df:
+            df[c] = 3 if c in ("relevance", "instruction_following", "safety_compliance", "fluency") else "x"
+    return df[COLS]
+
+def test_merge_rejects_dedups_and_reads_back(tmp_path):
+    a = _export([(1, "ann1", 4), (1, "ann2", 9), (2, "ann1", 2)])      # 9 is out of range
+    b = _export([(2, "ann1", 5), (3, "ann2", "n/a")])                   # overrides (2, ann1); "n/a" rejected
+    a.to_csv(tmp_path / "a.csv", index=False)
+    b.to_csv(tmp_path / "b.csv", index=False)
+    report, bad = merge_to_parquet([tmp_path / "a.csv", tmp_path / "b.csv"], tmp_path / "merged",
+                                   n_buckets=4, chunksize=2, workers=2)
+    assert (report["rows_read"], report["rows_rejected"], report["duplicates_dropped"], report["rows_written"]) == (5, 2, 1, 2)
+    assert sorted(zip(bad["source"].map(lambda p: p[-5:]), bad["row"], bad["value"].astype(str))) == \
+        [("a.csv", 3, "9"), ("b.csv", 3, "n/a")]
+    df = pd.read_parquet(tmp_path / "merged").sort_values("item_id")
+    assert df[["item_id", "annotator_id", "coherence"]].values.tolist() == [["1", "ann1", 4.0], ["2", "ann1", 5.0]]
+    assert json.loads((tmp_path / "merged" / "_merge_report.json").read_text()) == report
+
+def test_merge_replaces_only_its_own_outputs(tmp_path):
+    import pytest
+    _export([(1, "ann1", 4)]).to_csv(tmp_path / "a.csv", index=False)
+    out = tmp_path / "merged"
+    merge_to_parquet([tmp_path / "a.csv"], out, n_buckets=4)
+    (out / "NOTES.md").write_text("keep me")
+    (out / "bucket=99").mkdir()                      # stale bucket from a run with more buckets
+    report, _ = merge_to_parquet([tmp_path / "a.csv"], out, n_buckets=2)
+    assert (out / "NOTES.md").read_text() == "keep me" and not (out / "bucket=99").exists()
+    assert report["rows_written"] == 1
+    results = tmp_path / "results"
+    results.mkdir()
+    (results / "model.pt").write_text("x")
+    with pytest.raises(ValueError):
+        merge_to_parquet([tmp_path / "a.csv"], results)
+    assert (results / "model.pt").exists()
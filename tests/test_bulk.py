@@ -0,0 +1,29 @@
+import json
+import pytest
+from dac_q4_its.runtimes.bulk import prefetch, run_bulk
+
+def _echo_build(spec):  # module level so spawned workers can unpickle it
+    return lambda tok: [f"len={int((row != 0).sum())}" for row in tok]
+
+def test_prefetch_keeps_order_and_reraises():
+    assert list(prefetch(range(10), lambda i: i * i, depth=2)) == [i * i for i in range(10)]
+    def boom(i):
+        if i == 3:
+            raise ValueError("bad row")
+        return i
+    with pytest.raises(ValueError):
+        list(prefetch(range(10), boom))
+
+def test_bulk_output_follows_input_order(tmp_path):
+    rows = [{"input": " ".join(["word"] * (i % 7 + 1)), "target": str(i)} for i in range(50)]
+    src = tmp_path / "in.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    spec = {"mcfg": {"vocab_size": 100}, "root": str(tmp_path)}  # no tokenizer.json: word-hash encoding
+    for workers in (0, 2):
+        out = tmp_path / f"out{workers}.jsonl"
+        stats = run_bulk(src, out, spec, batch_size=8, workers=workers, threads=1 if workers else 0,
+                         build=_echo_build)  # threads=0: leave this process unpinned
+        got = [json.loads(line) for line in open(out)]
+        assert stats["rows"] == 50 and stats["batches"] == 7
+        assert [g["target"] for g in got] == [r["target"] for r in rows]
+        assert [g["pred"] for g in got] == [f"len={i % 7 + 1}" for i in range(50)]
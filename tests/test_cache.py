@@ -0,0 +1,34 @@
+import torch
+from dac_q4_its.utils.cache import ArtifactCache
+from dac_q4_its.utils.io import save_bin
+
+def test_artifact_cache_staleness_and_restore(tmp_path):
+    src, out = tmp_path / "w.pkl", tmp_path / "q.pkl"
+    save_bin(torch.ones(4), src)
+    cache = ArtifactCache(tmp_path, keep_objects=True)
+    key = cache.key([src], {"bits": 4})
+    assert not cache.fresh([out], key)
+    save_bin(torch.zeros(4), out)
+    cache.record([out], key)
+    save_bin(torch.ones(4), src)  # rewritten, same content
+    assert cache.key([src], {"bits": 4}) == key and cache.fresh([out], key)
+    assert cache.key([src], {"bits": 8}) != key
+    out.unlink()
+    assert not cache.fresh([out], key) and cache.restore([out], key) and cache.fresh([out], key)
+
+def test_objects_are_opt_in_and_evicted_least_recently_used(tmp_path):
+    import os
+    out = tmp_path / "q.pkl"
+    save_bin(torch.zeros(4), out)
+    ArtifactCache(tmp_path).record([out], "k0")
+    assert not (tmp_path / ".cache" / "objects").exists()
+    cache = ArtifactCache(tmp_path, keep_objects=True)
+    for i, key in enumerate(["k1", "k2", "k3"]):
+        save_bin(torch.full((256,), float(i)), out)
+        cache.record([out], key)
+        os.utime(tmp_path / ".cache" / "objects" / key, ns=(i * 10**9, i * 10**9))
+    assert cache.restore([out], "k1")  # k1 becomes the most recently used
+    one = (tmp_path / ".cache" / "objects" / "k1" / "q.pkl").stat().st_size
+    assert cache.gc(2 * one) == (1, 2 * one)
+    assert sorted(p.name for p in (tmp_path / ".cache" / "objects").iterdir()) == ["k1", "k3"]
+    assert cache.gc(0)[0] == 2 and not cache.restore([out], "k3")
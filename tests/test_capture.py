@@ -0,0 +1,21 @@
+import functools, torch
+from dac_q4_its.adapters.capture import capture_covariances, iter_corpus_batches, merge_partials
+from dac_q4_its.data.tokenization import hash_encode
+from dac_q4_its.modeling.loader import load_toy
+
+def test_sharded_capture_matches_single_pass(tmp_path):
+    corpus = tmp_path / "calib.txt"
+    corpus.write_text("\n".join(f"navigate to stop {i} avoiding tolls" for i in range(50)), encoding="utf-8")
+    model = load_toy({"hidden_size": 16, "n_layers": 2, "vocab_size": 100}).eval()
+    encode = functools.partial(hash_encode, vocab_size=100)
+    full = capture_covariances(model, iter_corpus_batches(corpus, encode, batch_size=8))
+    for k in (3, 7):  # byte ranges split lines mid-way; each line must land in exactly one shard
+        shards = [capture_covariances(model, iter_corpus_batches(corpus, encode, 8, s, k)) for s in range(k)]
+        merged = merge_partials(shards)
+        for name, (C, n) in full.items():
+            assert n == 50 and merged[name][1] == 50
+            assert torch.allclose(merged[name][0], C)
+    head = capture_covariances(model, iter_corpus_batches(corpus, encode, 8, max_lines=20))
+    shards = [capture_covariances(model, iter_corpus_batches(corpus, encode, 8, s, 4, max_lines=20)) for s in range(4)]
+    assert all(n == 20 for _, n in merge_partials(shards).values())
+    assert all(n == 20 for _, n in head.values())
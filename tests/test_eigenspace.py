@@ -0,0 +1,12 @@
+import pytest, torch
+from dac_q4_its.adapters.eigenspace import topk_eigvecs_from_activations, eigenspace_accuracy
+
+@pytest.mark.parametrize("solver", ["eigh", "svd", "randomized", "lobpcg", "auto"])
+def test_topk_solvers_match_eigh(solver):
+    torch.manual_seed(0)
+    A = torch.randn(200, 6) @ torch.randn(6, 64) * 4 + 0.1 * torch.randn(200, 64)
+    A = A.double()
+    V = topk_eigvecs_from_activations(A, 4, solver=solver)
+    assert V.shape == (64, 4)
+    acc = eigenspace_accuracy(A.T @ A, V)
+    assert acc["captured_energy"] > 0.999
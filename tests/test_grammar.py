@@ -0,0 +1,36 @@
+import torch
+from dac_q4_its.data.rules import load_lexicons
+from dac_q4_its.data.tokenization import train_tokenizer
+from dac_q4_its.evaluation.nln import parse_target
+from dac_q4_its.modeling.grammar import GrammarDecoder
+from dac_q4_its.modeling.loader import ModelCfg, ToyTransformer
+
+def _model(vocab):
+    torch.manual_seed(0)
+    return ToyTransformer(ModelCfg(hidden_size=16, n_layers=2, vocab_size=vocab, pad_id=0)).eval()
+
+def test_outputs_always_parse_and_forced_steps_skip_the_model():
+    lex = load_lexicons(None)
+    tok = train_tokenizer(["navigate to airport avoiding tolls", "route to downtown in heavy rain"] * 3, vocab_size=120)
+    dec = GrammarDecoder.from_lexicons(lex, tok, max_constraints=3)
+    model = _model(len(tok))
+    calls = []
+    fwd = lambda t: calls.append(t.shape[0]) or model(t)
+    out = dec(fwd, tok(["navigate to airport", "route home avoiding tolls", "x"]), model.embed.weight)
+    for o in out:
+        dest, cons = parse_target(o)
+        assert dest in lex["dests"] and 1 <= len(cons) <= 3 and len(set(cons)) == len(cons)
+    assert dec.stats["forced"] > 0 and dec.stats["forward_passes"] == len(calls) < dec.stats["steps"]
+    assert all(n <= 3 for n in calls)  # every pass is batched over the rows still waiting
+
+def test_single_alternatives_need_no_forward_pass():
+    dec = GrammarDecoder(["airport"], ["avoid_tolls"], lambda s: [ord(c) for c in s], sep_id=124, eos_id=2)
+    model = _model(200)
+    fwd = lambda t: (_ for _ in ()).throw(AssertionError("model called"))
+    assert dec(fwd, torch.tensor([[5, 6]]), model.embed.weight) == ["DEST=airport,CONSTRAINT=avoid_tolls"]
+    assert dec.stats["forward_passes"] == 0
+
+def test_hash_fallback_encoding():
+    dec = GrammarDecoder.from_lexicons(load_lexicons(None), None, vocab_size=500)
+    model = _model(500)
+    assert parse_target(dec(model, torch.tensor([[7, 9, 0]]))[0])[0] is not None
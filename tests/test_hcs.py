@@ -0,0 +1,30 @@
+import numpy as np
+from dac_q4_its.evaluation.hcs import count_matrices, fleiss_kappa, bootstrap_ci
+
+def _loop_counts(items, ratings, cats):
+    return np.array([[[(ratings[items == i, d] == c).sum() for c in cats] for i in np.unique(items)]
+                     for d in range(ratings.shape[1])])
+
+def test_count_matrices_match_loop():
+    rng = np.random.default_rng(0)
+    items = rng.integers(0, 30, 400)
+    ratings = rng.integers(0, 7, (400, 3)).astype(float)  # 0 and 6 fall outside the categories
+    assert np.array_equal(count_matrices(items, ratings, [1, 2, 3, 4, 5]), _loop_counts(items, ratings, [1, 2, 3, 4, 5]))
+
+def test_fleiss_kappa_equal_and_unequal_raters():
+    # Fleiss (1971) worked example: 10 items, 14 raters, 5 categories -> kappa 0.210
+    table = np.array([[0, 0, 0, 0, 14], [0, 2, 6, 4, 2], [0, 0, 3, 5, 6], [0, 3, 9, 2, 0], [2, 2, 8, 1, 1],
+                      [7, 7, 0, 0, 0], [3, 2, 6, 3, 0], [2, 5, 3, 2, 2], [6, 5, 2, 1, 0], [0, 2, 2, 3, 7]])
+    assert abs(fleiss_kappa(table) - 0.210) < 1e-3
+    assert fleiss_kappa(np.array([[3, 0], [0, 2], [4, 0], [1, 0]])) == 1.0  # perfect agreement, n_i < 2 dropped
+    k = fleiss_kappa(np.stack([table, table[:, ::-1]]))
+    assert k.shape == (2,) and np.allclose(k, 0.210, atol=1e-3)
+
+def test_bootstrap_ci_brackets_mean():
+    rng = np.random.default_rng(1)
+    counts = rng.integers(1, 5, 200)
+    sums = np.stack([counts * rng.normal(3, 1, 200), counts * 2.0], axis=1)
+    lo, hi = bootstrap_ci(sums, counts, n_boot=500, seed=0, max_cells=10_000)
+    mean = sums.sum(0) / counts.sum()
+    assert np.all(lo <= mean + 1e-12) and np.all(mean <= hi + 1e-12) and np.allclose(lo[1], 2.0)
+    assert np.array_equal(lo, bootstrap_ci(sums, counts, n_boot=500, seed=0, max_cells=10_000)[0])
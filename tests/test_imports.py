@@ -0,0 +1,7 @@
+import subprocess, sys
+
+def test_runtime_path_skips_training_modules():
+    code = ("import sys, dac_q4_its; assert dac_q4_its.CompressedLinear; import dac_q4_its.modeling.compressed; "
+            "bad = [m for m in ('pandas', 'dac_q4_its.pipeline', 'dac_q4_its.adapters.eigenspace', "
+            "'dac_q4_its.adapters.capture') if m in sys.modules]; assert not bad, bad")
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,150 @@
+import torch
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row, pack_int4
+from dac_q4_its.adapters.inject import CompressedLinear, AdapterBankLinear, STRATEGIES, strategy_delta
+from dac_q4_its.modeling.loader import load_toy
+
+def _layer_args(d=32, k=4):
+    W = torch.randn(d, d)
+    Q, S = quantize_int4_per_row(W)
+    U, D = torch.randn(d, k), torch.randn(k, d)
+    return Q, S, U, D
+
+def test_packed_matches_int8():
+    Q, S, U, D = _layer_args()
+    x = torch.randn(5, 32)
+    ref = CompressedLinear(Q, S, U, D)(x)
+    packed = CompressedLinear(pack_int4(Q), S, U, D)
+    assert packed.Q.numel() == Q.numel() // 2
+    assert torch.allclose(packed(x), ref, atol=1e-5)
+
+def test_strategies_agree():
+    Q, S, U, D = _layer_args(d=40)
+    x = torch.randn(3, 40)
+    ref = CompressedLinear(Q, S, U, D)(x)
+    for q in (Q, pack_int4(Q)):
+        for strategy in STRATEGIES:
+            mod = CompressedLinear(q, S, U, D, strategy=strategy, block_size=16)
+            if strategy == "w4a8":  # int8 activations: close, not exact
+                assert (mod(x) - ref).norm() / ref.norm() < 0.02
+            else:
+                assert torch.allclose(mod(x), ref, atol=1e-4), strategy
+
+def test_w4a8_is_exact_on_int8_representable_inputs():
+    Q, S, U, D = _layer_args(d=32)
+    x = torch.randint(-127, 128, (4, 32)).float() * 0.01
+    x[:, 0] = 1.27  # per-token scale becomes exactly 0.01
+    ref = CompressedLinear(pack_int4(Q), S, U, D)
+    mod = CompressedLinear(pack_int4(Q), S, U, D, strategy="w4a8")
+    assert torch.allclose(mod(x), ref(x), atol=1e-4)
+    assert mod.Wq8.dtype == torch.int8 and mod.Wq8.shape == (32, 32)
+
+def test_strategy_delta_reports_w4a8_drift():
+    model = load_toy({"hidden_size": 32, "n_layers": 2, "vocab_size": 50}).eval()
+    for li, lin in enumerate(model.layers):
+        Q, S = quantize_int4_per_row(lin.weight.data)
+        model.layers[li] = CompressedLinear(pack_int4(Q), S, torch.zeros(32, 2), torch.zeros(2, 32))
+    report = strategy_delta(model, torch.randint(0, 50, (3, 4)), "w4a8")
+    assert 0 < report["rel_err"] < 0.02 and report["min_cosine"] > 0.99
+    assert model.layers[0].strategy == "w4a8"
+
+def test_adapter_bank_matches_per_adapter_layers():
+    Q, S, U0, D0 = _layer_args()
+    U1, D1 = torch.randn(32, 2), torch.randn(2, 32)
+    layers = [CompressedLinear(Q, S, U0, D0), CompressedLinear(Q, S, U1, D1)]
+    x = torch.randn(6, 32)
+    ids = torch.tensor([1, 0, 0, 1, 1, 0])
+    ref = torch.stack([layers[a](x[b:b + 1])[0] for b, a in enumerate(ids.tolist())])
+    for mode in ("grouped", "gathered"):
+        bank = AdapterBankLinear.from_compressed(layers, names=["eu", "us"], mode=mode)
+        assert torch.allclose(bank(x, ids), ref, atol=1e-4), mode
+
+def test_quantized_embedding_gathers_dequantized_rows():
+    from dac_q4_its.adapters.inject import QuantizedEmbedding
+    from dac_q4_its.quantization.mixed import dequantize_weight, quantize_weight
+    E = torch.randn(50, 16)
+    Q, S = quantize_weight(E, "int4/g8")
+    U, D = torch.randn(50, 2), torch.randn(2, 16)
+    emb = QuantizedEmbedding(Q, S, U, D, embedding_dim=16)
+    table = dequantize_weight(Q, S, in_features=16) + U @ D
+    tok = torch.randint(0, 50, (3, 7))
+    assert emb(tok).shape == (3, 7, 16)
+    assert torch.allclose(emb(tok), table[tok], atol=1e-5)
+    assert torch.allclose(emb.weight, table, atol=1e-5)
+    assert emb.Q.dtype == torch.uint8 and QuantizedEmbedding(Q, S).rank == 0
+
+def test_low_precision_adapters_run_their_dequantized_factors():
+    from dac_q4_its.adapters.build_adapters import quantize_adapters, residual_recovery
+    Q, S, U, D = _layer_args()
+    x = torch.randn(4, 32)
+    for dtype in ("fp16", "bf16", "int8"):
+        Uq, Dq, sc = quantize_adapters(U, D, dtype)
+        mod = CompressedLinear(Q, S, Uq, Dq, UD_scales=sc)
+        Uf, Df = mod.adapter_factors()
+        assert torch.allclose(mod(x), CompressedLinear(Q, S, Uf, Df)(x), atol=1e-3), dtype
+        assert (Uf @ Df - U @ D).norm() / (U @ D).norm() < 0.02, dtype
+    assert Uq.dtype == torch.int8 and sc.shape == (4,)
+    assert abs(residual_recovery(U @ D, U, D) - 1.0) < 1e-9
+
+def test_adapter_bank_keeps_int8_scales_per_adapter():
+    from dac_q4_its.adapters.build_adapters import quantize_adapters
+    Q, S, U0, D0 = _layer_args(k=4)
+    U1, D1 = torch.randn(32, 2), torch.randn(2, 32)
+    layers = []
+    for U, D in ((U0, D0), (U1, D1)):
+        Uq, Dq, sc = quantize_adapters(U, D, "int8")
+        layers.append(CompressedLinear(Q, S, Uq, Dq, UD_scales=sc))
+    x, ids = torch.randn(4, 32), torch.tensor([0, 1, 1, 0])
+    ref = torch.stack([layers[a](x[b:b + 1])[0] for b, a in enumerate(ids.tolist())])
+    for mode in ("grouped", "gathered"):
+        bank = AdapterBankLinear.from_compressed(layers, names=["eu", "us"], mode=mode)
+        assert bank.U.dtype == torch.int8 and bank.UD_scales.shape == (2, 4)
+        assert torch.allclose(bank(x, ids), ref, atol=1e-4), mode
+
+def test_packed_layers_default_to_row_blocked_fused():
+    Q, S, U, D = _layer_args(d=64)
+    packed = CompressedLinear(pack_int4(Q), S, U, D, block_size=16)
+    assert packed.strategy == "fused" and packed.blocked and packed.base_operand(torch.randn(1, 64)) is None
+    assert CompressedLinear(Q, S, U, D).strategy == "dequant"
+    x = torch.randn(3, 64)
+    assert torch.allclose(packed(x), CompressedLinear(Q, S, U, D)(x), atol=1e-4)
+
+def test_stale_quantized_embedding_is_cleared(tmp_path):
+    from dac_q4_its import pipeline
+    from dac_q4_its.modeling.compressed import load_embedding
+    from dac_q4_its.utils.io import save_bin
+    mcfg = {"vocab_size": 50, "hidden_size": 16}
+    save_bin(torch.randn(50, 16), pipeline.embed_path(tmp_path))
+    pipeline.quantize_embedding({"format": "int4"}, root=tmp_path)
+    assert type(load_embedding(mcfg, root=tmp_path)).__name__ == "QuantizedEmbedding"
+    assert len(pipeline.clear_embedding(tmp_path)) == 4  # embedding block removed from the config
+    assert isinstance(load_embedding(mcfg, root=tmp_path), torch.nn.Embedding)
+
+def test_stale_container_falls_back_to_pickles(tmp_path):
+    import os, pytest
+    from dac_q4_its.modeling.compressed import ArtifactStore
+    from dac_q4_its.utils.io import convert_pkl_dir, save_bin
+    weights = tmp_path / "weights"
+    save_bin(torch.zeros(4), weights / "layer_0_scales.pkl")
+    convert_pkl_dir(weights, tmp_path / "model.dacq")
+    assert ArtifactStore(tmp_path).tensors is not None
+    save_bin(torch.ones(4), weights / "layer_0_scales.pkl")  # 03 re-run without 06
+    packed = os.stat(tmp_path / "model.dacq").st_mtime_ns
+    os.utime(weights / "layer_0_scales.pkl", ns=(packed + 1, packed + 1))
+    save_bin(torch.zeros(4), weights / "layer_0_W_fp32.pkl")  # FP sources are never packed
+    with pytest.warns(UserWarning, match="re-run 06"):
+        store = ArtifactStore(tmp_path)
+    assert store.tensors is None and torch.equal(store["layer_0_scales"], torch.ones(4))
+    save_bin(torch.zeros(4), weights / "layer_0_scales.pkl")  # rewritten with the packed value: still fresh
+    os.utime(weights / "layer_0_scales.pkl", ns=(packed + 1, packed + 1))
+    assert ArtifactStore(tmp_path).tensors is not None
+
+def test_embedding_residual_is_reproducible(tmp_path):
+    from dac_q4_its import pipeline
+    from dac_q4_its.utils.io import load_bin, save_bin
+    save_bin(torch.randn(50, 16), pipeline.embed_path(tmp_path))
+    runs = []
+    for _ in range(2):
+        torch.randn(7)  # different global RNG state on each run
+        pipeline.quantize_embedding({"format": "int4", "residual_rank": 4}, root=tmp_path)
+        runs.append([load_bin(pipeline.embed_path(tmp_path, k)) for k in ("U", "D")])
+    assert all(torch.equal(a, b) for a, b in zip(*runs))
@@ -0,0 +1,41 @@
+import torch
+from dac_q4_its.utils.io import save_bin, save_tensors, load_tensors, convert_pkl_dir, ALIGN, read_header
+
+def test_container_roundtrip(tmp_path):
+    tensors = {"q": torch.randint(0, 255, (7, 3), dtype=torch.uint8), "s": torch.randn(7, 1),
+               "u": torch.randn(5, 2).bfloat16(), "empty": torch.empty(0, 4)}
+    path = tmp_path / "m.dacq"
+    save_tensors(tensors, path, metadata={"hidden_size": 5})
+    header = read_header(path)
+    assert all((header["data_start"] + e["offset"]) % ALIGN == 0 for e in header["tensors"].values())
+    for mmap in (True, False):
+        out, meta = load_tensors(path, mmap=mmap)
+        assert meta == {"hidden_size": 5}
+        assert all(torch.equal(out[k], tensors[k]) for k in tensors)
+
+def test_convert_pkl_dir(tmp_path):
+    save_bin(torch.ones(2, 2), tmp_path / "layer_0_U.pkl")
+    save_bin(torch.zeros(3), tmp_path / "layer_0_D.pkl")
+    names = convert_pkl_dir(tmp_path, tmp_path / "m.dacq")
+    assert names == ["layer_0_D", "layer_0_U"]
+    out, _ = load_tensors(tmp_path / "m.dacq")
+    assert torch.equal(out["layer_0_U"], torch.ones(2, 2))
+
+def test_container_rejects_untrusted_headers(tmp_path):
+    import json, pytest
+    from dac_q4_its.utils.io import MAGIC
+    path = tmp_path / "m.dacq"
+    save_tensors({"s": torch.randn(4, 2)}, path)
+    raw = path.read_bytes()
+    n = int.from_bytes(raw[8:16], "little")
+    header = json.loads(raw[16:16 + n])
+    for field, value in [("dtype", "load"), ("dtype", "float8_e4m3fn"), ("nbytes", 64), ("shape", [4, 3]),
+                         ("shape", [-4, -2])]:
+        bad = json.loads(json.dumps(header))
+        bad["tensors"]["s"][field] = value
+        body = json.dumps(bad, separators=(",", ":")).encode()
+        assert len(body) <= n
+        body = body.ljust(n)                              # same header length: data offsets stay put
+        (tmp_path / "bad.dacq").write_bytes(MAGIC + n.to_bytes(8, "little") + body + raw[16 + n:])
+        with pytest.raises(ValueError):
+            load_tensors(tmp_path / "bad.dacq")
@@ -0,0 +1,43 @@
+import pytest, torch
+from dac_q4_its.adapters.inject import CompressedLinear, STRATEGIES
+from dac_q4_its.quantization.mixed import (dequantize_weight, plan_precision, quantize_weight, sensitivity,
+                                          weight_bytes)
+
+FORMATS = ["int4", "int4/g16", "int8", "int8/g32", "fp16"]
+
+def test_formats_run_under_every_strategy():
+    W, x = torch.randn(24, 64), torch.randn(5, 64)
+    for fmt in FORMATS:
+        Q, S = quantize_weight(W, fmt)
+        Wdq = dequantize_weight(Q, S, in_features=64)
+        assert (Wdq - W).norm() / W.norm() < (0.15 if fmt.startswith("int4") else 0.01), fmt
+        ref = x @ Wdq.T
+        for strategy in STRATEGIES:
+            lin = CompressedLinear(Q, S, torch.zeros(24, 0), torch.zeros(0, 64), in_features=64,
+                                   strategy=strategy, block_size=8)
+            if strategy == "w4a8" and fmt != "fp16":  # int8 activations: close, not exact
+                assert (lin(x) - ref).norm() / ref.norm() < 0.02, fmt
+            else:
+                assert torch.allclose(lin(x), ref, atol=1e-4), (fmt, strategy)
+
+def test_sensitivity_follows_bits_and_input_scale():
+    W = torch.randn(16, 32)
+    sens = sensitivity(W, torch.eye(32), 1, FORMATS)
+    errs = [sens[f]["output_error"] for f in ("int4", "int8", "fp16")]
+    assert errs[0] > errs[1] > errs[2] >= 0
+    # identity input covariance: output error equals the dequant error
+    assert sens["int4"]["output_error"] == pytest.approx(sens["int4"]["dW_energy"])
+    assert sensitivity(W, 4 * torch.eye(32), 1, ["int4"])["int4"]["output_error"] == pytest.approx(4 * errs[0])
+
+def test_plan_spends_budget_on_sensitive_layers():
+    fmts = ["int4", "int8", "fp16"]
+    costs = [{f: weight_bytes(64, 64, f) for f in fmts}] * 3
+    errors = [{"int4": 10.0, "int8": 0.1, "fp16": 0.0}, {"int4": 1.0, "int8": 0.01, "fp16": 0.0},
+              {"int4": 0.1, "int8": 0.001, "fp16": 0.0}]
+    cheap = sum(c["int4"] for c in costs)
+    assert plan_precision(costs, errors, cheap) == ["int4"] * 3
+    one_up = cheap + costs[0]["int8"] - costs[0]["int4"]
+    assert plan_precision(costs, errors, one_up) == ["int8", "int4", "int4"]
+    assert plan_precision(costs, errors, 10 ** 9) == ["fp16"] * 3
+    with pytest.raises(ValueError):
+        plan_precision(costs, errors, cheap - 1)
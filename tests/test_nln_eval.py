@@ -0,0 +1,37 @@
+import json
+from dac_q4_its.evaluation.nln import eval_file, eval_file_streaming, parse_target
+
+ROWS = [
+    {"pred": "DEST=airport,CONSTRAINT=avoid_tolls", "target": "DEST=airport,CONSTRAINT=avoid_tolls"},
+    {"pred": "DEST=downtown,CONSTRAINT=min_traffic", "target": "DEST=downtown,CONSTRAINT=min_traffic|rush_hour"},
+    {"pred": "DEST=airport,CONSTRAINT=weather:fog|low_visibility",
+     "target": "DEST=stadium,CONSTRAINT=weather:fog|low_visibility"},
+]
+
+def test_parse_target():
+    assert parse_target("DEST=Airport,CONSTRAINT=a|b:08:00") == ("airport", ["a", "b:08:00"])
+    assert parse_target("garbage") == (None, [])
+
+def test_streaming_matches_eval_file_and_breaks_down(tmp_path):
+    path = tmp_path / "preds.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in ROWS * 50))
+    em, f1 = eval_file(str(path))
+    # tiny chunks so lines straddle range boundaries; in-process and pooled must agree
+    serial = eval_file_streaming(str(path), workers=1, chunk_bytes=97)
+    pooled = eval_file_streaming(str(path), workers=2, chunk_bytes=97)
+    assert serial == pooled
+    assert serial["n"] == 150 and abs(serial["em"] - em) < 1e-4 and abs(serial["soft_f1"] - f1) < 1e-4
+    assert serial["by_dest"]["stadium"]["dest_acc"] == 0.0
+    assert serial["by_constraint"]["rush_hour"]["constraint_r"] == 0.0
+    assert serial["by_family"]["weather"]["n"] == 50
+    # fog emits two tokens from one rule: counted as one composed constraint
+    assert serial["by_n_constraints"]["1"]["n"] == 100 and serial["by_n_constraints"]["2"]["n"] == 50
+
+def test_streaming_uses_the_generation_lexicons(tmp_path):
+    lex = tmp_path / "lex.yaml"
+    lex.write_text("scenic: [mirror_lake]\n")
+    path = tmp_path / "preds.jsonl"
+    row = {"pred": "DEST=airport,CONSTRAINT=via:mirror_lake", "target": "DEST=airport,CONSTRAINT=via:mirror_lake"}
+    path.write_text(json.dumps(row) + "\n")
+    assert "detour" in eval_file_streaming(str(path), workers=1, lexicons=str(lex))["by_family"]
+    assert "detour" not in eval_file_streaming(str(path), workers=1, lexicons=None)["by_family"]
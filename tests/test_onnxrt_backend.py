@@ -0,0 +1,25 @@
+import pytest, torch
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+from dac_q4_its.modeling.loader import load_toy
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row, pack_int4
+from dac_q4_its.adapters.inject import CompressedLinear, QuantizedEmbedding
+from dac_q4_its.quantization.mixed import quantize_weight
+from dac_q4_its.runtimes.onnxrt_backend import export_compressed_onnx, OnnxRTBackend, parity_check
+
+@pytest.mark.parametrize("ranks, embed_fmt", [((4, 4), None), ((4, 0), None), ((4, 4), "int4/g8")])
+def test_onnx_parity(tmp_path, ranks, embed_fmt):
+    model = load_toy({"hidden_size": 32, "n_layers": 2, "vocab_size": 100, "pad_id": 0}).eval()
+    for li, (lin, k) in enumerate(zip(model.layers, ranks)):
+        Q, S = quantize_int4_per_row(lin.weight.data)
+        model.layers[li] = CompressedLinear(pack_int4(Q), S, torch.randn(32, k) * 0.1, torch.randn(k, 32) * 0.1)
+    if embed_fmt:
+        Q, S = quantize_weight(model.embed.weight.data, embed_fmt)
+        model.embed = QuantizedEmbedding(Q, S, torch.randn(100, 2) * 0.1, torch.randn(2, 32), embedding_dim=32)
+    path = export_compressed_onnx(model, tmp_path / "m.onnx")
+    backend = OnnxRTBackend(path, intra_op_threads=1)
+    tok = torch.randint(0, 100, (3, 5))
+    tok[0, 3:] = 0  # padded row
+    report = parity_check(model, backend, tok)
+    assert report["ok"] and report["rel_err"] < 1e-5
+    assert not parity_check(model, lambda t: backend(t) * 1.01, tok)["ok"]  # 1% off fails at any output scale
@@ -0,0 +1,35 @@
+import json
+import torch
+from dac_q4_its.adapters.inject import CompressedLinear
+from dac_q4_its.modeling.loader import ModelCfg, ToyTransformer
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row_packed
+from dac_q4_its.runtimes import profiling
+from dac_q4_its.runtimes.profiling import LayerProfiler
+
+def _model(strategy):
+    torch.manual_seed(0)
+    cfg = ModelCfg(hidden_size=32, n_layers=2, vocab_size=50, pad_id=0)
+    layers = []
+    for _ in range(cfg.n_layers):
+        Q, S = quantize_int4_per_row_packed(torch.randn(32, 32))
+        layers.append(CompressedLinear(Q, S, torch.randn(32, 4), torch.randn(4, 32), in_features=32,
+                                       strategy=strategy, block_size=8))
+    return ToyTransformer.from_modules(cfg, torch.nn.Embedding(50, 32), layers).eval()
+
+def test_profiler_matches_forward_and_splits_phases(tmp_path):
+    tok = torch.tensor([[3, 4, 5, 0], [6, 7, 0, 0]])
+    for strategy in ("dequant", "fused", "tiled", "cached"):
+        model = _model(strategy)
+        with torch.no_grad():
+            ref = model(tok)
+            with LayerProfiler(model) as prof:
+                out = model(tok)
+        assert profiling.ACTIVE is None
+        assert torch.allclose(ref, out, atol=1e-5)
+        summ = prof.summary()
+        for li in range(2):
+            row = summ[f"layers.{li}"]
+            assert row["calls"] == 1 and row["base_ms"] > 0 and row["adapter_ms"] > 0
+        assert summ["model"]["calls"] == 1 and "layers.0" in prof.table()
+    trace = json.loads(open(prof.save_trace(tmp_path / "trace.json")).read())
+    assert {e["cat"] for e in trace["traceEvents"]} == {"dequant", "base", "adapter", "forward", "embed"}
@@ -1,5 +1,5 @@
 import torch
-from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row, dequantize_int4_per_row
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row, dequantize_int4_per_row, pack_int4, unpack_int4
 
 def test_qdq_roundtrip():
     W = torch.randn(32, 32)
@@ -7,3 +7,11 @@ def test_qdq_roundtrip():
     Wdq = dequantize_int4_per_row(Q, S)
     err = (W - Wdq).abs().mean().item()
     assert err < 0.5  # coarse bound for 4-bit demo
+
+def test_pack_unpack_int4():
+    W = torch.randn(16, 33)
+    Q, S = quantize_int4_per_row(W)
+    P = pack_int4(Q)
+    assert P.dtype == torch.uint8 and P.shape == (16, 17)
+    assert torch.equal(unpack_int4(P, in_features=33), Q)
+    assert torch.allclose(dequantize_int4_per_row(P, S, in_features=33), dequantize_int4_per_row(Q, S))
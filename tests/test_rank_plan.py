@@ -0,0 +1,37 @@
+import torch
+from dac_q4_its.adapters.build_adapters import build_adapters
+from dac_q4_its.adapters.eigenspace import topk_eigvecs_from_cov
+from dac_q4_its.adapters.inject import CompressedLinear
+from dac_q4_its.adapters.rank_plan import direction_gains, plan_ranks, plan_report, rank_cost
+from dac_q4_its.quantization.int4_dynamic import quantize_int4_per_row
+
+def test_gains_sum_to_captured_energy():
+    torch.manual_seed(0)
+    A, dW = torch.randn(100, 16), torch.randn(16, 16)
+    V = topk_eigvecs_from_cov(A.T @ A, 6)
+    g = direction_gains(V, dW)
+    U, D = build_adapters(V[:, -4:], dW)
+    assert torch.allclose(g[:4].sum(), D.double().pow(2).sum(), rtol=1e-5)
+
+def test_budget_goes_where_the_error_is():
+    costs = [rank_cost(16, 16)] * 3
+    gains = [torch.tensor([9.0, 8.0, 7.0, 6.0]), torch.tensor([1.0, 0.5, 0.2, 0.1]), torch.zeros(4)]
+    ranks = plan_ranks(gains, costs, budget=5 * costs[0])
+    assert ranks == [4, 1, 0]
+    report = plan_report(gains, [40.0, 2.0, 1.0], costs, ranks)
+    assert report["cost"] <= 5 * costs[0] and report["layers"][2]["rank"] == 0
+
+def test_concave_hull_buys_past_a_weak_direction():
+    # a weak first direction hides a strong second one; the hull sees both as one segment
+    gains = [torch.tensor([0.1, 10.0]), torch.tensor([3.0, 0.0])]
+    assert plan_ranks(gains, [1, 1], budget=2) == [2, 0]
+    assert plan_ranks(gains, [1, 1], budget=1) == [0, 1]
+    assert plan_ranks(gains, [1, 1], budget=3) == [2, 1]
+    assert plan_ranks(gains, [1, 1], budget=3, totals=[10.1, 30.0], min_gain=0.2) == [2, 0]
+
+def test_rank_zero_layer_is_the_quantized_base():
+    Q, S = quantize_int4_per_row(torch.randn(24, 24))
+    lin = CompressedLinear(Q, S, torch.zeros(24, 0), torch.zeros(0, 24))
+    x = torch.randn(3, 24)
+    assert lin.rank == 0
+    assert torch.equal(lin(x), lin.base(x))
@@ -0,0 +1,43 @@
+import asyncio, time
+from dac_q4_its.runtimes.result_cache import ResultCache
+from dac_q4_its.runtimes.serving import MicroBatcher
+
+def test_lru_ttl_and_counters():
+    c = ResultCache(max_entries=2, ttl_s=60)
+    c.put("Navigate to  Airport", "a")
+    c.put("b", "b")
+    assert c.get("navigate to airport") == "a"  # normalized key, refreshes LRU
+    c.put("c", "c")                             # evicts "b"
+    assert c.get("b") is None and c.get("c") == "c"
+    c.entries["c"] = ("c", time.time() - 120)
+    assert c.get("c") is None
+    s = c.stats()
+    assert (s["hits"], s["misses"], s["evictions"], s["expirations"]) == (2, 2, 1, 1)
+
+def test_warm_start_is_tied_to_version(tmp_path):
+    path = tmp_path / "cache.json"
+    c = ResultCache(version="v1")
+    c.put("route home", "DEST=home")
+    c.save(path)
+    assert ResultCache(version="v1").load(path) == 1
+    stale = ResultCache(version="v2")
+    assert stale.load(path) == 0 and stale.get("route home") is None
+
+def test_batcher_skips_model_on_hit_and_dedups():
+    calls = []
+    def run_batch(items):
+        calls.append(list(items))
+        return [x.upper() for x in items]
+
+    async def main():
+        b = MicroBatcher(run_batch, max_batch_size=8, max_delay_ms=20, cache=ResultCache()).start()
+        first = await asyncio.gather(b.submit("go home"), b.submit("Go  Home"), b.submit("work"))
+        again = await b.submit("GO HOME")
+        b.task.cancel()
+        return first, again, b.stats.summary()
+
+    first, again, stats = asyncio.run(main())
+    assert first == ["GO HOME", "GO HOME", "WORK"] and again == "GO HOME"
+    assert (stats["requests"], stats["cache_hits"], stats["batches"]) == (4, 1, 1)  # the in-batch duplicate rides the model call
+    assert stats["model_rps"] < stats["throughput_rps"]  # hits widen the window instead of inflating the rate
+    assert calls == [["go home", "work"]]
@@ -0,0 +1,43 @@
+import asyncio
+from dac_q4_its.runtimes.serving import MicroBatcher
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    calls = []
+    def run_batch(items):
+        calls.append(len(items))
+        return [x * 2 for x in items]
+
+    async def main():
+        batcher = MicroBatcher(run_batch, max_batch_size=8, max_delay_ms=50).start()
+        out = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        batcher.task.cancel()
+        return out, batcher.stats.summary()
+
+    out, stats = asyncio.run(main())
+    assert out == [2 * i for i in range(20)]
+    assert calls == [8, 8, 4]
+    assert stats["requests"] == 20 and stats["batches"] == 3
+
+def test_unix_server_replaces_stale_socket_and_cleans_up(tmp_path):
+    import os, socket
+    from dac_q4_its.runtimes.serving import request, serve
+    path = str(tmp_path / "s.sock")
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)  # closed without unlinking, like a crashed server
+    stale.close()
+
+    async def main():
+        task = asyncio.create_task(serve(lambda items: [p.upper() for p in items], unix_path=path))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            try:
+                resp = await request("hi", unix_path=path)
+                break
+            except (ConnectionRefusedError, FileNotFoundError):
+                continue
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return resp
+
+    assert asyncio.run(main())["pred"] == "HI"
+    assert not os.path.exists(path)
@@ -0,0 +1,35 @@
+import json
+import pytest
+from dac_q4_its.data.rules import load_lexicons
+from dac_q4_its.data.synthetic import UtteranceSpace, write_jsonl
+
+LEX = load_lexicons(None)
+
+def test_product_space_is_unique_and_exact():
+    space = UtteranceSpace(LEX, max_constraints=2, seed=1)
+    assert space.capacity == 5 * 10 * (20 + 190)
+    rows = list(space.iter_range(0, space.capacity))
+    assert len({(r["input"], r["target"]) for r in rows}) == space.capacity
+    with pytest.raises(IndexError):
+        space.example(space.capacity)
+
+def test_malformed_lexicon_names_the_key():
+    for key, bad in (("roads", ["NH-48"]), ("dests", "airport"), ("events", [None])):
+        with pytest.raises(ValueError, match=key):
+            UtteranceSpace({**LEX, key: bad})
+
+def test_legacy_capacity_is_detected():
+    space = UtteranceSpace(LEX, scheme="legacy")
+    assert space.capacity == 60
+    assert space.example(0) == {"input": "navigate to airport during rush hour",
+                                "target": "DEST=airport,CONSTRAINT=rush_hour"}
+
+def test_sharded_write_matches_serial(tmp_path):
+    space = UtteranceSpace(LEX, seed=7)
+    write_jsonl(space, 1000, tmp_path / "serial.jsonl")
+    write_jsonl(space, 1000, tmp_path / "sharded.jsonl", workers=2, shard_size=64)
+    assert (tmp_path / "serial.jsonl").read_bytes() == (tmp_path / "sharded.jsonl").read_bytes()
+    first = json.loads((tmp_path / "serial.jsonl").read_text().splitlines()[0])
+    assert first == space.example(0)
+    with pytest.raises(ValueError):
+        write_jsonl(space, space.capacity + 1, tmp_path / "too_many.jsonl")
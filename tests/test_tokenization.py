@@ -0,0 +1,36 @@
+import torch
+from dac_q4_its.data.tokenization import HASH_EOS, HASH_PAD, SubwordTokenizer, hash_encode, train_tokenizer
+from dac_q4_its.modeling.loader import ToyTransformer, ModelCfg
+
+TEXTS = ["navigate to the airport avoiding tolls", "route to downtown avoiding highways",
+         "take me to the nearest charging station", "navigate home avoiding ferries"] * 5
+
+def test_encode_batch_pads_and_caches():
+    tok = train_tokenizer(TEXTS, vocab_size=200)
+    ids = tok(["navigate to airport", "navigate  to   AIRPORT avoiding tolls"])
+    assert ids.shape[0] == 2 and ids.dtype == torch.long
+    assert (ids[0] == tok.pad_id).any() and not (ids[1] == tok.pad_id).any()
+    assert tok.decode(ids[1].tolist()) == "navigate to airport avoiding tolls"
+    assert tok.misses == 2 and tok.hits == 0
+    tok.encode("Navigate to airport")
+    assert tok.hits == 1
+    assert tok(["x"], seq_len=6).shape == (1, 6)
+
+def test_hash_ids_skip_reserved():
+    ids = hash_encode([f"w{i}" for i in range(500)], vocab_size=16, seq_len=1)
+    assert ids.min() >= 2 and ids.max() < 16 and not ((ids == HASH_EOS) | (ids == HASH_PAD)).any()
+
+def test_save_load_roundtrip(tmp_path):
+    tok = train_tokenizer(TEXTS, vocab_size=200)
+    tok.save(tmp_path / "tok.json")
+    tok2 = SubwordTokenizer.load(tmp_path / "tok.json")
+    assert tok2.vocab == tok.vocab
+    assert tok2.encode("reroute to the stadium") == tok.encode("reroute to the stadium")
+
+def test_padding_does_not_change_pooled_hidden():
+    torch.manual_seed(0)
+    model = ToyTransformer(ModelCfg(hidden_size=16, n_layers=2, vocab_size=50, pad_id=0)).eval()
+    tok = torch.tensor([[5, 7, 9]])
+    padded = torch.tensor([[5, 7, 9, 0, 0]])
+    with torch.no_grad():
+        assert torch.allclose(model(tok), model(padded), atol=1e-6)